@@ -0,0 +1,248 @@
+from sqlalchemy import select, delete, func
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+from tokens import denylist
+import models
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Admin event stream settings
+ADMIN_EVENTS_BUFFER = int(os.getenv("ADMIN_EVENTS_BUFFER", "256"))  # events queued per subscriber
+# How often each worker looks for events written by other workers; its own
+# writes wake it straight away
+ADMIN_EVENTS_POLL_SECONDS = float(os.getenv("ADMIN_EVENTS_POLL_SECONDS", "1"))
+ADMIN_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("ADMIN_EVENTS_KEEPALIVE_SECONDS", "15"))
+# How long events are kept for clients resuming with Last-Event-ID
+ADMIN_EVENTS_RETENTION_SECONDS = float(os.getenv("ADMIN_EVENTS_RETENTION_SECONDS", "3600"))
+# How long a missing event id is waited for before the events after it are
+# sent without it (PostgreSQL/MySQL only, see EventHub)
+ADMIN_EVENTS_GAP_GRACE_SECONDS = float(os.getenv("ADMIN_EVENTS_GAP_GRACE_SECONDS", "5"))
+PURGE_INTERVAL_SECONDS = 60
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+# Record a change to the admin queues in the caller's transaction. Call
+# event_hub.wake() after committing. Kinds and payloads:
+#   users.added      {"users": [{"email"}]}
+#   users.removed    {"emails": [...], "status": "approved" | "rejected"}
+#   software.added   {"software": [{"name", "version", "hash", "developer_email"}]}
+#   software.removed {"hashes": [...], "status": "approved" | "rejected"}
+def publish(db, kind: str, payload: dict):
+    db.add(models.AdminEvent(kind=kind, payload=json.dumps(payload), created_at=time.time()))
+
+
+def format_event(event_id: int, kind: str, payload: str) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+# Whether a stream opened with these access token claims may still be served
+def authorized(claims) -> bool:
+    return claims is None or (claims["exp"] > time.time() and not denylist.is_revoked(claims))
+
+
+class Subscription:
+    def __init__(self, buffer: int):
+        self.queue = asyncio.Queue(maxsize=buffer)
+        self.overflowed = False
+
+
+# Fans admin_events rows out to this worker's open streams. Events are written
+# to the table with the change that caused them, so every worker sees every
+# event; each worker tails the table and copies new rows into each
+# subscriber's bounded queue. A subscriber that falls a full buffer behind is
+# dropped with a 'resync' event instead of holding memory or slowing the
+# others; its dashboard reloads the listings and reconnects.
+# Events go out in id order. SQLite serializes writers, so ids become visible
+# in order and a missing id was rolled back. PostgreSQL and MySQL hand out ids
+# before commit, so a missing id may still be committing: the events after it
+# are held back until it shows up or ADMIN_EVENTS_GAP_GRACE_SECONDS pass
+# (a rolled-back id delays them by that long).
+class EventHub:
+    def __init__(self, buffer: int = ADMIN_EVENTS_BUFFER):
+        self.buffer = buffer
+        self._subscribers = set()
+        self._last_id = None
+        self._gaps = {}  # missing id -> when it was first noticed
+        self._purged_at = 0.0
+        self._wake = None
+        self._task = None
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.buffer)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def _broadcast(self, event):
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._subscribers.discard(subscription)
+                subscription.overflowed = True
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+                self.dropped += 1
+                logger.warning(f"Admin event subscriber fell {self.buffer} events behind; asked it to resync")
+        self.published += 1
+
+    # Whether the ids between the last one sent and `event_id` can be given up
+    # on: at once when ids are committed in order, otherwise once each has been
+    # missing for the grace period
+    def _gap_closed(self, event_id: int, now: float, ordered: bool) -> bool:
+        missing = range(self._last_id + 1, event_id)
+        if not ordered:
+            for gap in missing:
+                if now - self._gaps.setdefault(gap, now) < ADMIN_EVENTS_GAP_GRACE_SECONDS:
+                    return False
+        for gap in range(self._last_id + 1, event_id + 1):
+            self._gaps.pop(gap, None)  # given up on, or it just arrived
+        return True
+
+    async def sync(self):
+        now = time.time()
+        async with AsyncSessionLocal() as db:
+            ordered = db.get_bind().dialect.name == "sqlite"
+            if self._last_id is None:
+                self._last_id = await db.scalar(select(func.max(models.AdminEvent.id))) or 0
+            rows = (await db.execute(
+                select(models.AdminEvent.id, models.AdminEvent.kind, models.AdminEvent.payload)
+                .where(models.AdminEvent.id > self._last_id)
+                .order_by(models.AdminEvent.id)
+            )).all()
+            if now - self._purged_at >= PURGE_INTERVAL_SECONDS:
+                await db.execute(delete(models.AdminEvent).where(models.AdminEvent.created_at < now - ADMIN_EVENTS_RETENTION_SECONDS))
+                await db.commit()
+                self._purged_at = now
+        for row in rows:
+            if not self._gap_closed(row.id, now, ordered):
+                break
+            self._broadcast(tuple(row))
+            self._last_id = row.id
+
+    # Events after `after_id` for a client resuming a dropped connection, or
+    # None if some of them have already been purged or there are more than a
+    # buffer's worth, in which case the client has to resync. Events this worker
+    # is still holding back come live instead, so they stay in id order.
+    async def backlog(self, after_id: int):
+        async with AsyncSessionLocal() as db:
+            query = (
+                select(models.AdminEvent.id, models.AdminEvent.kind, models.AdminEvent.payload)
+                .where(models.AdminEvent.id > after_id)
+                .order_by(models.AdminEvent.id)
+                .limit(self.buffer + 1)
+            )
+            if self._last_id is not None:
+                query = query.where(models.AdminEvent.id <= self._last_id)
+            rows = (await db.execute(query)).all()
+            oldest, newest = (await db.execute(select(func.min(models.AdminEvent.id), func.max(models.AdminEvent.id)))).one()
+        if len(rows) > self.buffer:
+            return None
+        if newest is None:
+            # Everything has been purged; fine only if the client saw it all
+            return [] if after_id == (self._last_id or 0) else None
+        if after_id + 1 < oldest or after_id > newest:
+            return None
+        return [tuple(row) for row in rows]
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # End open streams so the server can shut down
+        for subscription in list(self._subscribers):
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+        self._subscribers.clear()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Admin event sync failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), ADMIN_EVENTS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    # Server-Sent Events for one dashboard: the backlog after `last_event_id`
+    # when resuming, then live events, with a comment line as keep-alive so
+    # proxies do not close an idle connection. The access token's `claims`
+    # are checked again before every event and keep-alive; once the token
+    # expires or is revoked the stream ends, and the client reconnects with a
+    # fresh one or is turned away.
+    async def stream(self, request, last_event_id: int | None = None, claims=None):
+        subscription = self.subscribe()
+        try:
+            sent = self._last_id or 0
+            if last_event_id is not None:
+                backlog = await self.backlog(last_event_id)
+                if backlog is None:
+                    yield RESYNC
+                    return
+                for event_id, kind, payload in backlog:
+                    yield format_event(event_id, kind, payload)
+                sent = backlog[-1][0] if backlog else last_event_id
+            yield f"retry: 3000\nid: {sent}\nevent: ready\ndata: {{}}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), ADMIN_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected() or not authorized(claims):
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    if subscription.overflowed:
+                        yield RESYNC
+                    return
+                if not authorized(claims):
+                    return
+                event_id, kind, payload = event
+                if event_id <= sent:
+                    continue  # already sent from the backlog
+                sent = event_id
+                yield format_event(event_id, kind, payload)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "published": self.published, "dropped": self.dropped,
+                "buffer": self.buffer}
+
+
+event_hub = EventHub()
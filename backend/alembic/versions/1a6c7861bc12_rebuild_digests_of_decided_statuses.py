@@ -0,0 +1,30 @@
+"""rebuild digests of decided statuses
+
+Revision ID: 1a6c7861bc12
+Revises: 383cd8cc2f66
+Create Date: 2026-10-17 00:48:22.414075
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a6c7861bc12'
+down_revision: Union[str, None] = '383cd8cc2f66'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Digests now cover only approved and rejected builds; dropping the stored
+    # buckets makes the next reconciliation run rebuild both sides.
+    op.execute("DELETE FROM digest_buckets")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM digest_buckets")
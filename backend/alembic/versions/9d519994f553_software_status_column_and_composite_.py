@@ -0,0 +1,58 @@
+"""software status column and composite indexes
+
+Revision ID: 9d519994f553
+Revises: 
+Create Date: 2026-10-16 23:05:08.724060
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d519994f553'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("software") as batch_op:
+        batch_op.add_column(sa.Column("status", sa.String(length=8), server_default="pending", nullable=False))
+
+    # Rejection wins over approval, matching how the old listings filtered
+    op.execute(
+        "UPDATE software SET status = CASE "
+        "WHEN is_rejected THEN 'rejected' "
+        "WHEN is_approved THEN 'approved' "
+        "ELSE 'pending' END"
+    )
+
+    with op.batch_alter_table("software") as batch_op:
+        batch_op.drop_index("ix_software_developer_email")
+        batch_op.drop_column("is_approved")
+        batch_op.drop_column("is_rejected")
+        batch_op.create_index("ix_software_developer_email_status", ["developer_email", "status"])
+        batch_op.create_index("ix_software_status_id", ["status", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("software") as batch_op:
+        batch_op.add_column(sa.Column("is_approved", sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column("is_rejected", sa.Boolean(), nullable=True))
+
+    op.execute(
+        "UPDATE software SET "
+        "is_approved = CASE WHEN status = 'approved' THEN 1 ELSE 0 END, "
+        "is_rejected = CASE WHEN status = 'rejected' THEN 1 ELSE 0 END"
+    )
+
+    with op.batch_alter_table("software") as batch_op:
+        batch_op.drop_index("ix_software_status_id")
+        batch_op.drop_index("ix_software_developer_email_status")
+        batch_op.drop_column("status")
+        batch_op.create_index("ix_software_developer_email", ["developer_email"])
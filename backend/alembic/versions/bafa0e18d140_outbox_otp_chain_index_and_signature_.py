@@ -0,0 +1,142 @@
+"""outbox otp chain index and signature tables
+
+Revision ID: bafa0e18d140
+Revises: 9d519994f553
+Create Date: 2026-10-16 23:23:58.390973
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bafa0e18d140'
+down_revision: Union[str, None] = '9d519994f553'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases set up before migrations covered these tables already have
+    # them from the app's old import-time create_all
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'chain_events' not in existing:
+        op.create_table('chain_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('block_number', sa.Integer(), nullable=False),
+        sa.Column('block_hash', sa.String(), nullable=False),
+        sa.Column('transaction_hash', sa.String(), nullable=False),
+        sa.Column('log_index', sa.Integer(), nullable=False),
+        sa.Column('event', sa.String(), nullable=False),
+        sa.Column('args', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_chain_events_block_hash_log', 'chain_events', ['block_hash', 'log_index'], unique=True)
+        op.create_index('ix_chain_events_block_log', 'chain_events', ['block_number', 'log_index'], unique=False)
+        op.create_index(op.f('ix_chain_events_id'), 'chain_events', ['id'], unique=False)
+
+    if 'chain_licenses' not in existing:
+        op.create_table('chain_licenses',
+        sa.Column('license_key', sa.String(), nullable=False),
+        sa.Column('key_topic', sa.String(), nullable=False),
+        sa.Column('holder_address', sa.String(), nullable=False),
+        sa.Column('software_name', sa.String(), nullable=True),
+        sa.Column('software_hash', sa.String(), nullable=True),
+        sa.Column('is_tampered', sa.Boolean(), nullable=False),
+        sa.Column('is_cracked', sa.Boolean(), nullable=False),
+        sa.Column('issued_block', sa.Integer(), nullable=False),
+        sa.Column('updated_block', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('license_key')
+        )
+        op.create_index(op.f('ix_chain_licenses_holder_address'), 'chain_licenses', ['holder_address'], unique=False)
+        op.create_index(op.f('ix_chain_licenses_key_topic'), 'chain_licenses', ['key_topic'], unique=True)
+        op.create_index(op.f('ix_chain_licenses_software_hash'), 'chain_licenses', ['software_hash'], unique=False)
+
+    if 'chain_software' not in existing:
+        op.create_table('chain_software',
+        sa.Column('hash_topic', sa.String(), nullable=False),
+        sa.Column('hash', sa.String(), nullable=True),
+        sa.Column('developer_address', sa.String(), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'approved', 'rejected', name='softwarestatus', native_enum=False), nullable=False),
+        sa.Column('added_block', sa.Integer(), nullable=False),
+        sa.Column('updated_block', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('hash_topic')
+        )
+        op.create_index(op.f('ix_chain_software_developer_address'), 'chain_software', ['developer_address'], unique=False)
+        op.create_index(op.f('ix_chain_software_hash'), 'chain_software', ['hash'], unique=False)
+
+    if 'email_outbox' not in existing:
+        op.create_table('email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('content', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_by', sa.String(), nullable=True),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_email_outbox_id'), 'email_outbox', ['id'], unique=False)
+        op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+    if 'indexer_checkpoints' not in existing:
+        op.create_table('indexer_checkpoints',
+        sa.Column('contract_address', sa.String(), nullable=False),
+        sa.Column('block_number', sa.Integer(), nullable=False),
+        sa.Column('block_hash', sa.String(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('contract_address')
+        )
+
+    if 'otp_codes' not in existing:
+        op.create_table('otp_codes',
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('email')
+        )
+        op.create_index(op.f('ix_otp_codes_expires_at'), 'otp_codes', ['expires_at'], unique=False)
+
+    if 'software_signatures' not in existing:
+        op.create_table('software_signatures',
+        sa.Column('software_id', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('blocks', sa.Integer(), nullable=False),
+        sa.Column('similar_to_id', sa.Integer(), nullable=True),
+        sa.Column('similarity', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('software_id')
+        )
+        op.create_index(op.f('ix_software_signatures_similar_to_id'), 'software_signatures', ['similar_to_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index(op.f('ix_software_signatures_similar_to_id'), table_name='software_signatures')
+    op.drop_table('software_signatures')
+    op.drop_index(op.f('ix_otp_codes_expires_at'), table_name='otp_codes')
+    op.drop_table('otp_codes')
+    op.drop_table('indexer_checkpoints')
+    op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_id'), table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_index(op.f('ix_chain_software_hash'), table_name='chain_software')
+    op.drop_index(op.f('ix_chain_software_developer_address'), table_name='chain_software')
+    op.drop_table('chain_software')
+    op.drop_index(op.f('ix_chain_licenses_software_hash'), table_name='chain_licenses')
+    op.drop_index(op.f('ix_chain_licenses_key_topic'), table_name='chain_licenses')
+    op.drop_index(op.f('ix_chain_licenses_holder_address'), table_name='chain_licenses')
+    op.drop_table('chain_licenses')
+    op.drop_index(op.f('ix_chain_events_id'), table_name='chain_events')
+    op.drop_index('ix_chain_events_block_log', table_name='chain_events')
+    op.drop_index('ix_chain_events_block_hash_log', table_name='chain_events')
+    op.drop_table('chain_events')
+    # ### end Alembic commands ###
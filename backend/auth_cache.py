@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from dotenv import load_dotenv
+import os
+import time
+
+load_dotenv()
+
+# Authenticated-user cache settings
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+# Detached snapshot of a users row; safe to share across requests and sessions
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    role: str
+    is_approved: bool
+    address: str | None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, email=user.email, role=user.role, is_approved=user.is_approved, address=user.address)
+
+    # From access token claims alone; the token doesn't carry the address
+    @classmethod
+    def from_claims(cls, claims):
+        return cls(id=claims["uid"], email=claims["sub"], role=claims["role"], is_approved=claims["approved"], address=None)
+
+
+# TTL + LRU map of token subject -> Principal. Entries are dropped explicitly
+# when the user changes; the TTL bounds staleness for changes made by other
+# worker processes.
+class PrincipalCache:
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, email: str):
+        entry = self._entries.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+        principal, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[email]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return principal
+
+    def put(self, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        self._entries[principal.email] = (principal, time.monotonic() + self.ttl)
+        self._entries.move_to_end(principal.email)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, email: str):
+        if self._entries.pop(email, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = PrincipalCache(ttl=USER_CACHE_TTL_SECONDS, maxsize=USER_CACHE_SIZE)
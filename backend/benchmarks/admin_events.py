@@ -0,0 +1,117 @@
+# Cost of keeping admin dashboards current: after each approval, re-fetching
+# /admin/pending-users and /admin/pending-software in full (what the
+# dashboards did) against the one admin event the action now streams, and the
+# time for that event to reach every open stream. Requests go through the full
+# app over ASGI, no sockets; subscribers read event_hub.stream directly.
+#
+#   cd backend && python benchmarks/admin_events.py --pending 1000 --actions 200 --subscribers 1 10 100
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-benchmark-secret")
+
+import httpx
+from sqlalchemy import insert
+
+from admin_events import event_hub
+from database import ensure_schema, dispose_engines, get_engine
+from tokens import issue_tokens
+import main
+import models
+
+
+class Connected:
+    async def is_disconnected(self):
+        return False
+
+
+def seed(pending):
+    with get_engine().begin() as connection:
+        connection.execute(insert(models.User), [
+            {"email": "admin@example.com", "hashed_password": "x", "role": "admin", "is_approved": True},
+            *({"email": f"user-{i}@example.com", "hashed_password": "x", "role": "user", "is_approved": False}
+              for i in range(pending)),
+        ])
+        connection.execute(insert(models.Software), [
+            {"name": f"app-{i}", "version": "1.0", "hash": f"{i:064x}", "developer_email": "admin@example.com",
+             "status": models.SoftwareStatus.pending}
+            for i in range(pending)
+        ])
+
+
+async def subscriber(arrivals, ready):
+    stream = event_hub.stream(Connected())
+    async for chunk in stream:
+        if "event: ready" in chunk:
+            ready.release()
+        elif chunk.startswith("id: "):
+            arrivals.append((time.perf_counter(), len(chunk.encode())))
+
+
+async def main_(args):
+    ensure_schema()
+    seed(args.pending)
+    app = main.create_app()
+    admin = models.User(id=1, email="admin@example.com", role="admin", is_approved=True)
+    auth = {"Authorization": f"Bearer {issue_tokens(admin)['access_token']}"}
+    hashes = iter(f"{i:064x}" for i in range(args.pending))
+    event_hub.start()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Before: every action is followed by both listings
+        sizes = []
+        start = time.perf_counter()
+        for _ in range(args.actions):
+            response = await client.post(f"/admin/approve-software/{next(hashes)}", headers=auth)
+            assert response.status_code == 200, response.text
+            for path in ("/admin/pending-users", "/admin/pending-software"):
+                response = await client.get(path, headers=auth)
+                assert response.status_code == 200, response.text
+                sizes.append(len(response.content))
+        seconds = (time.perf_counter() - start) / args.actions
+        print(f"{args.pending} pending users and software, default page size")
+        print(f"  action + both listings: {seconds * 1000:7.2f} ms, {sum(sizes) / args.actions / 1024:7.1f} KiB per action")
+
+        # After: the action alone, the change pushed to each open dashboard
+        for count in args.subscribers:
+            arrivals = []
+            ready = asyncio.Semaphore(0)
+            tasks = [asyncio.create_task(subscriber(arrivals, ready)) for _ in range(count)]
+            for _ in range(count):
+                await ready.acquire()
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(args.actions):
+                arrivals.clear()
+                sent = time.perf_counter()
+                response = await client.post(f"/admin/approve-software/{next(hashes)}", headers=auth)
+                assert response.status_code == 200, response.text
+                while len(arrivals) < count:
+                    await asyncio.sleep(0)
+                latencies.append(max(arrived for arrived, _ in arrivals) - sent)
+            seconds = (time.perf_counter() - start) / args.actions
+            size = arrivals[0][1]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            print(f"  action + SSE, {count:>4} streams: {seconds * 1000:7.2f} ms, {size} bytes per stream, "
+                  f"delivered to all in {statistics.median(latencies) * 1000:.2f} ms median")
+    print(f"hub: {event_hub.stats()}")
+    await event_hub.stop()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pending", type=int, default=1000, help="pending users and pending software rows")
+    parser.add_argument("--actions", type=int, default=200, help="approvals timed per case")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100])
+    asyncio.run(main_(parser.parse_args()))
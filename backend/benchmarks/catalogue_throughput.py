@@ -0,0 +1,102 @@
+# Throughput of /software/all-approved over a 100k-row catalogue: the previous
+# handler (query + serialize on every call) against catalogue_cache hits,
+# gzip-encoded hits and conditional GETs answered with 304. Requests go
+# through the full app (middleware, auth, routing) over ASGI, no sockets.
+#
+#   cd backend && python benchmarks/catalogue_throughput.py --rows 100000 --requests 2000
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-benchmark-secret")
+
+import httpx
+from fastapi import Depends, Query
+from sqlalchemy import insert
+
+from database import ensure_schema, dispose_engines, get_engine
+from pagination import keyset_page, parse_fields, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, SOFTWARE_FIELDS
+from response_cache import catalogue_cache
+from tokens import issue_tokens
+import main
+import models
+
+
+def seed(rows):
+    with get_engine().begin() as connection:
+        connection.execute(insert(models.User), [
+            {"email": "dev@example.com", "hashed_password": "x", "role": "user", "is_approved": True}
+        ])
+        connection.execute(insert(models.Software), [
+            {"name": f"app-{i}", "version": f"1.{i % 50}", "hash": f"{i:064x}", "developer_email": "dev@example.com",
+             "status": models.SoftwareStatus.approved if i % 10 else models.SoftwareStatus.pending}
+            for i in range(rows)
+        ])
+
+
+def add_uncached_route(app):
+    @app.get("/bench/all-approved-uncached")
+    async def uncached(
+        limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+        cursor: int | None = None,
+        fields: str | None = None,
+        current_user=Depends(main.get_token_user),
+        db=Depends(main.get_db),
+    ):
+        software, next_cursor = await keyset_page(
+            db, models.Software, [models.Software.status == models.SoftwareStatus.approved],
+            parse_fields(fields, SOFTWARE_FIELDS, ["name", "version", "hash", "developer_email"]), limit, cursor
+        )
+        return {"all_approved_software": software, "next_cursor": next_cursor}
+
+
+async def measure(client, path, headers, requests, expect):
+    size = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == expect, (response.status_code, response.text[:200])
+        size = int(response.headers.get("content-length", 0))
+    return requests / (time.perf_counter() - start), size
+
+
+async def main_(args):
+    ensure_schema()
+    seed(args.rows)
+    app = main.create_app()
+    add_uncached_route(app)
+    token = issue_tokens(models.User(id=1, email="dev@example.com", role="user", is_approved=True))["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for limit in (PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT):
+            # Deep in the catalogue, where keyset pagination still has to seek
+            query = f"?limit={limit}&cursor={args.rows // 2}"
+            etag = (await client.get(f"/software/all-approved{query}", headers=auth)).headers["etag"]
+            raw = {**auth, "Accept-Encoding": "identity"}
+            cases = [
+                ("uncached (previous handler)", f"/bench/all-approved-uncached{query}", raw, 200),
+                ("cached", f"/software/all-approved{query}", raw, 200),
+                ("cached, gzip", f"/software/all-approved{query}", {**auth, "Accept-Encoding": "gzip"}, 200),
+                ("If-None-Match -> 304", f"/software/all-approved{query}", {**auth, "If-None-Match": etag}, 304),
+            ]
+            print(f"{args.rows} rows, limit={limit}")
+            for label, path, headers, expect in cases:
+                await measure(client, path, headers, 20, expect)
+                rate, size = await measure(client, path, headers, args.requests, expect)
+                print(f"  {label:<30} {rate:8.0f} req/s  {size / 1024:7.1f} KiB on the wire")
+    print(f"cache: {catalogue_cache.stats()}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main_(parser.parse_args()))
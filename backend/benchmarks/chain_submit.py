@@ -0,0 +1,92 @@
+# Time to get N approvals confirmed on a local node: one transaction at a time
+# waiting for each receipt (what the admin dashboard did through MetaMask),
+# against chain_submitter pipelining them, and batching them through
+# batchSetStatus (--batch, needs a contract deployed with it).
+#
+#   cd smart-contract && npx hardhat node            # interval mining makes the gap realistic:
+#   npx hardhat run scripts/deploy.js --network localhost
+#   cd backend && CHAIN_RPC_URL=http://127.0.0.1:8545 LICENSE_CONTRACT_ADDRESS=0x... \
+#       CHAIN_ADMIN_PRIVATE_KEY=0x<hardhat account 0 key> python benchmarks/chain_submit.py --count 100 --batch
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+os.environ["CHAIN_TX_POLL_SECONDS"] = "0.2"
+
+from sqlalchemy import insert, select
+
+from database import AsyncSessionLocal, dispose_engines, ensure_schema, get_engine
+import chain_submitter
+from chain_submitter import ChainSubmitter, Web3Chain, CHAIN_ADMIN_PRIVATE_KEY, CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS
+import models
+
+
+def new_hashes(count):
+    run = uuid.uuid4().hex[:8]
+    return [f"{run}-{i:06d}" for i in range(count)]
+
+
+def sequential(chain, hashes):
+    for software_hash in hashes:
+        for function, args in (("addSoftware", [software_hash, chain.address]), ("approveSoftware", [software_hash])):
+            tx_hash = chain.send(function, args, chain.nonce("pending"), 300000, chain.gas_price())
+            chain.w3.eth.wait_for_transaction_receipt(tx_hash, poll_latency=0.05)
+
+
+async def submitted(chain, hashes):
+    with get_engine().begin() as connection:
+        ids = connection.execute(insert(models.Software).returning(models.Software.id), [
+            {"name": h, "version": "1", "hash": h, "developer_email": "dev@example.com",
+             "status": models.SoftwareStatus.approved} for h in hashes
+        ]).scalars().all()
+        connection.execute(insert(models.ChainOperation), [
+            {"software_id": software_id, "software_hash": h, "action": "approve"} for software_id, h in zip(ids, hashes)
+        ])
+    submitter = ChainSubmitter(chain)
+    while await submitter.run_once() != 0:
+        await asyncio.sleep(chain_submitter.CHAIN_TX_POLL_SECONDS)
+    await submitter._release()
+    async with AsyncSessionLocal() as db:
+        statuses = (await db.scalars(select(models.Software.chain_status).where(models.Software.hash.in_(hashes)))).all()
+    assert statuses.count("confirmed") == len(hashes), statuses
+
+
+async def main(args):
+    if not (CHAIN_RPC_URL and LICENSE_CONTRACT_ADDRESS and CHAIN_ADMIN_PRIVATE_KEY):
+        raise SystemExit("Set CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS and CHAIN_ADMIN_PRIVATE_KEY")
+    ensure_schema()
+    chain = Web3Chain(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS, CHAIN_ADMIN_PRIVATE_KEY)
+
+    start = time.perf_counter()
+    sequential(chain, new_hashes(args.count))
+    rows = [("one at a time, wait for each", time.perf_counter() - start)]
+
+    start = time.perf_counter()
+    await submitted(chain, new_hashes(args.count))
+    rows.append((f"pipelined, {chain_submitter.CHAIN_TX_MAX_IN_FLIGHT} in flight", time.perf_counter() - start))
+
+    if args.batch:
+        if not chain.has_function(chain_submitter.BATCH_FUNCTION):
+            raise SystemExit("The deployed contract has no batchSetStatus; compile and redeploy licensemanager.sol")
+        chain_submitter.CHAIN_TX_BATCH = True
+        start = time.perf_counter()
+        await submitted(chain, new_hashes(args.count))
+        rows.append((f"batchSetStatus, {chain_submitter.CHAIN_TX_BATCH_SIZE} per tx", time.perf_counter() - start))
+
+    for label, seconds in rows:
+        print(f"{label:<32} {seconds:8.2f} s  {args.count / seconds:8.1f} approvals/s")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--batch", action="store_true", help="also measure batchSetStatus")
+    asyncio.run(main(parser.parse_args()))
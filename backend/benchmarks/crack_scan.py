@@ -0,0 +1,109 @@
+# Crack-signature scanning throughput: scanner.scan_file (one Aho-Corasick
+# pass) against searching for each signature separately with bytes.find, by
+# number of signatures, then the rescan pool's total and per-core MB/s. Scans
+# binaries from --corpus (default /usr/bin) copied into a temp directory;
+# signatures are slices of other binaries mixed with random byte strings.
+#
+#   cd backend && python benchmarks/crack_scan.py --mb 64 --signatures 10 100 1000 10000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner import scan_file, check_pattern
+
+
+def corpus_files(directory, megabytes, files):
+    paths = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory)),
+        key=lambda path: (not os.path.isfile(path) or os.path.islink(path), path),
+    )
+    data = bytearray()
+    for path in paths:
+        if len(data) >= megabytes * 1024 * 1024 or not os.path.isfile(path) or os.path.islink(path):
+            continue
+        with open(path, "rb") as f:
+            data += f.read()
+    data = bytes(data[:megabytes * 1024 * 1024])
+    tmp = tempfile.mkdtemp()
+    size = len(data) // files
+    out = []
+    for i in range(files):
+        path = os.path.join(tmp, f"build-{i}.bin")
+        with open(path, "wb") as f:
+            f.write(data[i * size:(i + 1) * size])
+        out.append(path)
+    return out, data
+
+
+def make_signatures(count, source):
+    signatures = []
+    while len(signatures) < count:
+        length = random.randint(12, 64)
+        if random.random() < 0.5:
+            offset = random.randrange(len(source) - length)
+            pattern = source[offset:offset + length]
+        else:
+            pattern = os.urandom(length)
+        try:
+            check_pattern(pattern)
+        except ValueError:
+            continue
+        signatures.append((len(signatures) + 1, pattern))
+    return signatures
+
+
+def find_each(path, signatures):
+    with open(path, "rb") as f:
+        data = f.read()
+    return {signature_id: data.find(pattern) for signature_id, pattern in signatures if pattern in data}
+
+
+def timed(fn, paths, signatures):
+    start = time.perf_counter()
+    for path in paths:
+        fn(path, *signatures)
+    return time.perf_counter() - start
+
+
+def main(args):
+    random.seed(1)
+    paths, data = corpus_files(args.corpus, args.mb, args.files)
+    megabytes = len(data) / 1e6
+    # Signatures come from the second half, so some match and most do not
+    source = data[len(data) // 2:]
+    print(f"{megabytes:.0f} MB in {len(paths)} files from {args.corpus}, single process:")
+    for generation, count in enumerate(args.signatures, 1):
+        signatures = make_signatures(count, source)
+        scan_file(paths[0], generation, signatures)  # builds the automaton
+        seconds = timed(scan_file, paths, (generation, signatures))
+        line = f"  {count:>6} signatures: Aho-Corasick {megabytes / seconds:7.1f} MB/s"
+        if count <= args.find_max:
+            seconds = timed(find_each, paths, (signatures,))
+            line += f", bytes.find per signature {megabytes / seconds:7.1f} MB/s"
+        print(line)
+
+    signatures = make_signatures(args.signatures[-1], source)
+    print(f"rescan pool, {len(signatures)} signatures:")
+    for workers in sorted({1, os.cpu_count() or 1}):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(scan_file, paths[:workers], [0] * workers, [signatures] * workers))  # warm up
+            start = time.perf_counter()
+            list(pool.map(scan_file, paths, [0] * len(paths), [signatures] * len(paths)))
+            seconds = time.perf_counter() - start
+        print(f"  {workers:>3} workers: {megabytes / seconds:7.1f} MB/s, {megabytes / seconds / workers:7.1f} MB/s per core")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="/usr/bin")
+    parser.add_argument("--mb", type=int, default=64, help="MB of corpus to scan")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--signatures", type=int, nargs="+", default=[10, 100, 1000, 10000], help="ascending")
+    parser.add_argument("--find-max", type=int, default=1000, help="largest set to also time with bytes.find")
+    main(parser.parse_args())
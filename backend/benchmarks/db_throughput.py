@@ -0,0 +1,130 @@
+# Requests/sec for concurrent login lookups and listings, comparing the old
+# blocking pattern (sync SessionLocal inside async handlers) with AsyncSession.
+#
+#   cd backend && python benchmarks/db_throughput.py --requests 2000 --concurrency 50 --query-delay-ms 2
+#
+# --query-delay-ms adds a per-query sleep inside SQLite to stand in for the
+# network round trip of a server database.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+
+
+def add_delay(sync_engine, delay):
+    @event.listens_for(sync_engine, "connect")
+    def _register(dbapi_conn, _):
+        dbapi_conn.create_function("bench_delay", 0, lambda: time.sleep(delay))
+
+
+def build_app(db_path, delay, concurrency):
+    # The blocking pattern deadlocks once concurrency exceeds the pool: sessions
+    # are closed from the threadpool, which can't run while the loop is blocked
+    # waiting for a connection. Size the pool so the baseline can finish.
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False},
+                           pool_size=concurrency, max_overflow=0)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    add_delay(engine, delay)
+    add_delay(async_engine.sync_engine, delay)
+    SyncSession = sessionmaker(bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    # Uncorrelated subquery so SQLite evaluates the delay once per statement
+    round_trip = select(func.bench_delay()).scalar_subquery().is_(None)
+
+    def user_query(email):
+        return select(models.User).where(models.User.email == email, round_trip)
+
+    def listing_query():
+        return select(models.Software).where(models.Software.status == models.SoftwareStatus.approved, round_trip)
+
+    app = FastAPI()
+
+    @app.get("/sync/login/{email}")
+    async def sync_login(email: str, db: Session = Depends(get_sync_db)):
+        return {"found": db.scalar(user_query(email)) is not None}
+
+    @app.get("/sync/listing")
+    async def sync_listing(db: Session = Depends(get_sync_db)):
+        return {"count": len(db.scalars(listing_query()).all())}
+
+    @app.get("/async/login/{email}")
+    async def async_login(email: str, db: AsyncSession = Depends(get_async_db)):
+        return {"found": await db.scalar(user_query(email)) is not None}
+
+    @app.get("/async/listing")
+    async def async_listing(db: AsyncSession = Depends(get_async_db)):
+        return {"count": len((await db.scalars(listing_query())).all())}
+
+    return app, engine, async_engine
+
+
+def seed(engine, users, software):
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all(models.User(email=f"user{i}@example.com", hashed_password="x", is_approved=True) for i in range(users))
+        db.add_all(models.Software(name=f"app{i}", version="1", hash=f"{i:064x}", developer_email="user0@example.com",
+                                   status=models.SoftwareStatus.approved) for i in range(software))
+        db.commit()
+
+
+async def drive(app, mode, total, concurrency, users):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(f"/{mode}/login/user{i % users}@example.com" if i % 2 else f"/{mode}/listing")
+
+        async def worker():
+            while not queue.empty():
+                path = queue.get_nowait()
+                response = await client.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app, engine, async_engine = build_app(os.path.join(tmp, "bench.db"), args.query_delay_ms / 1000, args.concurrency)
+        seed(engine, args.users, args.software)
+        for mode, label in (("sync", "before (sync Session)"), ("async", "after (AsyncSession)")):
+            rps = await drive(app, mode, args.requests, args.concurrency, args.users)
+            print(f"{label:<24} {rps:>10.1f} req/s")
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--software", type=int, default=200)
+    parser.add_argument("--query-delay-ms", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+# Checks with EXPLAIN QUERY PLAN that the software listing queries are served by
+# the (developer_email, status) and (status, id) indexes instead of a table scan.
+# Exits non-zero if any plan regresses.
+#
+#   cd backend && python benchmarks/explain_listing.py
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.dialects import sqlite
+
+import models
+from pagination import keyset_query
+
+Software = models.Software
+Status = models.SoftwareStatus
+FIELDS = ["name", "version", "hash", "developer_email"]
+
+# (description, filters, cursor, expected index)
+CASES = [
+    ("developer pending", [Software.developer_email == "dev1@example.com", Software.status == Status.pending], None,
+     "ix_software_developer_email_status"),
+    ("developer approved, next page", [Software.developer_email == "dev1@example.com", Software.status == Status.approved], 500,
+     "ix_software_developer_email_status"),
+    ("developer rejected", [Software.developer_email == "dev1@example.com", Software.status == Status.rejected], None,
+     "ix_software_developer_email_status"),
+    ("all approved", [Software.status == Status.approved], None, "ix_software_status_id"),
+    ("all approved, next page", [Software.status == Status.approved], 500, "ix_software_status_id"),
+    ("admin pending", [Software.status == Status.pending], None, "ix_software_status_id"),
+]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/explain.db")
+        models.Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Software), [
+                {"name": f"app{i}", "version": "1", "hash": f"{i:064x}", "developer_email": f"dev{i % 20}@example.com",
+                 "status": list(Status)[i % 3]}
+                for i in range(5000)
+            ])
+            conn.execute(text("ANALYZE"))
+
+        failures = 0
+        with engine.connect() as conn:
+            for description, filters, cursor, index in CASES:
+                query = keyset_query(Software, filters, FIELDS, 100, cursor)
+                sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+                plan = " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+                ok = f"USING INDEX {index}" in plan and "TEMP B-TREE" not in plan
+                failures += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {description:<32} {plan}")
+        engine.dispose()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
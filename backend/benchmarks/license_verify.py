@@ -0,0 +1,93 @@
+# License verification latency and throughput: a database lookup per check
+# versus the in-memory verdict cache, single and batched.
+#
+#   cd backend && python benchmarks/license_verify.py --licenses 100000 --checks 20000
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP.name}/bench.db"
+
+from sqlalchemy import insert
+
+import models
+from database import engine, async_engine
+from license_cache import license_cache, verify_licenses
+
+
+def seed(count):
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.ChainLicense), [
+            {"license_key": f"LIC-{i:08d}", "key_topic": f"0x{i:064x}", "holder_address": f"0x{i % 1000:040x}",
+             "software_name": "app", "software_hash": f"{i % 100:064x}", "is_tampered": i % 50 == 0,
+             "is_cracked": i % 70 == 0, "issued_block": i, "updated_block": i}
+            for i in range(count)
+        ])
+
+
+def report(label, latencies, elapsed, checks):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<34} p50 {statistics.median(latencies) * 1e6:>8.1f} us  p99 {p99 * 1e6:>8.1f} us"
+          f"  {checks / elapsed:>10.0f} checks/s")
+
+
+async def run_single(label, keys):
+    latencies = []
+    start = time.perf_counter()
+    for key in keys:
+        t = time.perf_counter()
+        await verify_licenses([key])
+        latencies.append(time.perf_counter() - t)
+    report(label, latencies, time.perf_counter() - start, len(keys))
+
+
+async def run_batches(label, keys, size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(keys), size):
+        t = time.perf_counter()
+        await verify_licenses(keys[i:i + size])
+        latencies.append(time.perf_counter() - t)
+    report(label, latencies, time.perf_counter() - start, len(keys))
+
+
+async def main(args):
+    seed(args.licenses)
+    rng = random.Random(1)
+    # Mostly real keys with some unknown ones, drawn from a hot set the way
+    # repeated client checks would be
+    hot = [f"LIC-{rng.randrange(args.licenses):08d}" for _ in range(args.hot)] + [f"FAKE-{i}" for i in range(args.hot // 10)]
+    keys = [rng.choice(hot) for _ in range(args.checks)]
+
+    maxsize = license_cache.maxsize
+    license_cache.maxsize = 0
+    await run_single("before: database per check", keys)
+    license_cache.maxsize = maxsize
+
+    await run_single("after: cold cache (each key once)", hot)
+    await run_single("after: warm cache", keys)
+    await run_batches(f"after: warm cache, batch of {args.batch}", keys, args.batch)
+    license_cache.clear()
+    await run_batches(f"after: cold cache, batch of {args.batch}", keys, args.batch)
+    print(license_cache.stats())
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--licenses", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--hot", type=int, default=5000, help="distinct keys checked")
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
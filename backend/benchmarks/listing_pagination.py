@@ -0,0 +1,95 @@
+# Software listing cost at catalogue scale: the old full ORM .all() listing
+# versus keyset pages of plain columns.
+#
+#   cd backend && python benchmarks/listing_pagination.py --rows 100000 --limit 100
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import models
+from pagination import keyset_page
+
+
+def seed(db_path, rows):
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Software), [
+            {"name": f"app{i}", "version": "1.0", "hash": f"{i:064x}",
+             "developer_email": f"dev{i % 50}@example.com",
+             "status": models.SoftwareStatus.approved if i % 3 == 0 else models.SoftwareStatus.pending}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+async def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = await fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<38} {count:>8} rows {elapsed * 1000:>10.1f} ms {peak / 1e6:>8.1f} MB peak")
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, args.rows)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        filters = [models.Software.status == models.SoftwareStatus.approved]
+        fields = ["name", "version", "hash", "developer_email"]
+        PAGE_SIZE = 1000
+
+        async with AsyncSession(engine) as db:
+            async def full_orm_listing():
+                software = (await db.scalars(select(models.Software).where(*filters))).all()
+                body = [{"name": s.name, "version": s.version, "hash": s.hash, "developer_email": s.developer_email}
+                        for s in software]
+                db.expunge_all()
+                return len(body)
+
+            async def first_page():
+                items, _ = await keyset_page(db, models.Software, filters, fields, args.limit, None)
+                return len(items)
+
+            async def deep_page():
+                # Cursor near the end of the table: keyset cost does not grow with depth
+                items, _ = await keyset_page(db, models.Software, filters, fields, args.limit, args.rows - args.limit * 4)
+                return len(items)
+
+            async def projected_page():
+                items, _ = await keyset_page(db, models.Software, filters, ["hash"], args.limit, None)
+                return len(items)
+
+            async def walk_all_pages():
+                total, cursor = 0, None
+                while True:
+                    items, cursor = await keyset_page(db, models.Software, filters, fields, PAGE_SIZE, cursor)
+                    total += len(items)
+                    if cursor is None:
+                        return total
+
+            await measure("before: full ORM listing", full_orm_listing)
+            await measure(f"after: first page (limit={args.limit})", first_page)
+            await measure(f"after: deep page (limit={args.limit})", deep_page)
+            await measure("after: first page, fields=hash", projected_page)
+            await measure(f"after: walk all pages (limit={PAGE_SIZE})", walk_all_pages)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,347 @@
+# End-to-end load test of the flow the dashboards drive: register -> approve ->
+# login -> OTP -> upload -> list, then a mixed workload. Boots main.py under
+# uvicorn against a temporary database and a local SMTP server that captures
+# the OTP emails, and reports throughput, p50/p95/p99 latency and server memory
+# per phase and endpoint.
+#
+#   pip install aiosmtpd httpx
+#   cd backend && python benchmarks/load_test.py --users 50 --concurrency 16 --output results.json
+#   cd backend && python benchmarks/load_test.py --compare results.json   # exits 1 on regression
+#
+# --database-url points the server at another database (e.g. a scratch
+# Postgres); it must be empty.
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from email import message_from_bytes
+
+import httpx
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "Passw0rd!"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Fake SMTP server; remembers the latest OTP sent to each address
+class OtpCatcher:
+    def __init__(self):
+        self.otps = {}
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        message = message_from_bytes(envelope.content)
+        match = re.search(r"\b(\d{6})\b", message.get_payload(decode=True).decode(errors="replace"))
+        if match and "OTP" in message["Subject"]:
+            for recipient in envelope.rcpt_tos:
+                self.otps[recipient] = match.group(1)
+        return "250 Message accepted"
+
+
+# Resident memory of the server and its worker processes, from /proc (Linux)
+def rss_mb(pid):
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+class Recorder:
+    def __init__(self, server_pid):
+        self.server_pid = server_pid
+        self.phases = {}
+
+    async def phase(self, name, jobs, concurrency):
+        latencies = {}
+        errors = {}
+        semaphore = asyncio.Semaphore(concurrency)
+        peak = start_rss = rss_mb(self.server_pid)
+        done = asyncio.Event()
+
+        async def sample_memory():
+            nonlocal peak
+            while not done.is_set():
+                peak = max(peak, rss_mb(self.server_pid))
+                await asyncio.sleep(0.05)
+
+        async def run(job):
+            async with semaphore:
+                await job(timed)
+
+        # Each job calls timed(endpoint, request coroutine) for every request it makes
+        async def timed(endpoint, request):
+            t0 = time.perf_counter()
+            response = await request
+            latencies.setdefault(endpoint, []).append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+            return response
+
+        sampler = asyncio.create_task(sample_memory())
+        start = time.perf_counter()
+        await asyncio.gather(*(run(job) for job in jobs))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await sampler
+
+        requests = sum(len(values) for values in latencies.values())
+        self.phases[name] = {
+            "duration_s": round(elapsed, 3),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1),
+            "rss_mb_start": round(start_rss, 1),
+            "rss_mb_peak": round(peak, 1),
+            "endpoints": {endpoint: summarize(values, errors.get(endpoint, 0)) for endpoint, values in sorted(latencies.items())},
+        }
+        print(f"{name:<10} {requests:>6} requests {elapsed:>7.2f} s {requests / elapsed:>8.1f} req/s  rss peak {peak:.0f} MB")
+        for endpoint, stats in self.phases[name]["endpoints"].items():
+            print(f"    {endpoint:<36} n={stats['count']:<6} p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  "
+                  f"p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}")
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(values, errors):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+async def wait_for_otp(catcher, email, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        otp = catcher.otps.pop(email, None)
+        if otp:
+            return otp
+        await asyncio.sleep(0.01)
+    raise TimeoutError(f"No OTP email for {email}")
+
+
+async def login(client, catcher, email, timed):
+    catcher.otps.pop(email, None)
+    await timed("POST /users/login", client.post("/users/login", json={"email": email, "password": PASSWORD}))
+    otp = await wait_for_otp(catcher, email)
+    response = await timed("POST /users/verify-otp", client.post("/users/verify-otp", json={"email": email, "otp": otp}))
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def untimed(endpoint, request):
+    return await request
+
+
+async def run_workload(args, client, catcher, recorder):
+    rng = random.Random(args.seed)
+    emails = [f"user{i}@example.com" for i in range(args.users)]
+    tokens = {}
+    hashes = []
+
+    (await client.post("/admin/create-admin", json={"email": "admin@example.com", "password": PASSWORD})).raise_for_status()
+    admin = await login(client, catcher, "admin@example.com", untimed)
+
+    def register(email):
+        async def job(timed):
+            await timed("POST /users/register", client.post("/users/register", json={"email": email, "password": PASSWORD}))
+        return job
+
+    def approve(email):
+        async def job(timed):
+            await timed("POST /admin/approve-user/{email}", client.post(f"/admin/approve-user/{email}", headers=admin))
+        return job
+
+    def sign_in(email):
+        async def job(timed):
+            tokens[email] = await login(client, catcher, email, timed)
+        return job
+
+    def upload(email, n):
+        async def job(timed):
+            payload = rng.randbytes(args.upload_kb * 1024)
+            response = await timed("POST /software/upload", client.post(
+                "/software/upload", data={"name": f"app-{email}-{n}", "version": "1.0"},
+                files={"file": (f"app{n}.bin", payload)}, headers=tokens[email]))
+            if response.status_code == 200:
+                hashes.append(response.json()["hash"])
+        return job
+
+    def list_approved(email):
+        async def job(timed):
+            await timed("GET /software/all-approved", client.get("/software/all-approved", headers=tokens[email]))
+            await timed("GET /software/pending", client.get("/software/pending", headers=tokens[email]))
+        return job
+
+    await recorder.phase("register", [register(email) for email in emails], args.concurrency)
+    await recorder.phase("approve", [approve(email) for email in emails], args.concurrency)
+    await recorder.phase("login", [sign_in(email) for email in emails], args.concurrency)
+    await recorder.phase("upload", [upload(email, n) for email in emails for n in range(args.uploads)], args.concurrency)
+    await recorder.phase("list", [list_approved(email) for email in emails], args.concurrency)
+
+    # Approve half of the catalogue so listings have something to return
+    approved = hashes[::2]
+    for i in range(0, len(approved), 500):
+        (await client.post("/admin/bulk-approve-software", json={"hashes": approved[i:i + 500]}, headers=admin)).raise_for_status()
+
+    # Weighted the way the dashboards poll: mostly reads, some writes
+    logging_in = set()
+
+    def mixed_job(i):
+        email = rng.choice(emails)
+        roll = rng.random()
+
+        async def job(timed):
+            headers = tokens[email]
+            if roll < 0.40:
+                await timed("GET /software/all-approved", client.get("/software/all-approved", headers=headers))
+            elif roll < 0.60:
+                await timed("GET /software/summary", client.get("/software/summary", headers=headers))
+            elif roll < 0.72:
+                await timed("GET /users/me", client.get("/users/me", headers=headers))
+            elif roll < 0.82:
+                await timed("GET /software/approved", client.get("/software/approved", headers=headers))
+            elif roll < 0.90:
+                await timed("GET /licenses/verify", client.get("/licenses/verify", params={"license_key": f"LIC-{i}"}))
+            elif roll < 0.96:
+                await upload(email, f"m{i}")(timed)
+            elif email in logging_in:
+                # One login per user at a time, or the OTP emails cross
+                await timed("GET /users/me", client.get("/users/me", headers=headers))
+            else:
+                logging_in.add(email)
+                try:
+                    tokens[email] = await login(client, catcher, email, timed)
+                finally:
+                    logging_in.discard(email)
+        return job
+
+    await recorder.phase("mixed", [mixed_job(i) for i in range(args.mixed)], args.concurrency)
+
+
+# Compare p95 latency and throughput against a saved run
+def compare(baseline, current, tolerance):
+    regressions = []
+    for phase, result in current["phases"].items():
+        before = baseline["phases"].get(phase)
+        if before is None:
+            continue
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{phase}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        for endpoint, stats in result["endpoints"].items():
+            old = before["endpoints"].get(endpoint)
+            if old and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{phase} {endpoint}: p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+    return regressions
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp()
+    smtp_port, http_port = free_port(), free_port()
+    catcher = OtpCatcher()
+    controller = Controller(catcher, hostname="127.0.0.1", port=smtp_port, auth_require_tls=False,
+                            authenticator=lambda *a: AuthResult(success=True))
+    controller.start()
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{tmp}/load.db",
+        UPLOAD_DIR=os.path.join(tmp, "uploads"),
+        JWT_SECRET="load-test-secret",
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(smtp_port),
+        SMTP_USERNAME="admin@example.com",
+        SMTP_PASSWORD="load-test",
+        SMTP_USE_TLS="false",
+        BCRYPT_ROUNDS=str(args.bcrypt_rounds),
+        MAIL_POLL_SECONDS="0.1",
+        # Every simulated user comes from 127.0.0.1
+        RATE_LIMIT_ENABLED="false",
+    )
+    server_log = open(os.path.join(tmp, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(http_port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT,
+    )
+    print(f"Server log: {server_log.name}")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{http_port}", timeout=60,
+                                     limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            for _ in range(200):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            recorder = Recorder(server.pid)
+            await run_workload(args, client, catcher, recorder)
+    finally:
+        server.terminate()
+        server.wait()
+        server_log.close()
+        controller.stop()
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "database_url")},
+        "python": sys.version.split()[0],
+        "phases": recorder.phases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--uploads", type=int, default=2, help="uploads per user in the upload phase")
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--mixed", type=int, default=2000, help="operations in the mixed phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="12 matches production cost")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before --compare fails")
+    asyncio.run(main(parser.parse_args()))
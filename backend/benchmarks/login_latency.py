@@ -0,0 +1,87 @@
+# /users/login latency with the outbox mailer against a local aiosmtpd server.
+#
+#   pip install aiosmtpd
+#   cd backend && python benchmarks/login_latency.py --logins 200 --smtp-delay-ms 300
+#
+# --smtp-delay-ms makes the stand-in server slow to accept each message; login
+# latency should not move with it because handlers only enqueue.
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SlowHandler:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        return "250 Message accepted"
+
+
+def main(args):
+    tmp = tempfile.mkdtemp()
+    handler = SlowHandler(args.smtp_delay_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.smtp_port, auth_require_tls=False,
+                            authenticator=lambda *a: AuthResult(success=True))
+    controller.start()
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+        JWT_SECRET="benchmark-secret",
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(args.smtp_port),
+        SMTP_USERNAME="bench@example.com",
+        SMTP_PASSWORD="bench",
+        SMTP_USE_TLS="false",
+        BCRYPT_ROUNDS="4",
+        MAIL_POLL_SECONDS="0.2",
+    )
+
+    import bcrypt
+    from fastapi.testclient import TestClient
+    import models
+    from database import SessionLocal
+    from main import app
+
+    with TestClient(app) as client:
+        with SessionLocal() as db:
+            db.add(models.User(email="bench@example.com", role="user", is_approved=True,
+                               hashed_password=bcrypt.hashpw(b"Passw0rd!", bcrypt.gensalt(4)).decode()))
+            db.commit()
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.logins):
+            t0 = time.perf_counter()
+            response = client.post("/users/login", json={"email": "bench@example.com", "password": "Passw0rd!"})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            response.raise_for_status()
+        while handler.received < args.logins:
+            time.sleep(0.05)
+        drained = time.perf_counter() - start
+
+    controller.stop()
+    latencies.sort()
+    print(f"logins: {args.logins}, smtp delay: {args.smtp_delay_ms} ms")
+    print(f"login p50 {statistics.median(latencies):.2f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms  max {latencies[-1]:.2f} ms")
+    print(f"all OTP emails delivered after {drained:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--smtp-delay-ms", type=float, default=300)
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    main(parser.parse_args())
@@ -0,0 +1,74 @@
+# Per-request cost of MetricsMiddleware and per-call cost of track(), measured
+# by driving a trivial FastAPI route directly over ASGI (no sockets).
+#
+#   cd backend && python benchmarks/metrics_overhead.py --requests 20000
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+
+from metrics import MetricsMiddleware, registry, track
+
+
+def make_app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(), "root_path": "", "query_string": b"",
+            "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(args):
+    plain_app, instrumented_app = make_app(False), make_app(True)
+    await drive(plain_app, 1000)
+    await drive(instrumented_app, 1000)
+    # Alternate runs so warm-up and CPU frequency drift hit both equally
+    plain = instrumented = 0
+    for _ in range(3):
+        plain += await drive(plain_app, args.requests) / 3
+        instrumented += await drive(instrumented_app, args.requests) / 3
+    print(f"plain route         {plain * 1e6:8.1f} us/request")
+    print(f"with middleware     {instrumented * 1e6:8.1f} us/request (+{(instrumented - plain) * 1e6:.1f} us)")
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        with track("bench", "noop"):
+            pass
+    print(f"track() block       {(time.perf_counter() - start) / args.requests * 1e6:8.2f} us/call")
+
+    start = time.perf_counter()
+    body = registry.render()
+    print(f"render /metrics     {(time.perf_counter() - start) * 1000:8.2f} ms ({len(body.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+# Cost of the rate limiter per request, and a check that limits hold across
+# worker processes sharing the SQLite bucket file.
+#
+#   cd backend && python benchmarks/rate_limit_overhead.py --requests 20000 --processes 4
+#
+# 1. take() for an IP + email pair, memory and SQLite backends
+# 2. a JSON POST route over ASGI with and without Depends(rate_limit)
+# 3. --processes workers spending from one bucket of --capacity tokens with
+#    no refill: exactly --capacity requests may succeed in total
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import Depends, FastAPI
+from pydantic import BaseModel
+
+import rate_limit
+from rate_limit import Bucket, MemoryRateLimiter, SqliteRateLimiter
+
+# Large enough that nothing is rejected while timing
+OPEN_IP = Bucket("ip", 10 ** 9, 10 ** 9)
+OPEN_EMAIL = Bucket("email", 10 ** 9, 10 ** 9)
+
+
+def time_take(limiter, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        limiter.take([(OPEN_IP, f"10.0.{i % 256}.1"), (OPEN_EMAIL, f"user{i % 1000}@example.com")])
+    return (time.perf_counter() - start) / requests
+
+
+class Login(BaseModel):
+    email: str
+    password: str
+
+
+def make_app(limited: bool):
+    app = FastAPI()
+    dependencies = [Depends(rate_limit.rate_limit)] if limited else []
+
+    @app.post("/users/login", dependencies=dependencies)
+    async def login(user: Login):
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app, requests):
+    body = b'{"email": "user@example.com", "password": "Passw0rd!"}'
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/users/login", "raw_path": b"/users/login", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def spend(path, capacity, attempts, results):
+    limiter = SqliteRateLimiter(path)
+    bucket = Bucket("ip", capacity, 0)
+    allowed = 0
+    start = time.perf_counter()
+    for _ in range(attempts):
+        if limiter.take([(bucket, "shared")]) == 0:
+            allowed += 1
+    results.put((allowed, attempts / (time.perf_counter() - start)))
+    limiter.close()
+
+
+def main(args):
+    tmp = tempfile.mkdtemp()
+    memory = MemoryRateLimiter()
+    sqlite = SqliteRateLimiter(os.path.join(tmp, "bench.db"))
+    time_take(memory, 1000)
+    time_take(sqlite, 1000)
+    print(f"take(), memory backend     {time_take(memory, args.requests) * 1e6:8.1f} us")
+    print(f"take(), sqlite backend     {time_take(sqlite, args.requests) * 1e6:8.1f} us")
+    sqlite.close()
+
+    rate_limit.IP_BUCKET, rate_limit.EMAIL_BUCKET = OPEN_IP, OPEN_EMAIL
+    rate_limit.rate_limiter = SqliteRateLimiter(os.path.join(tmp, "route.db"))
+    plain, limited = make_app(False), make_app(True)
+    asyncio.run(drive(plain, 1000))
+    asyncio.run(drive(limited, 1000))
+    plain_cost, limited_cost = asyncio.run(drive(plain, args.requests)), asyncio.run(drive(limited, args.requests))
+    print(f"POST route                 {plain_cost * 1e6:8.1f} us/request")
+    print(f"POST route + rate_limit    {limited_cost * 1e6:8.1f} us/request (+{(limited_cost - plain_cost) * 1e6:.1f} us)")
+
+    path = os.path.join(tmp, "shared.db")
+    SqliteRateLimiter(path).take([(Bucket("warmup", 1, 1), "x")])  # create the file before the race
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=spend, args=(path, args.capacity, args.attempts, results))
+               for _ in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    allowed = sum(allowed for allowed, _ in outcomes)
+    rate = sum(rate for _, rate in outcomes)
+    print(f"{args.processes} processes x {args.attempts} attempts on one {args.capacity}-token bucket: "
+          f"{allowed} allowed ({'OK' if allowed == args.capacity else 'OVERSPENT' if allowed > args.capacity else 'UNDERSPENT'}), "
+          f"{rate:.0f} takes/s combined")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=1000)
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+# Reconciliation cost against catalogue size and number of differences:
+# reconcile.Reconciler (digest buckets, only mismatched ones read) against a
+# full comparison of both tables, the local stand-in for a getAllSoftware()
+# dump. The chain side is the indexed chain_software table; no node needed.
+#
+#   cd backend && python benchmarks/reconcile_scaling.py --rows 10000 100000 --drift 0 10 100 1000
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+import logging
+
+from sqlalchemy import delete, insert, select, update
+
+from chain_indexer import topic_of
+from database import AsyncSessionLocal, dispose_engines, ensure_schema, get_engine
+from reconcile import Reconciler
+import digests
+import models
+import reconcile
+
+logging.getLogger("reconcile").setLevel(logging.ERROR)
+reconcile.RECONCILE_MAX_BUCKETS = digests.BUCKETS  # examine every mismatch in one run
+STATUSES = list(models.SoftwareStatus)
+
+
+def seed(rows):
+    with get_engine().begin() as connection:
+        for table in (models.Software, models.ChainSoftware, models.DigestBucket):
+            connection.execute(delete(table))
+        software, chain = [], []
+        for i in range(rows):
+            software_hash = f"{i:064x}"
+            topic = topic_of(software_hash)
+            status = STATUSES[i % 3]
+            software.append({"name": f"app-{i}", "version": "1", "hash": software_hash, "hash_topic": topic,
+                             "developer_email": "dev@example.com", "status": status})
+            chain.append({"hash_topic": topic, "hash": software_hash, "developer_address": "0x0", "status": status,
+                          "added_block": 1, "updated_block": 1})
+        connection.execute(insert(models.Software), software)
+        connection.execute(insert(models.ChainSoftware), chain)
+
+
+# Flip chain_software rows to another status, as the indexer would
+async def add_drift(indices):
+    async with AsyncSessionLocal() as db:
+        for i in indices:
+            topic = topic_of(f"{i:064x}")
+            old = STATUSES[i % 3]
+            new = STATUSES[(i + 1) % 3]
+            await db.execute(update(models.ChainSoftware).where(models.ChainSoftware.hash_topic == topic).values(status=new))
+            await digests.record_changes(db, "chain", [(topic, old, new)])
+        await db.commit()
+
+
+async def full_compare():
+    async with AsyncSessionLocal() as db:
+        ours = dict((await db.execute(select(models.Software.hash_topic, models.Software.status))).all())
+        theirs = dict((await db.execute(select(models.ChainSoftware.hash_topic, models.ChainSoftware.status))).all())
+    return [topic for topic in ours.keys() | theirs.keys() if ours.get(topic) != theirs.get(topic)]
+
+
+async def main(args):
+    ensure_schema()
+    try:
+        for rows in args.rows:
+            seed(rows)
+            reconciler = Reconciler()
+            start = time.perf_counter()
+            await reconciler.run()  # first run builds both sides' digests
+            print(f"{rows} rows: initial digest build {time.perf_counter() - start:.2f}s")
+            drifted = random.sample(range(rows), max(args.drift))
+            total = 0
+            for drift in args.drift:
+                await add_drift(drifted[total:drift])
+                total = drift
+                start = time.perf_counter()
+                report = await reconciler.run()
+                reconcile_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                differences = await full_compare()
+                full_seconds = time.perf_counter() - start
+                assert len(report["drift"]) == len(differences) == drift, (len(report["drift"]), len(differences), drift)
+                print(f"  {drift:>5} differences: reconcile {reconcile_seconds * 1000:8.1f} ms "
+                      f"({report['mismatched_buckets']} buckets read), full comparison {full_seconds * 1000:8.1f} ms")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--drift", type=int, nargs="+", default=[0, 10, 100, 1000], help="ascending")
+    asyncio.run(main(parser.parse_args()))
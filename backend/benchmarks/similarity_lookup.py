@@ -0,0 +1,75 @@
+# Near-duplicate detection: sketching throughput, detection of patched builds,
+# and LSH lookup time against a linear scan as the catalogue grows.
+#
+#   cd backend && python benchmarks/similarity_lookup.py --catalogue 100000
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from similarity import MINHASH_BINS, SimilarityIndex, similarity, sketch_bytes
+
+
+def random_signature(rng):
+    return array("I", (rng.getrandbits(32) for _ in range(MINHASH_BINS))).tobytes()
+
+
+def variants(base, rng):
+    patched = bytearray(base)
+    for offset in rng.sample(range(len(base)), 4):
+        patched[offset] ^= 0xFF
+    inserted = base[:len(base) // 2] + b"\x90" * 37 + base[len(base) // 2:]
+    return {
+        "4 bytes patched in place": bytes(patched),
+        "37 bytes inserted mid-file": inserted,
+        "truncated by 10%": base[:len(base) * 9 // 10],
+        "unrelated file": rng.randbytes(len(base)),
+    }
+
+
+def main(args):
+    rng = random.Random(7)
+    base = rng.randbytes(args.size)
+
+    start = time.perf_counter()
+    base_signature = sketch_bytes(base)
+    elapsed = time.perf_counter() - start
+    print(f"sketch {args.size / 1e6:.0f} MB: {elapsed * 1000:.0f} ms ({args.size / 1e6 / elapsed:.0f} MB/s)")
+
+    sketches = {label: sketch_bytes(data) for label, data in variants(base, rng).items()}
+    for label, signature in sketches.items():
+        print(f"  {label:<28} similarity {similarity(base_signature, signature):.2f}")
+    query = sketches["4 bytes patched in place"]
+
+    # Random signatures stand in for the rest of the catalogue; the original
+    # build sits in the middle
+    index = SimilarityIndex()
+    signatures = []
+    for software_id in range(1, args.catalogue + 1):
+        signature = base_signature if software_id == args.catalogue // 2 else random_signature(rng)
+        signatures.append(signature)
+        index.add(software_id, signature)
+        if software_id in (1000, 10000, 100000) or software_id == args.catalogue:
+            start = time.perf_counter()
+            for _ in range(args.queries):
+                index.query(query)
+            lsh = (time.perf_counter() - start) / args.queries
+
+            start = time.perf_counter()
+            linear = [i for i, s in enumerate(signatures) if similarity(query, s) >= index.threshold]
+            scan = time.perf_counter() - start
+            print(f"catalogue {software_id:>7}: LSH {lsh * 1000:8.3f} ms  linear scan {scan * 1000:9.1f} ms"
+                  f"  matches {index.query(query)} vs {len(linear)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--catalogue", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="bytes in the sketched file")
+    parser.add_argument("--queries", type=int, default=100)
+    main(parser.parse_args())
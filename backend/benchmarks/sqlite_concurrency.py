@@ -0,0 +1,117 @@
+# Reader latency while writers commit, for SQLite in the old rollback-journal
+# configuration (what create_engine() gave us by default) and in WAL mode as
+# configured by database.configure_sqlite. Writers insert uploads the way
+# /software/upload does; readers run the approved-catalogue listing.
+#
+#   cd backend && python benchmarks/sqlite_concurrency.py --readers 8 --writers 2 --seconds 5
+#
+# In rollback-journal mode a committing writer takes an exclusive lock and
+# readers sleep in SQLite's busy handler until it is released; in WAL mode
+# readers never wait for writers. With --busy-timeout-ms 0 every read that
+# would have waited fails with "database is locked" instead, so the read
+# error count is the number of times a writer blocked a reader.
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import configure_sqlite
+import models
+
+MODES = {
+    "rollback journal": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "WAL": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+}
+
+
+def seed(Session, rows):
+    with Session() as db:
+        db.add(models.User(email="dev@example.com", hashed_password="x", is_approved=True))
+        db.add_all(
+            models.Software(name=f"seed-{i}", version="1.0", hash=hashlib.sha256(f"seed-{i}".encode()).hexdigest(),
+                            developer_email="dev@example.com", status=models.SoftwareStatus.approved)
+            for i in range(rows)
+        )
+        db.commit()
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", pool_size=args.readers + args.writers)
+        configure_sqlite(engine, busy_timeout_ms=args.busy_timeout_ms, **MODES[mode])
+        models.Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        seed(Session, args.seed_rows)
+
+        stop = threading.Event()
+        read_latencies, write_latencies = [], []
+        errors = {"read": 0, "write": 0}
+        counter = iter(range(10 ** 9))
+
+        def writer():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    with Session() as db:
+                        for _ in range(args.rows_per_commit):
+                            n = next(counter)
+                            db.add(models.Software(name=f"upload-{n}", version="1.0",
+                                                   hash=hashlib.sha256(f"upload-{n}".encode()).hexdigest(),
+                                                   developer_email="dev@example.com"))
+                        db.commit()
+                    write_latencies.append(time.perf_counter() - start)
+                except OperationalError:
+                    errors["write"] += 1
+
+        def reader():
+            query = (select(models.Software)
+                     .where(models.Software.status == models.SoftwareStatus.approved)
+                     .order_by(models.Software.id).limit(50))
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    with Session() as db:
+                        db.scalars(query).all()
+                    read_latencies.append(time.perf_counter() - start)
+                except OperationalError:
+                    errors["read"] += 1
+
+        threads = ([threading.Thread(target=writer) for _ in range(args.writers)]
+                   + [threading.Thread(target=reader) for _ in range(args.readers)])
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    reads = sorted(read_latencies)
+    print(f"{mode:<17} reads {len(reads) / args.seconds:8.0f}/s  "
+          f"p50 {statistics.median(reads) * 1000:6.2f} ms  p99 {reads[int(len(reads) * 0.99)] * 1000:7.2f} ms  "
+          f"max {reads[-1] * 1000:7.1f} ms  locked {errors['read']:5d} | "
+          f"commits {len(write_latencies) / args.seconds:6.0f}/s  errors {errors['write']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rows-per-commit", type=int, default=20)
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    args = parser.parse_args()
+    for mode in MODES:
+        run(mode, args)
@@ -0,0 +1,108 @@
+# Cold-start cost of the app: how long `import main` takes in a fresh
+# interpreter, and how long `uvicorn main:app --workers N` takes from spawn
+# until every worker has finished starting up. Each run uses a new temporary
+# database, so the first run includes schema creation.
+#
+#   cd backend && python benchmarks/startup_time.py --workers 4 --runs 5
+#
+# To compare with another checkout (e.g. the previous commit):
+#   git worktree add /tmp/before HEAD~1
+#   cd backend && python benchmarks/startup_time.py --backend-dir /tmp/before/backend
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def environment(tmp):
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp}/startup.db",
+        UPLOAD_DIR=os.path.join(tmp, "uploads"),
+        JWT_SECRET="startup-secret",
+        # Nothing listens here; the app must start without reaching SMTP
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(free_port()),
+        SMTP_USERNAME="admin@example.com",
+        SMTP_PASSWORD="startup",
+        SMTP_USE_TLS="false",
+        CHAIN_RPC_URL="",
+    )
+
+
+def import_time(backend_dir):
+    with tempfile.TemporaryDirectory() as tmp:
+        code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, env=environment(tmp),
+                                capture_output=True, text=True, check=True).stdout
+        return float(output.split()[-1])
+
+
+# Seconds from spawning uvicorn until the first worker answers a request, and
+# until every worker has finished its lifespan startup (each logs "Application
+# startup complete" once it is accepting connections)
+def time_to_ready(backend_dir, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+             "--log-level", "info"],
+            cwd=backend_dir, env=environment(tmp), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            first = None
+            while first is None:
+                if server.poll() is not None or time.perf_counter() - start > 60:
+                    raise RuntimeError(f"server in {backend_dir} did not start")
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json", timeout=5).read()
+                    first = time.perf_counter() - start
+                except (urllib.error.URLError, ConnectionError):
+                    time.sleep(0.01)
+            started = 0
+            for line in server.stderr:
+                if "Application startup complete" in line:
+                    started += 1
+                    if started == workers:
+                        break
+            return first, time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def report(label, values):
+    print(f"{label:<28} median {statistics.median(values) * 1000:7.0f} ms  "
+          f"min {min(values) * 1000:7.0f} ms  max {max(values) * 1000:7.0f} ms")
+
+
+def main(args):
+    backend_dir = os.path.abspath(args.backend_dir or BACKEND_DIR)
+    print(f"Backend: {backend_dir}")
+    report("import main", [import_time(backend_dir) for _ in range(args.runs)])
+    runs = [time_to_ready(backend_dir, args.workers) for _ in range(args.runs)]
+    report("first response", [first for first, _ in runs])
+    report(f"{args.workers} workers serving", [ready for _, ready in runs])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend-dir", help="backend directory of another checkout to measure instead")
+    main(parser.parse_args())
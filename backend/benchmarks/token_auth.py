@@ -0,0 +1,75 @@
+# Per-request cost of authenticating a bearer token: the old decode-then-load
+# path (jwt.decode + users lookup) against the claims-only path used by
+# read-only endpoints (decode_token, served from the verified-token cache).
+#
+#   cd backend && python benchmarks/token_auth.py --requests 20000
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-benchmark-secret")
+
+import jwt
+from sqlalchemy import select
+
+from auth_cache import Principal
+from database import AsyncSessionLocal, dispose_engines, ensure_schema
+from tokens import ALGORITHM, JWT_SECRET, decode_token, issue_tokens, token_cache
+import models
+
+
+async def per_call(fn, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        await fn()
+    return (time.perf_counter() - start) / requests
+
+
+async def main(args):
+    ensure_schema()
+    async with AsyncSessionLocal() as db:
+        user = models.User(email="dev@example.com", hashed_password="x", role="user", is_approved=True)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    legacy_token = jwt.encode({"email": user.email, "role": user.role}, JWT_SECRET, algorithm=ALGORITHM)
+    access_token = issue_tokens(user)["access_token"]
+
+    # Old get_current_user on a principal cache miss
+    async def legacy():
+        email = jwt.decode(legacy_token, JWT_SECRET, algorithms=[ALGORITHM])["email"]
+        async with AsyncSessionLocal() as db:
+            Principal.from_user(await db.scalar(select(models.User).where(models.User.email == email)))
+
+    async def decode_only():
+        jwt.decode(legacy_token, JWT_SECRET, algorithms=[ALGORITHM])
+
+    async def claims_cold():
+        token_cache._entries.clear()
+        Principal.from_claims(decode_token(access_token))
+
+    async def claims_warm():
+        Principal.from_claims(decode_token(access_token))
+
+    await per_call(legacy, 200)
+    rows = [
+        ("jwt.decode + users SELECT", await per_call(legacy, args.requests // 10)),
+        ("jwt.decode only", await per_call(decode_only, args.requests)),
+        ("claims, token cache miss", await per_call(claims_cold, args.requests)),
+        ("claims, token cache hit", await per_call(claims_warm, args.requests)),
+    ]
+    for label, seconds in rows:
+        print(f"{label:<28} {seconds * 1e6:8.2f} us/request")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+# Peak memory of the streaming upload pipeline as file size grows.
+#
+#   cd backend && python benchmarks/upload_memory.py --sizes 16 64 256
+#
+# Peak Python allocations should stay around one chunk regardless of file size.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+
+import storage
+
+
+def make_file(path, size_mb):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+async def run(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.UPLOAD_DIR = os.path.join(tmp, "store")
+        print(f"{'size MB':>8} {'peak MB':>8} {'MB/s':>8}")
+        for size_mb in sizes:
+            src = os.path.join(tmp, f"src-{size_mb}.bin")
+            make_file(src, size_mb)
+            with open(src, "rb") as fh:
+                upload = UploadFile(file=fh, filename=os.path.basename(src))
+                tracemalloc.start()
+                start = time.perf_counter()
+                await storage.store_upload(upload, max_size=size_mb * 1024 * 1024)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            print(f"{size_mb:>8} {peak / 1e6:>8.2f} {size_mb / elapsed:>8.1f}")
+            os.unlink(src)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256])
+    asyncio.run(run(parser.parse_args().sizes))
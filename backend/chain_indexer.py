@@ -0,0 +1,443 @@
+from sqlalchemy import select, delete
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from license_cache import license_cache
+from digests import record_changes, reset as reset_digests
+import models
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Indexer settings
+CHAIN_RPC_URL = os.getenv("CHAIN_RPC_URL")
+LICENSE_CONTRACT_ADDRESS = os.getenv("LICENSE_CONTRACT_ADDRESS")
+INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "0"))
+INDEXER_BATCH_BLOCKS = int(os.getenv("INDEXER_BATCH_BLOCKS", "2000"))
+# Stay this many blocks behind the head; 0 indexes up to the latest block
+INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "0"))
+# How far to rewind when the checkpoint block is no longer canonical
+INDEXER_REORG_DEPTH = int(os.getenv("INDEXER_REORG_DEPTH", "12"))
+INDEXER_POLL_SECONDS = float(os.getenv("INDEXER_POLL_SECONDS", "5"))
+
+# Columns saved before an event changes a row, so a reorg can put them back
+SOFTWARE_FIELDS = ("hash", "developer_address", "status", "added_block", "updated_block")
+LICENSE_FIELDS = ("key_topic", "holder_address", "software_name", "software_hash", "is_tampered", "is_cracked",
+                  "issued_block", "updated_block")
+
+ABI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LicenseManager.json")
+with open(ABI_PATH) as f:
+    ABI = json.load(f)["abi"]
+EVENT_INPUTS = {e["name"]: {i["name"]: i["type"] for i in e["inputs"]} for e in ABI if e["type"] == "event"}
+
+
+# keccak256 of a string, as it appears in the topic of an indexed string argument
+def topic_of(text: str) -> str:
+    from eth_utils import keccak
+
+    return "0x" + keccak(text=text).hex()
+
+
+# A row's FIELDS as JSON-able values, or None for no row
+def snapshot(row, fields):
+    if row is None:
+        return None
+    state = {field: getattr(row, field) for field in fields}
+    if "status" in state:
+        state["status"] = state["status"].value
+    return state
+
+
+def _hex(value) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+# Decoded event -> plain JSON-able dict. Addresses are lowercased and indexed
+# strings (which arrive as 32-byte topics) become 0x-prefixed hex.
+def normalize_event(event) -> dict:
+    types = EVENT_INPUTS[event["event"]]
+    args = {}
+    for name, value in event["args"].items():
+        args[name] = _hex(value) if types[name] == "address" or isinstance(value, (bytes, bytearray)) else value
+    return {
+        "event": event["event"],
+        "args": args,
+        "blockNumber": int(event["blockNumber"]),
+        "blockHash": _hex(event["blockHash"]),
+        "transactionHash": _hex(event["transactionHash"]),
+        "logIndex": int(event["logIndex"]),
+    }
+
+
+# Status of a build in the contract's softwareRecords, None if it was never added
+def contract_software_status(contract, software_hash: str):
+    hash_, is_approved, is_rejected, _ = contract.functions.getSoftwareDetails(software_hash).call()
+    if not hash_:
+        return None
+    if is_approved:
+        return models.SoftwareStatus.approved
+    if is_rejected:
+        return models.SoftwareStatus.rejected
+    return models.SoftwareStatus.pending
+
+
+# Reads LicenseManager logs from a JSON-RPC node (Hardhat, Ganache, ...)
+class Web3LogSource:
+    def __init__(self, rpc_url: str, address: str):
+        from web3 import Web3
+        from eth_utils import event_abi_to_log_topic
+
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.address = Web3.to_checksum_address(address)
+        self.contract = self.w3.eth.contract(address=self.address, abi=ABI)
+        self._events = {
+            "0x" + event_abi_to_log_topic(e).hex(): getattr(self.contract.events, e["name"])()
+            for e in ABI if e["type"] == "event"
+        }
+
+    def head(self) -> int:
+        return self.w3.eth.block_number
+
+    def block_hash(self, number: int):
+        return _hex(self.w3.eth.get_block(number)["hash"])
+
+    def software_status(self, software_hash: str):
+        return contract_software_status(self.contract, software_hash)
+
+    def get_logs(self, from_block: int, to_block: int):
+        logs = self.w3.eth.get_logs({"address": self.address, "fromBlock": from_block, "toBlock": to_block})
+        events = []
+        for log in logs:
+            event = self._events.get(_hex(log["topics"][0])) if log["topics"] else None
+            if event is not None:
+                events.append(normalize_event(event.process_log(log)))
+        return events
+
+
+# Replays logs recorded with `python chain_indexer.py --record`
+class FixtureLogSource:
+    def __init__(self, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        self.address = data["address"]
+        self.blocks = {int(number): block_hash for number, block_hash in data["blocks"].items()}
+        self.logs = sorted(data["logs"], key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+    def head(self) -> int:
+        return max(self.blocks, default=0)
+
+    def block_hash(self, number: int):
+        return self.blocks.get(number)
+
+    def get_logs(self, from_block: int, to_block: int):
+        return [log for log in self.logs if from_block <= log["blockNumber"] <= to_block]
+
+
+class ChainIndexer:
+    def __init__(self, source, start_block: int = INDEXER_START_BLOCK):
+        self.source = source
+        self.contract_address = source.address.lower()
+        self.start_block = start_block
+        self._task = None
+        # keccak topic -> plaintext hash for every models.Software row seen so far
+        self._software_topics = {}
+        self._last_software_id = 0
+        # License keys changed by the batch being applied; dropped from the
+        # verification cache once the batch commits
+        self._changed_licenses = set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Chain indexer started for {self.contract_address}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                advanced = await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chain indexer error: {e}")
+                advanced = 0
+            if not advanced:
+                await asyncio.sleep(INDEXER_POLL_SECONDS)
+
+    # Index up to INDEXER_BATCH_BLOCKS new blocks. Events, read-model changes and
+    # the checkpoint commit together, so a crash never double-applies a batch.
+    # Returns the number of blocks advanced.
+    async def sync_once(self) -> int:
+        async with AsyncSessionLocal() as db:
+            checkpoint = await db.get(models.IndexerCheckpoint, self.contract_address)
+            if checkpoint is None:
+                checkpoint = models.IndexerCheckpoint(
+                    contract_address=self.contract_address, block_number=self.start_block - 1, block_hash=None
+                )
+                db.add(checkpoint)
+
+            if checkpoint.block_hash is not None:
+                canonical = await run_in_threadpool(self.source.block_hash, checkpoint.block_number)
+                if canonical != checkpoint.block_hash:
+                    await self._rewind(db, checkpoint)
+                    # The rewound checkpoint is canonical, so this resumes normally
+                    return await self.sync_once()
+
+            head = await run_in_threadpool(self.source.head) - INDEXER_CONFIRMATIONS
+            if head <= checkpoint.block_number:
+                return 0
+            from_block = checkpoint.block_number + 1
+            to_block = min(checkpoint.block_number + INDEXER_BATCH_BLOCKS, head)
+            logs = await run_in_threadpool(self.source.get_logs, from_block, to_block)
+            to_hash = await run_in_threadpool(self.source.block_hash, to_block)
+
+            await self._refresh_software_topics(db)
+            for log in logs:
+                undo = await self._apply(db, log["event"], log["args"], log["blockNumber"])
+                db.add(models.ChainEvent(
+                    block_number=log["blockNumber"],
+                    block_hash=log["blockHash"],
+                    transaction_hash=log["transactionHash"],
+                    log_index=log["logIndex"],
+                    event=log["event"],
+                    args=json.dumps(log["args"]),
+                    undo=json.dumps(undo),
+                ))
+
+            checkpoint.block_number = to_block
+            checkpoint.block_hash = to_hash
+            await db.commit()
+            for license_key in self._changed_licenses:
+                license_cache.invalidate(license_key)
+            self._changed_licenses.clear()
+            logger.info(f"Indexed blocks {from_block}-{to_block}: {len(logs)} events")
+            return to_block - from_block + 1
+
+    # Drop events from non-canonical blocks and undo what they changed in the
+    # read model, newest first, from the state each one saved before applying.
+    # The work is proportional to the reorg depth, not the history.
+    async def _rewind(self, db, checkpoint):
+        target = max(checkpoint.block_number - INDEXER_REORG_DEPTH, self.start_block - 1)
+        while True:
+            last = await db.scalar(
+                select(models.ChainEvent)
+                .where(models.ChainEvent.block_number <= target)
+                .order_by(models.ChainEvent.block_number.desc())
+                .limit(1)
+            )
+            # Reorg deeper than INDEXER_REORG_DEPTH: keep going back until the newest kept event is canonical
+            if last is None or await run_in_threadpool(self.source.block_hash, last.block_number) == last.block_hash:
+                break
+            target = last.block_number - 1
+        logger.warning(f"Chain reorg detected at block {checkpoint.block_number}, rewinding to {target}")
+
+        checkpoint.block_number = target
+        checkpoint.block_hash = (
+            await run_in_threadpool(self.source.block_hash, target) if target >= self.start_block else None
+        )
+        dropped = (await db.scalars(
+            select(models.ChainEvent)
+            .where(models.ChainEvent.block_number > target)
+            .order_by(models.ChainEvent.block_number.desc(), models.ChainEvent.log_index.desc())
+        )).all()
+        await db.execute(delete(models.ChainEvent).where(models.ChainEvent.block_number > target))
+        if any(event.undo is None for event in dropped):
+            # Indexed before events saved their undo state
+            await self._rebuild(db)
+            return
+        for event in dropped:
+            await self._undo(db, json.loads(event.undo))
+        await db.commit()
+        for license_key in self._changed_licenses:
+            license_cache.invalidate(license_key)
+        self._changed_licenses.clear()
+
+    # Put back the rows an event changed, from the state _apply returned for it
+    async def _undo(self, db, undo):
+        if "software" in undo:
+            topic, prior = undo["software"]
+            software = await db.get(models.ChainSoftware, topic)
+            await record_changes(db, "chain", [(
+                topic, software.status if software is not None else None,
+                models.SoftwareStatus(prior["status"]) if prior is not None else None,
+            )])
+            if prior is None:
+                if software is not None:
+                    await db.delete(software)
+            else:
+                if software is None:
+                    software = models.ChainSoftware(hash_topic=topic)
+                    db.add(software)
+                resolved = software.hash
+                for field, value in prior.items():
+                    setattr(software, field, models.SoftwareStatus(value) if field == "status" else value)
+                # A hash resolved since is still right
+                software.hash = resolved or software.hash
+        elif "license" in undo:
+            license_key, prior = undo["license"]
+            chain_license = await db.get(models.ChainLicense, license_key)
+            if prior is None:
+                if chain_license is not None:
+                    await db.delete(chain_license)
+            else:
+                if chain_license is None:
+                    chain_license = models.ChainLicense(license_key=license_key)
+                    db.add(chain_license)
+                for field, value in prior.items():
+                    setattr(chain_license, field, value)
+            self._changed_licenses.add(license_key)
+        await db.flush()
+
+    # Rebuild the read model by replaying every kept event, saving their undo
+    # state on the way so the next reorg can be undone incrementally
+    async def _rebuild(self, db):
+        await db.execute(delete(models.ChainSoftware))
+        await db.execute(delete(models.ChainLicense))
+        await reset_digests(db, "chain")
+        await db.flush()
+        await self._refresh_software_topics(db)
+        events = (await db.scalars(
+            select(models.ChainEvent).order_by(models.ChainEvent.block_number, models.ChainEvent.log_index)
+        )).all()
+        for event in events:
+            event.undo = json.dumps(await self._apply(db, event.event, json.loads(event.args), event.block_number))
+        await db.commit()
+        self._changed_licenses.clear()
+        license_cache.clear()
+
+    # Learn topics for newly uploaded software and fill in any chain rows they resolve
+    async def _refresh_software_topics(self, db):
+        rows = (await db.execute(
+            select(models.Software.id, models.Software.hash).where(models.Software.id > self._last_software_id)
+        )).all()
+        for software_id, software_hash in rows:
+            self._software_topics[topic_of(software_hash)] = software_hash
+            self._last_software_id = max(self._last_software_id, software_id)
+        if rows:
+            unresolved = (await db.scalars(select(models.ChainSoftware).where(models.ChainSoftware.hash.is_(None)))).all()
+            for chain_software in unresolved:
+                chain_software.hash = self._software_topics.get(chain_software.hash_topic)
+
+    # Apply one event to the read model. Returns what _undo needs to reverse it:
+    # the row it changed and that row's state before, or {} if nothing changed.
+    async def _apply(self, db, event: str, args: dict, block: int):
+        undo = {}
+        if event == "SoftwareAdded":
+            undo["software"] = [args["hash"], None]
+            db.add(models.ChainSoftware(
+                hash_topic=args["hash"],
+                hash=self._software_topics.get(args["hash"]),
+                developer_address=args["developer"],
+                status=models.SoftwareStatus.pending,
+                added_block=block,
+                updated_block=block,
+            ))
+            await record_changes(db, "chain", [(args["hash"], None, models.SoftwareStatus.pending)])
+        elif event in ("SoftwareApproved", "SoftwareRejected"):
+            software = await db.get(models.ChainSoftware, args["hash"])
+            if software is not None:
+                status = models.SoftwareStatus.approved if event == "SoftwareApproved" else models.SoftwareStatus.rejected
+                undo["software"] = [software.hash_topic, snapshot(software, SOFTWARE_FIELDS)]
+                await record_changes(db, "chain", [(software.hash_topic, software.status, status)])
+                software.status = status
+                software.updated_block = block
+        elif event == "LicenseIssued":
+            undo["license"] = [args["licenseKey"], None]
+            db.add(models.ChainLicense(
+                license_key=args["licenseKey"],
+                key_topic=topic_of(args["licenseKey"]),
+                holder_address=args["user"],
+                software_name=args["softwareName"],
+                software_hash=args["softwareHash"],
+                is_tampered=False,
+                is_cracked=False,
+                issued_block=block,
+                updated_block=block,
+            ))
+            self._changed_licenses.add(args["licenseKey"])
+            # The license event carries the software hash in plaintext
+            software = await db.get(models.ChainSoftware, topic_of(args["softwareHash"]))
+            if software is not None and software.hash is None:
+                software.hash = args["softwareHash"]
+        elif event in ("LicenseTampered", "LicenseCracked"):
+            chain_license = await db.scalar(
+                select(models.ChainLicense).where(models.ChainLicense.key_topic == args["licenseKey"])
+            )
+            if chain_license is not None:
+                undo["license"] = [chain_license.license_key, snapshot(chain_license, LICENSE_FIELDS)]
+                if event == "LicenseTampered":
+                    chain_license.is_tampered = True
+                else:
+                    chain_license.is_cracked = True
+                chain_license.updated_block = block
+                self._changed_licenses.add(chain_license.license_key)
+        await db.flush()
+        return undo
+
+
+# Indexer for the configured node, or None when the chain settings are absent
+def create_indexer():
+    if not (CHAIN_RPC_URL and LICENSE_CONTRACT_ADDRESS):
+        logger.info("CHAIN_RPC_URL or LICENSE_CONTRACT_ADDRESS not set; chain indexer disabled")
+        return None
+    return ChainIndexer(Web3LogSource(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS))
+
+
+# Dump logs from the configured node into a fixture for FixtureLogSource
+def record_fixture(path: str, from_block: int, to_block: int | None):
+    source = Web3LogSource(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS)
+    to_block = source.head() if to_block is None else to_block
+    logs = source.get_logs(from_block, to_block)
+    blocks = {n: source.block_hash(n) for n in sorted({log["blockNumber"] for log in logs} | {to_block})}
+    with open(path, "w") as f:
+        json.dump({"address": source.address, "blocks": blocks, "logs": logs}, f, indent=2)
+    print(f"Recorded {len(logs)} events from blocks {from_block}-{to_block} to {path}")
+
+
+async def main(args):
+    ensure_schema()
+    if args.fixture:
+        indexer = ChainIndexer(FixtureLogSource(args.fixture), start_block=args.from_block)
+    else:
+        indexer = create_indexer()
+        if indexer is None:
+            raise SystemExit("Set CHAIN_RPC_URL and LICENSE_CONTRACT_ADDRESS or pass --fixture")
+    try:
+        if args.once:
+            while await indexer.sync_once():
+                pass
+        else:
+            await indexer._run()
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Index LicenseManager events into the backend database")
+    parser.add_argument("--fixture", help="replay a recorded log fixture instead of a live node")
+    parser.add_argument("--once", action="store_true", help="catch up to the head and exit")
+    parser.add_argument("--record", metavar="PATH", help="record logs from the node into a fixture and exit")
+    parser.add_argument("--from-block", type=int, default=INDEXER_START_BLOCK)
+    parser.add_argument("--to-block", type=int)
+    args = parser.parse_args()
+    if args.record:
+        record_fixture(args.record, args.from_block, args.to_block)
+    else:
+        asyncio.run(main(args))
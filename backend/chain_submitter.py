@@ -0,0 +1,518 @@
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from chain_indexer import ABI, CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS, contract_software_status, topic_of, _hex
+from metrics import track
+import models
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Transaction submitter settings. Approvals and rejections are only sent from
+# the backend when the node, the contract and the admin key are all set.
+CHAIN_ADMIN_PRIVATE_KEY = os.getenv("CHAIN_ADMIN_PRIVATE_KEY")
+# Use LicenseManager.batchSetStatus when the deployed contract has it;
+# contracts deployed before it existed only have the one-build-at-a-time
+# functions, and are sent one build per transaction even with this set
+CHAIN_TX_BATCH = os.getenv("CHAIN_TX_BATCH", "false").lower() == "true"
+CHAIN_TX_BATCH_SIZE = int(os.getenv("CHAIN_TX_BATCH_SIZE", "50"))
+# Transactions sent and not yet confirmed; the next ones go out without
+# waiting for these to be mined
+CHAIN_TX_MAX_IN_FLIGHT = int(os.getenv("CHAIN_TX_MAX_IN_FLIGHT", "32"))
+CHAIN_TX_CONFIRMATIONS = int(os.getenv("CHAIN_TX_CONFIRMATIONS", "1"))
+CHAIN_TX_GAS_LIMIT = int(os.getenv("CHAIN_TX_GAS_LIMIT", "300000"))
+CHAIN_TX_BATCH_GAS_PER_ITEM = int(os.getenv("CHAIN_TX_BATCH_GAS_PER_ITEM", "200000"))
+# Rebroadcast at a higher gas price when still unmined after this long
+CHAIN_TX_RESUBMIT_SECONDS = float(os.getenv("CHAIN_TX_RESUBMIT_SECONDS", "120"))
+CHAIN_TX_MAX_ATTEMPTS = int(os.getenv("CHAIN_TX_MAX_ATTEMPTS", "5"))
+CHAIN_TX_POLL_SECONDS = float(os.getenv("CHAIN_TX_POLL_SECONDS", "2"))
+# How long a worker keeps the signing account without renewing it; only the
+# holder sends, so two workers never hand out the same nonce
+CHAIN_TX_LEASE_SECONDS = float(os.getenv("CHAIN_TX_LEASE_SECONDS", "30"))
+CHAIN_TX_GAS_BUMP = 1.125  # nodes reject replacements priced less than 10% higher
+BATCH_BASE_GAS = 50000
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# Not in the LicenseManager.json artifacts until they are rebuilt from
+# licensemanager.sol, so the submitter carries its ABI entry itself
+BATCH_FUNCTION = "batchSetStatus(string[],address[],bool[])"
+BATCH_ABI = {
+    "inputs": [
+        {"internalType": "string[]", "name": "hashes", "type": "string[]"},
+        {"internalType": "address[]", "name": "developers", "type": "address[]"},
+        {"internalType": "bool[]", "name": "approve", "type": "bool[]"},
+    ],
+    "name": "batchSetStatus",
+    "outputs": [],
+    "stateMutability": "nonpayable",
+    "type": "function",
+}
+
+SUBMITTER_ENABLED = bool(CHAIN_RPC_URL and LICENSE_CONTRACT_ADDRESS and CHAIN_ADMIN_PRIVATE_KEY)
+
+# action -> (contract function, resulting on-chain status, event it emits)
+ACTIONS = {
+    "approve": ("approveSoftware", models.SoftwareStatus.approved, "SoftwareApproved(string)"),
+    "reject": ("rejectSoftware", models.SoftwareStatus.rejected, "SoftwareRejected(string)"),
+}
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Signs and sends LicenseManager calls from the admin account over JSON-RPC
+class Web3Chain:
+    def __init__(self, rpc_url: str, address: str, private_key: str):
+        from web3 import Web3
+        from web3.exceptions import TransactionNotFound
+        from eth_account import Account
+
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        abi = ABI if any(entry.get("name") == BATCH_ABI["name"] for entry in ABI) else ABI + [BATCH_ABI]
+        self.contract = self.w3.eth.contract(address=Web3.to_checksum_address(address), abi=abi)
+        self._web3 = Web3
+        self._not_found = TransactionNotFound
+        self._chain_id = None
+
+    def head(self) -> int:
+        return self.w3.eth.block_number
+
+    def nonce(self, block: str = "pending") -> int:
+        return self.w3.eth.get_transaction_count(self.address, block)
+
+    def gas_price(self) -> int:
+        return self.w3.eth.gas_price
+
+    def checksum_address(self, address):
+        return self._web3.to_checksum_address(address) if address and self._web3.is_address(address) else ZERO_ADDRESS
+
+    def software_status(self, software_hash: str):
+        return contract_software_status(self.contract, software_hash)
+
+    # Whether the deployed bytecode dispatches `signature`: Solidity compares
+    # the call's selector against a PUSH4 of each function's selector
+    def has_function(self, signature: str) -> bool:
+        selector = bytes(self._web3.keccak(text=signature)[:4])
+        return b"\x63" + selector in bytes(self.w3.eth.get_code(self.contract.address))
+
+    def send(self, function: str, args, nonce: int, gas: int, gas_price: int) -> str:
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        transaction = getattr(self.contract.functions, function)(*args).build_transaction({
+            "from": self.address, "nonce": nonce, "gas": gas, "gasPrice": gas_price, "chainId": self._chain_id,
+        })
+        signed = self.account.sign_transaction(transaction)
+        return _hex(self.w3.eth.send_raw_transaction(signed.raw_transaction))
+
+    def receipt(self, tx_hash: str):
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except self._not_found:
+            return None
+        return {
+            "status": receipt["status"],
+            "blockNumber": receipt["blockNumber"],
+            "topics": [[_hex(topic) for topic in log["topics"]] for log in receipt["logs"]],
+        }
+
+
+# Writes queued approval-state changes (models.ChainOperation) to the
+# contract. Transactions are sent back to back from a locally tracked nonce,
+# up to CHAIN_TX_MAX_IN_FLIGHT unconfirmed at once, and their receipts are
+# checked on later cycles; the outcome is copied onto models.Software.
+# Every operation is safe to send again: before resending, the contract
+# state is read and operations it already reflects count as confirmed.
+class ChainSubmitter:
+    def __init__(self, chain=None):
+        self.chain = chain
+        self.worker_id = uuid.uuid4().hex
+        self._next_nonce = None  # synced from the node whenever the lease is (re)taken
+        self._event_topics = None
+        self._batch_supported = None  # whether the deployed contract has batchSetStatus
+        self._batch = False
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self.chain is None:
+            if not SUBMITTER_ENABLED:
+                logger.info("CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS or CHAIN_ADMIN_PRIVATE_KEY not set; chain submitter disabled")
+                return
+            self.chain = Web3Chain(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS, CHAIN_ADMIN_PRIVATE_KEY)
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Chain submitter started for {self.chain.address}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._release()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chain submitter error: {e}")
+                self._next_nonce = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=CHAIN_TX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    # One cycle: settle receipts of sent transactions, then send queued
+    # operations into the free in-flight slots. Returns the number of
+    # operations still queued or unconfirmed, or None without the lease.
+    async def run_once(self):
+        if self._event_topics is None:
+            self._event_topics = {action: topic_of(event) for action, (_, _, event) in ACTIONS.items()}
+        async with AsyncSessionLocal() as db:
+            sender = await self._lease(db)
+            if sender is None:
+                return None
+            self._batch = await self._batching()
+            if self._next_nonce is None:
+                self._next_nonce = await run_in_threadpool(self.chain.nonce, "pending")
+                if sender.next_nonce > self._next_nonce:
+                    logger.warning(f"Transactions from nonce {self._next_nonce} to {sender.next_nonce - 1} were dropped; reusing their nonces")
+            await self._settle(db)
+            await self._submit(db, sender)
+            return await db.scalar(
+                select(func.count()).select_from(models.ChainOperation)
+                .where(models.ChainOperation.status.in_(("queued", "submitted")))
+            )
+
+    async def _batching(self):
+        if not CHAIN_TX_BATCH:
+            return False
+        if self._batch_supported is None:
+            self._batch_supported = await run_in_threadpool(self.chain.has_function, BATCH_FUNCTION)
+            if not self._batch_supported:
+                logger.warning("CHAIN_TX_BATCH is set but the deployed contract has no batchSetStatus; "
+                               "sending one build per transaction")
+        return self._batch_supported
+
+    async def _lease(self, db):
+        now = _now()
+        address = self.chain.address.lower()
+        if await db.get(models.ChainSender, address) is None:
+            db.add(models.ChainSender(address=address, next_nonce=0))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+        result = await db.execute(
+            update(models.ChainSender)
+            .where(
+                models.ChainSender.address == address,
+                or_(
+                    models.ChainSender.leased_by == self.worker_id,
+                    models.ChainSender.leased_by.is_(None),
+                    models.ChainSender.lease_expires_at <= now,
+                ),
+            )
+            .values(leased_by=self.worker_id, lease_expires_at=now + timedelta(seconds=CHAIN_TX_LEASE_SECONDS))
+        )
+        await db.commit()
+        if result.rowcount == 0:
+            self._next_nonce = None
+            return None
+        return await db.get(models.ChainSender, address, populate_existing=True)
+
+    # Let another worker take over straight away instead of after the lease expires
+    async def _release(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(models.ChainSender)
+                    .where(models.ChainSender.leased_by == self.worker_id)
+                    .values(leased_by=None, lease_expires_at=None)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release chain sender lease: {e}")
+        self._next_nonce = None
+
+    async def _settle(self, db):
+        submitted = (await db.scalars(
+            select(models.ChainOperation)
+            .where(models.ChainOperation.status == "submitted")
+            .order_by(models.ChainOperation.id)
+        )).all()
+        if not submitted:
+            return
+        by_tx = {}
+        for op in submitted:
+            by_tx.setdefault(op.tx_hash, []).append(op)
+        head = await run_in_threadpool(self.chain.head)
+        latest_nonce = None
+        developers = None
+        for tx_hash, ops in by_tx.items():
+            receipt = await run_in_threadpool(self.chain.receipt, tx_hash)
+            if receipt is None:
+                if _now() - ops[0].submitted_at < timedelta(seconds=CHAIN_TX_RESUBMIT_SECONDS):
+                    continue
+                if latest_nonce is None:
+                    latest_nonce = await run_in_threadpool(self.chain.nonce, "latest")
+                if latest_nonce > ops[0].nonce + ops[0].adds_software:
+                    # Its nonce went to another transaction: one of our
+                    # rebroadcasts, or something sent before a restart
+                    for op in ops:
+                        self._retry(op, "Transaction replaced or dropped")
+                else:
+                    if developers is None:
+                        developers = await self._developer_addresses(db, submitted)
+                    try:
+                        await self._rebroadcast(ops, developers, latest_nonce)
+                    except Exception as e:
+                        # Keep one bad transaction from holding up the rest
+                        logger.error(f"Failed to resend chain transaction {ops[0].tx_hash}: {e}")
+                        for op in ops:
+                            self._retry(op, str(e))
+            elif receipt["blockNumber"] <= head - CHAIN_TX_CONFIRMATIONS + 1:
+                for op in ops:
+                    await self._resolve(op, receipt)
+            else:
+                continue
+            await self._write_back(db, ops)
+        await db.commit()
+
+    async def _resolve(self, op, receipt):
+        topics = [self._event_topics[op.action], topic_of(op.software_hash)]
+        if receipt["status"] == 1 and any(log_topics[:2] == topics for log_topics in receipt["topics"]):
+            self._confirm(op, receipt["blockNumber"])
+            return
+        # No event: reverted, or skipped by batchSetStatus. Fine if the
+        # contract already holds the requested state.
+        target = ACTIONS[op.action][1]
+        on_chain = await run_in_threadpool(self.chain.software_status, op.software_hash)
+        if on_chain == target:
+            self._confirm(op, receipt["blockNumber"])
+        elif on_chain in (models.SoftwareStatus.approved, models.SoftwareStatus.rejected):
+            self._fail(op, f"Software is {on_chain.value} on chain")
+        else:
+            self._retry(op, "Transaction reverted" if receipt["status"] == 0 else "Transaction had no effect")
+
+    def _confirm(self, op, block):
+        op.status = "confirmed"
+        op.confirmed_block = block
+        where = f"in block {block}" if block is not None else "already"
+        logger.info(f"Software {op.software_hash} {ACTIONS[op.action][1].value} on chain {where}")
+
+    def _fail(self, op, error):
+        op.status = "failed"
+        op.last_error = error
+        logger.error(f"Giving up on chain {op.action} of {op.software_hash}: {error}")
+
+    def _retry(self, op, error):
+        op.attempts += 1
+        op.last_error = error
+        op.nonce = None
+        op.adds_software = False
+        op.gas_price = None
+        op.submitted_at = None
+        if op.attempts >= CHAIN_TX_MAX_ATTEMPTS:
+            self._fail(op, f"{error} after {op.attempts} attempts")
+        else:
+            op.status = "queued"
+            logger.warning(f"Chain {op.action} of {op.software_hash} will be resent: {error}")
+
+    async def _write_back(self, db, ops):
+        for op in ops:
+            await db.execute(
+                update(models.Software)
+                .where(models.Software.id == op.software_id)
+                .values(chain_status=op.status, chain_tx_hash=op.tx_hash)
+            )
+
+    async def _submit(self, db, sender):
+        in_flight = await db.scalar(
+            select(func.count(func.distinct(models.ChainOperation.tx_hash)))
+            .where(models.ChainOperation.status == "submitted")
+        )
+        slots = CHAIN_TX_MAX_IN_FLIGHT - in_flight
+        if slots <= 0:
+            return
+        per_tx = CHAIN_TX_BATCH_SIZE if self._batch else 1
+        queued = (await db.scalars(
+            select(models.ChainOperation)
+            .where(models.ChainOperation.status == "queued")
+            .order_by(models.ChainOperation.id)
+            .limit(slots * per_tx)
+        )).all()
+        if not queued:
+            return
+        developers = await self._developer_addresses(db, queued)
+        gas_price = await run_in_threadpool(self.chain.gas_price)
+        for i in range(0, len(queued), per_tx):
+            ops = queued[i:i + per_tx]
+            try:
+                await self._send(ops, developers, gas_price)
+            except Exception as e:
+                # The node may still have taken it; take the nonce from the
+                # node again next cycle and leave the rest queued
+                logger.error(f"Failed to send chain transaction for {len(ops)} operation(s): {e}")
+                for op in ops:
+                    self._retry(op, str(e))
+                self._next_nonce = None
+                break
+        if self._next_nonce is not None:
+            sender.next_nonce = self._next_nonce
+        await self._write_back(db, queued)
+        await db.commit()
+
+    async def _send(self, ops, developers, gas_price):
+        adds_software = False
+        if not self._batch:
+            op = ops[0]
+            target = ACTIONS[op.action][1]
+            on_chain = await run_in_threadpool(self.chain.software_status, op.software_hash)
+            if on_chain == target:
+                self._confirm(op, None)
+                return
+            if on_chain in (models.SoftwareStatus.approved, models.SoftwareStatus.rejected):
+                self._fail(op, f"Software is {on_chain.value} on chain")
+                return
+            adds_software = on_chain is None
+        await self._broadcast(ops, developers, self._next_nonce, gas_price, adds_software)
+        self._next_nonce += 1 + adds_software
+
+    # Resend the transactions of `ops` not yet mined: with addSoftware in, the
+    # status change alone once addSoftware's nonce is used
+    async def _rebroadcast(self, ops, developers, latest_nonce):
+        gas_price = max(int(int(ops[0].gas_price) * CHAIN_TX_GAS_BUMP) + 1, await run_in_threadpool(self.chain.gas_price))
+        logger.warning(f"Transaction {ops[0].tx_hash} unmined after {CHAIN_TX_RESUBMIT_SECONDS:.0f}s, resending at gas price {gas_price}")
+        mined = max(0, latest_nonce - ops[0].nonce)
+        await self._broadcast(ops, developers, ops[0].nonce, gas_price, ops[0].adds_software, skip=mined)
+
+    # Sign and send the calls carrying `ops` from `nonce` on: one
+    # batchSetStatus, or the status change preceded by addSoftware when the
+    # contract has never seen the hash. The first `skip` calls are already
+    # mined and not sent again.
+    async def _broadcast(self, ops, developers, nonce, gas_price, adds_software, skip=0):
+        if self._batch:
+            calls = [("batchSetStatus", [
+                [op.software_hash for op in ops],
+                [developers.get(op.software_id, ZERO_ADDRESS) for op in ops],
+                [op.action == "approve" for op in ops],
+            ], BATCH_BASE_GAS + CHAIN_TX_BATCH_GAS_PER_ITEM * len(ops))]
+        else:
+            op = ops[0]
+            calls = [(ACTIONS[op.action][0], [op.software_hash], CHAIN_TX_GAS_LIMIT)]
+            if adds_software:
+                calls.insert(0, ("addSoftware", [op.software_hash, developers.get(op.software_id, ZERO_ADDRESS)], CHAIN_TX_GAS_LIMIT))
+        for offset, (function, args, gas) in enumerate(calls):
+            if offset < skip:
+                continue
+            with track("chain", "send"):
+                tx_hash = await run_in_threadpool(self.chain.send, function, args, nonce + offset, gas, gas_price)
+        for op in ops:
+            op.status = "submitted"
+            op.nonce = nonce
+            op.adds_software = adds_software
+            op.tx_hash = tx_hash
+            op.gas_price = str(gas_price)
+            op.submitted_at = _now()
+
+    async def _developer_addresses(self, db, ops):
+        rows = (await db.execute(
+            select(models.Software.id, models.User.address)
+            .join(models.User, models.User.email == models.Software.developer_email, isouter=True)
+            .where(models.Software.id.in_({op.software_id for op in ops}))
+        )).all()
+        return {software_id: self.chain.checksum_address(address) for software_id, address in rows}
+
+
+submitter = ChainSubmitter()
+
+
+# Queue the on-chain half of approving or rejecting `software` in the
+# caller's transaction, so the decision and its chain update commit together.
+# Returns the chain status to report, or None when the submitter is not
+# configured and the admin's wallet still has to send the transaction.
+def queue_status_change(db, software, action: str):
+    if not SUBMITTER_ENABLED:
+        return None
+    for item in software:
+        db.add(models.ChainOperation(software_id=item.id, software_hash=item.hash, action=action))
+        item.chain_status = "queued"
+    return "queued"
+
+
+async def submitter_stats(db):
+    counts = dict((await db.execute(
+        select(models.ChainOperation.status, func.count()).group_by(models.ChainOperation.status)
+    )).all())
+    senders = (await db.scalars(select(models.ChainSender))).all()
+    return {
+        "enabled": SUBMITTER_ENABLED,
+        "batch": submitter._batch,
+        "operations": {status: counts.get(status, 0) for status in ("queued", "submitted", "confirmed", "failed")},
+        "senders": [
+            {"address": s.address, "next_nonce": s.next_nonce, "leased": s.leased_by is not None} for s in senders
+        ],
+    }
+
+
+# Put failed operations back in the queue, e.g. after funding the admin account
+async def requeue_failed():
+    async with AsyncSessionLocal() as db:
+        ids = (await db.scalars(
+            update(models.ChainOperation)
+            .where(models.ChainOperation.status == "failed")
+            .values(status="queued", attempts=0, last_error=None)
+            .returning(models.ChainOperation.software_id)
+        )).all()
+        await db.execute(update(models.Software).where(models.Software.id.in_(ids)).values(chain_status="queued"))
+        await db.commit()
+    return len(ids)
+
+
+async def main(args):
+    if not SUBMITTER_ENABLED:
+        raise SystemExit("Set CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS and CHAIN_ADMIN_PRIVATE_KEY")
+    ensure_schema()
+    try:
+        if args.requeue_failed:
+            print(f"Requeued {await requeue_failed()} failed operations")
+        chain_submitter = ChainSubmitter(Web3Chain(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS, CHAIN_ADMIN_PRIVATE_KEY))
+        if args.once:
+            while await chain_submitter.run_once() != 0:
+                await asyncio.sleep(CHAIN_TX_POLL_SECONDS)
+            await chain_submitter._release()
+        else:
+            chain_submitter.start()
+            await chain_submitter._task
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Send queued approvals and rejections to the LicenseManager contract")
+    parser.add_argument("--once", action="store_true", help="send and confirm everything queued, then exit")
+    parser.add_argument("--requeue-failed", action="store_true", help="retry operations that gave up")
+    asyncio.run(main(parser.parse_args()))
@@ -1,14 +1,242 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
+import logging
 import os
+import re
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Bring an out-of-date database to the latest migration at startup instead of
+# refusing to start
+SCHEMA_AUTO_UPGRADE = os.getenv("SCHEMA_AUTO_UPGRADE", "true").lower() == "true"
+
+# SQLite: WAL lets readers keep reading while a writer commits; NORMAL sync is
+# durable across application crashes in WAL mode (only an OS crash can lose the
+# last commits); the busy timeout is how long a writer waits for the lock
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Connection pool for server databases (Postgres, MySQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # below typical server idle timeouts
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+REVISION_LINE = re.compile(r"^(revision|down_revision)\b[^=]*=\s*['\"]?(\w+)", re.MULTILINE)
+
+# Async drivers used when DATABASE_URL names a plain (sync) dialect.
+# A URL that already names a driver, e.g. sqlite+aiosqlite:// or
+# postgresql+asyncpg://, is used as-is for the async engine.
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+SYNC_DRIVERS = {
+    "aiosqlite": "pysqlite",
+    "asyncpg": "psycopg2",
+    "aiomysql": "pymysql",
+}
+
+
+def async_url(url: str):
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{url.drivername}+{ASYNC_DRIVERS[url.drivername]}")
+    return url
+
+
+def sync_url(url: str):
+    url = make_url(url)
+    backend, _, driver = url.drivername.partition("+")
+    if driver in SYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{SYNC_DRIVERS[driver]}")
+    return url
+
+
+# create_engine() keyword arguments for a URL: pool sizing for server
+# databases; SQLite keeps SQLAlchemy's default pool for its file/memory mode
+def engine_options(url):
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Apply the journal mode, sync level and busy timeout to every new SQLite
+# connection (sync or aiosqlite) of `engine`
+def configure_sqlite(engine, journal_mode=SQLITE_JOURNAL_MODE, synchronous=SQLITE_SYNCHRONOUS,
+                     busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        # In-memory databases only support MEMORY/OFF journaling
+        if sync_engine.url.database not in (None, "", ":memory:"):
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
+
+
+# Engines are created on first use, so importing this module (or anything
+# that imports it) does no driver imports or I/O
+_engine = None
+_async_engine = None
+
+
+def _require_url():
+    if not DATABASE_URL:
+        logger.error("DATABASE_URL not set in .env file")
+        raise ValueError("DATABASE_URL must be set in .env file")
+    return DATABASE_URL
+
+
+# Sync engine for schema creation, migrations and scripts
+def get_engine():
+    global _engine
+    if _engine is None:
+        url = sync_url(_require_url())
+        _engine = create_engine(url, **engine_options(url))
+        configure_sqlite(_engine)
+    return _engine
+
+
+# Async engine used by the API so queries don't block the event loop
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        url = async_url(_require_url())
+        _async_engine = create_async_engine(url, **engine_options(url))
+        configure_sqlite(_async_engine)
+    return _async_engine
+
+
+async def dispose_engines():
+    global _engine, _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+
+# Sessions look their engine up when they first need a connection
+class _SyncSession(Session):
+    def get_bind(self, *args, **kwargs):
+        return get_engine()
+
+
+class _AsyncBackedSession(Session):
+    def get_bind(self, *args, **kwargs):
+        return get_async_engine().sync_engine
+
+
+SessionLocal = sessionmaker(class_=_SyncSession, autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=_AsyncBackedSession, autoflush=False, expire_on_commit=False
+)
+
+
+# `from database import engine` still works for scripts; it creates the engine
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    config.attributes["connection"] = connection
+    return config
+
+
+# Head revisions read straight from the migration files; importing alembic
+# costs ~150ms per worker, which the common already-at-head case can skip
+def _script_heads():
+    versions_dir = os.path.join(ALEMBIC_DIR, "versions")
+    revisions, parents = set(), set()
+    for filename in os.listdir(versions_dir):
+        if filename.endswith(".py"):
+            with open(os.path.join(versions_dir, filename)) as f:
+                fields = dict(REVISION_LINE.findall(f.read()))
+            revisions.add(fields.get("revision"))
+            parents.add(fields.get("down_revision"))
+    return revisions - parents
+
+
+def _schema_is_current():
+    heads = _script_heads()
+    with get_engine().connect() as connection:
+        if len(heads) != 1 or not inspect(connection).has_table("alembic_version"):
+            return False
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar() in heads
+
+
+# Make sure the database matches the latest migration. An up-to-date database
+# costs one SELECT; an empty one gets the tables from the models and is stamped
+# at head; an older one is upgraded (or rejected when SCHEMA_AUTO_UPGRADE is off).
+def ensure_schema():
+    if _schema_is_current():
+        return
+
+    from alembic import command
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    import models
+
+    script = ScriptDirectory(ALEMBIC_DIR)
+    head = script.get_current_head()
+    with get_engine().begin() as connection:
+        # Workers starting together against a new database would all try to
+        # create it; the first takes the lock and the rest find it at head
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('ensure_schema'))"))
+        context = MigrationContext.configure(connection)
+        current = context.get_current_revision()
+        if current == head:
+            return
+        if current is None:
+            inspector = inspect(connection)
+            # Empty, or created by the old import-time create_all after the
+            # software.status migration was written: either way the models
+            # describe it, so create what is missing and record head
+            if not inspector.has_table("users") or "status" in {c["name"] for c in inspector.get_columns("software")}:
+                Base.metadata.create_all(bind=connection)
+                context.stamp(script, head)
+                logger.info(f"Created database schema at revision {head}")
+                return
+        if not SCHEMA_AUTO_UPGRADE:
+            logger.error(f"Database schema is at revision {current}, expected {head}")
+            raise RuntimeError(f"Database schema is at revision {current}, run 'alembic upgrade head' (expected {head})")
+        logger.info(f"Upgrading database schema from revision {current} to {head}")
+        command.upgrade(_alembic_config(connection), "head")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -0,0 +1,115 @@
+from sqlalchemy import select, update, delete, insert, and_, or_
+from sqlalchemy.orm import aliased
+import models
+import hashlib
+
+# The software catalogue is summarised per bucket on two sides: 'database'
+# (the software table) and 'chain' (chain_software, the indexed copy of the
+# contract). An entry is (keccak topic of the hash, status), bucketed by the
+# topic's first BUCKET_CHARS hex digits. Only decided builds are entries:
+# pending uploads reach the contract whenever their developer registers them,
+# so a pending build missing from the chain is not drift. A bucket's digest is
+# the sum of its entries' leaf values mod DIGEST_MODULUS: order-independent,
+# and a change is a single atomic UPDATE adding the difference.
+BUCKET_CHARS = 3
+BUCKETS = 16 ** BUCKET_CHARS
+DIGEST_MODULUS = 2 ** 61 - 1
+SIDES = ("database", "chain")
+DIGESTED = (models.SoftwareStatus.approved.value, models.SoftwareStatus.rejected.value)
+
+
+def bucket_of(topic: str) -> int:
+    return int(topic[2:2 + BUCKET_CHARS], 16)
+
+
+# [lower, upper) bounds of a bucket's topics, for a range scan on the topic index
+def bucket_range(bucket: int):
+    prefix = f"0x{bucket:0{BUCKET_CHARS}x}"
+    return prefix, prefix + "g"
+
+
+def leaf(topic: str, status) -> int:
+    status = status.value if isinstance(status, models.SoftwareStatus) else status
+    return int.from_bytes(hashlib.blake2b(f"{topic}:{status}".encode(), digest_size=8).digest(), "big") % DIGEST_MODULUS
+
+
+# `status` if entries with it are digested, else None
+def digested(status):
+    value = status.value if isinstance(status, models.SoftwareStatus) else status
+    return status if value in DIGESTED else None
+
+
+def digest_of(entries) -> int:
+    return sum(leaf(topic, status) for topic, status in entries) % DIGEST_MODULUS
+
+
+# Apply (topic, old status, new status) changes to one side's digests in the
+# caller's transaction; None for old or new means added or removed. Before
+# the reconciler first builds a side there are no rows and this does nothing.
+async def record_changes(db, side: str, changes):
+    deltas = {}
+    for topic, old, new in changes:
+        old, new = digested(old), digested(new)
+        if topic is None or old == new:
+            continue  # not backfilled yet (the next rebuild counts it), or no digested change
+        bucket = bucket_of(topic)
+        digest, entries = deltas.get(bucket, (0, 0))
+        if old is not None:
+            digest, entries = digest - leaf(topic, old), entries - 1
+        if new is not None:
+            digest, entries = digest + leaf(topic, new), entries + 1
+        deltas[bucket] = (digest % DIGEST_MODULUS, entries)
+    for bucket, (digest, entries) in sorted(deltas.items()):
+        if digest or entries:
+            await db.execute(
+                update(models.DigestBucket)
+                .where(models.DigestBucket.side == side, models.DigestBucket.bucket == bucket)
+                .values(digest=(models.DigestBucket.digest + digest) % DIGEST_MODULUS,
+                        entries=models.DigestBucket.entries + entries)
+            )
+
+
+# Buckets whose digests differ between the sides, found by the database
+# without sending every bucket to Python
+async def mismatched(db):
+    ours, theirs = aliased(models.DigestBucket), aliased(models.DigestBucket)
+    return (await db.scalars(
+        select(ours.bucket)
+        .join(theirs, theirs.bucket == ours.bucket)
+        .where(ours.side == "database", theirs.side == "chain",
+               or_(ours.digest != theirs.digest, ours.entries != theirs.entries))
+        .order_by(ours.bucket)
+    )).all()
+
+
+# Condition selecting `column`'s topics in any of `buckets`, as index range scans
+def in_buckets(column, buckets):
+    return or_(*(and_(column >= lower, column < upper) for lower, upper in map(bucket_range, buckets)))
+
+
+# Overwrite buckets with the digests of their entries, {bucket: [(topic, status)]}
+async def store(db, side: str, entries_by_bucket):
+    if entries_by_bucket:
+        rows = []
+        for bucket, entries in entries_by_bucket.items():
+            entries = [(topic, status) for topic, status in entries if digested(status) is not None]
+            rows.append({"side": side, "bucket": bucket, "digest": digest_of(entries), "entries": len(entries)})
+        await db.execute(update(models.DigestBucket), rows)
+
+
+# Replace all of one side's buckets with digests of `entries`
+async def rebuild(db, side: str, entries):
+    by_bucket = [[] for _ in range(BUCKETS)]
+    for topic, status in entries:
+        if digested(status) is not None:
+            by_bucket[bucket_of(topic)].append((topic, status))
+    await db.execute(delete(models.DigestBucket).where(models.DigestBucket.side == side))
+    await db.execute(insert(models.DigestBucket), [
+        {"side": side, "bucket": bucket, "digest": digest_of(items), "entries": len(items)}
+        for bucket, items in enumerate(by_bucket)
+    ])
+
+
+# Empty one side, e.g. before its rows are rebuilt one change at a time
+async def reset(db, side: str):
+    await db.execute(update(models.DigestBucket).where(models.DigestBucket.side == side).values(digest=0, entries=0))
@@ -0,0 +1,218 @@
+# Register a whole release directory or tarball in one go, for onboarding a
+# vendor's archive of builds. Files are hashed, sketched and scanned for crack
+# signatures in a process pool and registered as pending software for one
+# developer, with the same dedup, near-duplicate and signature checks as
+# /software/upload.
+#
+#   cd backend && python ingest.py releases/ --developer dev@example.com
+#   cd backend && python ingest.py vendor-archive.tar.gz --developer dev@example.com --version 2.1
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, insert
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from storage import store_local_file, blob_path, UploadTooLarge, MAX_UPLOAD_SIZE, UPLOAD_DIR
+from similarity import BlockSketch, find_similar
+from scanner import scan_file, signature_set
+from chain_indexer import topic_of
+from digests import record_changes
+from admin_events import publish
+import models
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Ingestion settings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))  # files per dedup query and commit
+
+
+# Runs in a pool process: (relative path, sha256, size, signature, blocks,
+# crack-signature hits), or the error that stopped the file from being stored
+def _process_file(root: str, relative_path: str, max_size: int, generation: int, signatures):
+    sketch = BlockSketch()
+    try:
+        file_hash, size = store_local_file(os.path.join(root, relative_path), max_size, sketch)
+        hits = scan_file(blob_path(file_hash), generation, signatures) if signatures else {}
+    except UploadTooLarge:
+        return relative_path, None, f"exceeds {max_size} bytes"
+    except OSError as e:
+        return relative_path, None, str(e)
+    return relative_path, {"hash": file_hash, "size": size, "signature": sketch.signature(), "blocks": sketch.blocks,
+                           "hits": hits}, None
+
+
+def walk(root: str):
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path) and not os.path.islink(path):
+                paths.append(os.path.relpath(path, root))
+    return paths
+
+
+# Software name and version for a file: the file name, and --version or else
+# the directory it sits in (releases/1.2/app.exe -> app.exe 1.2)
+def name_and_version(relative_path: str, version: str | None):
+    directory, filename = os.path.split(relative_path)
+    return filename, version or os.path.basename(directory) or "1.0"
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f)["done"])
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+
+# Register one batch of processed files: one query finds hashes already in the
+# catalogue, one INSERT adds the rest, and the checkpoint moves only after commit.
+# `generation` is the signature set the files were scanned against.
+async def register_batch(results, developer_email: str, version: str | None, generation: int, stats):
+    stored = {relative_path: info for relative_path, info, _ in results if info is not None}
+    async with AsyncSessionLocal() as db:
+        existing = set((await db.scalars(
+            select(models.Software.hash).where(models.Software.hash.in_({info["hash"] for info in stored.values()}))
+        )).all()) if stored else set()
+
+        rows = []
+        signatures = {}
+        for relative_path, info in stored.items():
+            if info["hash"] in existing:
+                stats["duplicates"] += 1
+                continue
+            existing.add(info["hash"])
+            name, file_version = name_and_version(relative_path, version)
+            rows.append({"name": name, "version": file_version, "hash": info["hash"], "hash_topic": topic_of(info["hash"]),
+                         "developer_email": developer_email, "status": models.SoftwareStatus.pending,
+                         "scan_generation": generation})
+            signatures[info["hash"]] = info
+
+        if rows:
+            inserted = (await db.execute(
+                insert(models.Software).returning(models.Software.id, models.Software.hash), rows
+            )).all()
+            await record_changes(db, "database", [(row["hash_topic"], None, row["status"]) for row in rows])
+            publish(db, "software.added", {"software": [
+                {key: row[key] for key in ("name", "version", "hash", "developer_email")} for row in rows
+            ]})
+            signature_rows = []
+            hit_rows = []
+            for software_id, file_hash in inserted:
+                info = signatures[file_hash]
+                if info["hits"]:
+                    stats["flagged"] += 1
+                    names = ", ".join(signature_set.names[signature_id] for signature_id in info["hits"])
+                    logger.warning(f"{file_hash} matches crack signatures: {names}")
+                    hit_rows.extend(
+                        {"software_id": software_id, "signature_id": signature_id, "first_offset": first, "matches": matches}
+                        for signature_id, (first, matches) in info["hits"].items()
+                    )
+                if info["signature"] is None:
+                    continue
+                similar_to = await find_similar(db, info["signature"], developer_email)
+                if similar_to:
+                    stats["similar"] += 1
+                    logger.warning(f"{file_hash} is {similar_to['similarity']:.0%} similar to approved software {similar_to['hash']}")
+                signature_rows.append({
+                    "software_id": software_id,
+                    "signature": info["signature"],
+                    "blocks": info["blocks"],
+                    "similar_to_id": similar_to["id"] if similar_to else None,
+                    "similarity": similar_to["similarity"] if similar_to else None,
+                })
+            if signature_rows:
+                await db.execute(insert(models.SoftwareSignature), signature_rows)
+            if hit_rows:
+                await db.execute(insert(models.ScanHit), hit_rows)
+            stats["registered"] += len(inserted)
+        await db.commit()
+
+
+async def ingest(root: str, developer_email: str, version: str | None, checkpoint: Checkpoint, workers: int, batch_size: int):
+    async with AsyncSessionLocal() as db:
+        developer = await db.scalar(select(models.User).where(models.User.email == developer_email))
+        await signature_set.refresh(db)
+    generation, signatures = signature_set.generation, signature_set.signatures
+    if developer is None or not developer.is_approved:
+        raise SystemExit(f"{developer_email} is not an approved user")
+
+    paths = [path for path in walk(root) if path not in checkpoint.done]
+    total_bytes = 0
+    stats = {"registered": 0, "duplicates": 0, "similar": 0, "flagged": 0, "failed": 0}
+    start = time.perf_counter()
+    print(f"{len(paths)} files to ingest ({len(checkpoint.done)} already done)")
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(paths), batch_size):
+            batch = paths[offset:offset + batch_size]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _process_file, root, path, MAX_UPLOAD_SIZE, generation, signatures)
+                for path in batch
+            ))
+            for relative_path, info, error in results:
+                if error:
+                    stats["failed"] += 1
+                    logger.error(f"Skipping {relative_path}: {error}")
+                else:
+                    total_bytes += info["size"]
+
+            await register_batch(results, developer_email, version, generation, stats)
+            checkpoint.done.update(relative_path for relative_path, _, error in results if not error)
+            checkpoint.save()
+
+            elapsed = time.perf_counter() - start
+            print(f"{offset + len(batch)}/{len(paths)} files, {total_bytes / 1e6:.0f} MB, "
+                  f"{total_bytes / 1e6 / elapsed:.0f} MB/s, {stats['registered']} registered, "
+                  f"{stats['duplicates']} duplicates, {stats['similar']} similar, {stats['flagged']} flagged, "
+                  f"{stats['failed']} failed")
+    return stats
+
+
+async def main(args):
+    ensure_schema()
+    source = os.path.abspath(args.source)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(UPLOAD_DIR, f"ingest-{os.path.basename(source)}.json"))
+    try:
+        if os.path.isdir(source):
+            await ingest(source, args.developer, args.version, checkpoint, args.workers, args.batch_size)
+        else:
+            # Unpack next to the store so blobs are copied within one filesystem
+            os.makedirs(os.path.join(UPLOAD_DIR, "tmp"), exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=os.path.join(UPLOAD_DIR, "tmp")) as root:
+                with tarfile.open(source) as archive:
+                    archive.extractall(root, filter="data")
+                await ingest(root, args.developer, args.version, checkpoint, args.workers, args.batch_size)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Register every file under a directory or tarball as pending software")
+    parser.add_argument("source", help="release directory or tarball")
+    parser.add_argument("--developer", required=True, help="email of the approved developer the builds belong to")
+    parser.add_argument("--version", help="version for every file (default: the file's directory name)")
+    parser.add_argument("--checkpoint", help="progress file for resuming (default: uploads/ingest-<source>.json)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
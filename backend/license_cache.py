@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from sqlalchemy import select
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+import models
+import os
+import time
+
+load_dotenv()
+
+# License verification cache settings
+LICENSE_CACHE_SIZE = int(os.getenv("LICENSE_CACHE_SIZE", "100000"))
+LICENSE_CACHE_TTL_SECONDS = float(os.getenv("LICENSE_CACHE_TTL_SECONDS", "300"))
+# Unknown keys are cached for less time: the license may be issued (and indexed
+# by another worker) at any moment
+LICENSE_NEGATIVE_TTL_SECONDS = float(os.getenv("LICENSE_NEGATIVE_TTL_SECONDS", "5"))
+
+
+# Same answer as LicenseManager.isAuthentic, plus why
+def verdict(license_key: str, chain_license):
+    if chain_license is None:
+        return {"license_key": license_key, "authentic": False, "exists": False, "is_tampered": False, "is_cracked": False}
+    return {
+        "license_key": license_key,
+        "authentic": not (chain_license.is_tampered or chain_license.is_cracked),
+        "exists": True,
+        "is_tampered": chain_license.is_tampered,
+        "is_cracked": chain_license.is_cracked,
+    }
+
+
+# TTL + LRU map of license key -> verdict, including verdicts for keys that do
+# not exist. The chain indexer invalidates keys whose license changes; the TTLs
+# bound staleness for changes indexed by other worker processes.
+class LicenseCache:
+    def __init__(self, ttl: float, negative_ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, license_key: str):
+        entry = self._entries.get(license_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[license_key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(license_key)
+        self.hits += 1
+        if not result["exists"]:
+            self.negative_hits += 1
+        return result
+
+    def put(self, result: dict):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if result["exists"] else self.negative_ttl
+        self._entries[result["license_key"]] = (result, time.monotonic() + ttl)
+        self._entries.move_to_end(result["license_key"])
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, license_key: str):
+        if self._entries.pop(license_key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+license_cache = LicenseCache(
+    ttl=LICENSE_CACHE_TTL_SECONDS, negative_ttl=LICENSE_NEGATIVE_TTL_SECONDS, maxsize=LICENSE_CACHE_SIZE
+)
+
+
+# Verdicts for `license_keys` in request order. Cache hits never touch the
+# database; all misses are resolved with a single IN query.
+async def verify_licenses(license_keys: list[str]):
+    results = {}
+    missing = []
+    for license_key in license_keys:
+        if license_key in results:
+            continue
+        cached = license_cache.get(license_key)
+        if cached is None:
+            missing.append(license_key)
+        results[license_key] = cached
+
+    if missing:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(models.ChainLicense.license_key, models.ChainLicense.is_tampered, models.ChainLicense.is_cracked)
+                .where(models.ChainLicense.license_key.in_(missing))
+            )).all()
+        found = {row.license_key: row for row in rows}
+        for license_key in missing:
+            result = verdict(license_key, found.get(license_key))
+            license_cache.put(result)
+            results[license_key] = result
+
+    return [results[license_key] for license_key in license_keys]
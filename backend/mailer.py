@@ -0,0 +1,228 @@
+from sqlalchemy import select, update, or_
+from email.message import EmailMessage
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+from metrics import track
+import models
+import asyncio
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# SMTP settings
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = os.getenv("SMTP_PORT")
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+
+# Outbox dispatch settings
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "50"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "5"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "600"))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", "5"))
+# How long a claimed message stays reserved before another worker may retry it.
+# Each message's lease is renewed just before it is sent, and a send is cut off
+# after MAIL_SEND_TIMEOUT_SECONDS, which has to stay below the lease.
+MAIL_LEASE_SECONDS = float(os.getenv("MAIL_LEASE_SECONDS", "60"))
+MAIL_SEND_TIMEOUT_SECONDS = float(os.getenv("MAIL_SEND_TIMEOUT_SECONDS", "30"))
+# Close the pooled SMTP connection after this long without sending
+MAIL_IDLE_SECONDS = float(os.getenv("MAIL_IDLE_SECONDS", "30"))
+
+
+# Checked when the dispatcher starts rather than at import, so scripts and
+# workers that never send mail don't need SMTP configured
+def check_settings():
+    if not all([SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
+        logger.error("SMTP settings incomplete in .env file")
+        raise ValueError("SMTP settings must be set in .env file")
+    if MAIL_SEND_TIMEOUT_SECONDS >= MAIL_LEASE_SECONDS:
+        logger.error("MAIL_SEND_TIMEOUT_SECONDS must be below MAIL_LEASE_SECONDS")
+        raise ValueError("MAIL_SEND_TIMEOUT_SECONDS must be below MAIL_LEASE_SECONDS")
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def build_message(recipient: str, subject: str, content: str):
+    message = EmailMessage()
+    message.set_content(content)
+    message["Subject"] = subject
+    message["From"] = SMTP_USERNAME
+    message["To"] = recipient
+    return message
+
+
+class MailDispatcher:
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._smtp = None
+        self._last_used = 0.0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        check_settings()
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info("Mail dispatcher started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                sent_any = await self.dispatch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Mail dispatcher error: {e}")
+                sent_any = False
+            if sent_any:
+                continue
+            if self._smtp is not None and asyncio.get_running_loop().time() - self._last_used > MAIL_IDLE_SECONDS:
+                await self._disconnect()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=MAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    # Claim up to MAIL_BATCH_SIZE due messages and deliver them over one connection.
+    # Returns True if anything was claimed.
+    async def dispatch_batch(self):
+        async with AsyncSessionLocal() as db:
+            now = _now()
+            due = or_(models.OutboxEmail.status == "pending", models.OutboxEmail.status == "sending")
+            ids = (await db.scalars(
+                select(models.OutboxEmail.id)
+                .where(due, models.OutboxEmail.next_attempt_at <= now)
+                .order_by(models.OutboxEmail.id)
+                .limit(MAIL_BATCH_SIZE)
+            )).all()
+            if not ids:
+                return False
+
+            # Conditional claim so concurrent workers never send the same message twice
+            await db.execute(
+                update(models.OutboxEmail)
+                .where(models.OutboxEmail.id.in_(ids), due, models.OutboxEmail.next_attempt_at <= now)
+                .values(status="sending", claimed_by=self.worker_id,
+                        next_attempt_at=now + timedelta(seconds=MAIL_LEASE_SECONDS))
+            )
+            await db.commit()
+            # Only this batch's ids: rows left in 'sending' by an earlier batch
+            # that failed partway wait for their lease to expire like any other
+            batch = (await db.scalars(
+                select(models.OutboxEmail)
+                .where(models.OutboxEmail.id.in_(ids), models.OutboxEmail.claimed_by == self.worker_id,
+                       models.OutboxEmail.status == "sending")
+                .order_by(models.OutboxEmail.id)
+            )).all()
+
+            for email in batch:
+                # Renew the lease for this message only; if sending the ones
+                # before it outlasted the lease, another worker may have
+                # reclaimed it, and it is theirs now
+                renewed = await db.execute(
+                    update(models.OutboxEmail)
+                    .where(models.OutboxEmail.id == email.id, models.OutboxEmail.claimed_by == self.worker_id,
+                           models.OutboxEmail.status == "sending")
+                    .values(next_attempt_at=_now() + timedelta(seconds=MAIL_LEASE_SECONDS))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if renewed.rowcount == 0:
+                    continue
+                try:
+                    await asyncio.wait_for(self._send(build_message(email.recipient, email.subject, email.content)),
+                                           MAIL_SEND_TIMEOUT_SECONDS)
+                    email.status = "sent"
+                    email.sent_at = _now()
+                    email.claimed_by = None
+                    logger.info(f"Email sent to {email.recipient}")
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._drop_connection()  # left mid-command
+                    email.attempts += 1
+                    email.last_error = str(e)
+                    email.claimed_by = None
+                    if email.attempts >= MAIL_MAX_ATTEMPTS:
+                        email.status = "failed"
+                        logger.error(f"Giving up on email to {email.recipient} after {email.attempts} attempts: {e}")
+                    else:
+                        delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), MAIL_RETRY_MAX_SECONDS)
+                        email.status = "pending"
+                        email.next_attempt_at = _now() + timedelta(seconds=delay)
+                        logger.warning(f"Failed to send email to {email.recipient}, retrying in {delay:.0f}s: {e}")
+                await db.commit()
+            return True
+
+    async def _connect(self):
+        if self._smtp is None or not self._smtp.is_connected:
+            import aiosmtplib
+
+            smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=int(SMTP_PORT), use_tls=SMTP_USE_TLS)
+            await smtp.connect()
+            await smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+            self._smtp = smtp
+        return self._smtp
+
+    def _drop_connection(self):
+        if self._smtp is not None:
+            self._smtp.close()
+            self._smtp = None
+
+    async def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                await self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    async def _send(self, message):
+        import aiosmtplib
+
+        with track("smtp", "send"):
+            smtp = await self._connect()
+            try:
+                await smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                # Pooled connection went stale; reconnect once and retry
+                smtp.close()
+                self._smtp = None
+                smtp = await self._connect()
+                await smtp.send_message(message)
+        self._last_used = asyncio.get_running_loop().time()
+
+
+dispatcher = MailDispatcher()
+
+
+# Queue an email in the outbox in the caller's transaction, so it is sent if
+# and only if the change it reports is committed. Call dispatcher.wake() after
+# committing; the dispatcher delivers it in the background.
+def queue_email(db, email: str, subject: str, content: str):
+    with track("mail", "enqueue"):
+        db.add(models.OutboxEmail(recipient=email, subject=subject, content=content, next_attempt_at=_now()))
+    logger.info(f"Email to {email} queued")
@@ -1,20 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from pydantic import BaseModel, Field
 import models
-from database import SessionLocal, engine
-import bcrypt
-import jwt
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from passwords import hash_password, verify_password, needs_rehash, BCRYPT_ROUNDS
+import passwords
 import random
 import string
-import aiosmtplib
-from email.message import EmailMessage
 from dotenv import load_dotenv
 import os
 import logging
 import hashlib
+import hmac
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from storage import store_upload, BodySizeLimitMiddleware
+from similarity import BlockSketch, find_similar
+from scanner import scan_blob, record_hits, save_signature, disable_signature, signature_set
+import scanner
+from mailer import queue_email, dispatcher
+from auth_cache import Principal, user_cache
+from tokens import InvalidToken, decode_token, issue_tokens, denylist, token_cache
+import tokens
+from otp_store import otp_store, OTP_TTL_SECONDS
+from chain_indexer import create_indexer, topic_of
+from chain_submitter import submitter, queue_status_change, submitter_stats
+from license_cache import license_cache, verify_licenses
+from response_cache import catalogue_cache, bump_generation
+from digests import record_changes
+from admin_events import event_hub, publish
+from rate_limit import rate_limit, rate_limiter
+from metrics import MetricsMiddleware, instrument_engines, registry, track
+from pagination import keyset_page, parse_fields, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, SOFTWARE_FIELDS, CATALOGUE_FIELDS, USER_FIELDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,50 +45,64 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Create FastAPI app
-app = FastAPI()
-
-# Create database tables
-try:
-    models.Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Failed to create database tables: {e}")
-    raise
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# JWT settings
-JWT_SECRET = os.getenv("JWT_SECRET")
-if not JWT_SECRET:
-    logger.error("JWT_SECRET not set in .env file")
-    raise ValueError("JWT_SECRET must be set in .env file")
-ALGORITHM = "HS256"
-
-# SMTP settings
-SMTP_HOST = os.getenv("SMTP_HOST")
-SMTP_PORT = os.getenv("SMTP_PORT")
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-if not all([SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
-    logger.error("SMTP settings incomplete in .env file")
-    raise ValueError("SMTP settings must be set in .env file")
-SMTP_PORT = int(SMTP_PORT)
+# Startup and shutdown. Settings checks, the schema check and background
+# workers run here rather than at import, so importing this module (every
+# uvicorn worker, every script) does no database or network I/O.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tokens.check_settings()
+    await run_in_threadpool(ensure_schema)
+    await denylist.sync()
+    denylist.start()
+    dispatcher.start()
+    chain_indexer = create_indexer()
+    if chain_indexer is not None:
+        chain_indexer.start()
+    submitter.start()
+    event_hub.start()
+    try:
+        yield
+    finally:
+        await event_hub.stop()
+        await dispatcher.stop()
+        await denylist.stop()
+        if chain_indexer is not None:
+            await chain_indexer.stop()
+        await submitter.stop()
+        passwords.shutdown()
+        scanner.shutdown()
+        rate_limiter.close()
+        await dispose_engines()
+
+router = APIRouter()
+
+def create_app():
+    app = FastAPI(lifespan=lifespan)
+
+    # Refuse oversized uploads before they are spooled; inside CORS so the
+    # browser can read the 413
+    app.add_middleware(BodySizeLimitMiddleware)
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Request and dependency metrics, served at /metrics
+    app.add_middleware(MetricsMiddleware)
+    instrument_engines()
+
+    app.include_router(router)
+    return app
 
 # Dependency for database sessions
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # OAuth2PasswordBearer for token-based authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
@@ -91,49 +127,62 @@ class OtpVerify(BaseModel):
 class UserUpdate(BaseModel):
     address: str
 
-# OTP storage (in-memory for development; use Redis in production)
-otp_store = {}
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-# Function to send email
-async def send_email(email: str, subject: str, content: str):
-    message = EmailMessage()
-    message.set_content(content)
-    message["Subject"] = subject
-    message["From"] = SMTP_USERNAME
-    message["To"] = email
+class LogoutRequest(BaseModel):
+    refresh_token: str | None = None
 
-    try:
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-            use_tls=True,
-        )
-        logger.info(f"Email sent to {email}")
-    except Exception as e:
-        logger.error(f"Failed to send email to {email}: {e}")
-        raise
+class CrackSignatureCreate(BaseModel):
+    name: str = Field(..., min_length=1)
+    pattern: str  # hex
+    description: str | None = None
+
+# Bulk admin actions; capped so the IN (...) lists stay within SQLite's bind limit
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+
+class BulkUserAction(BaseModel):
+    emails: list[str] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class BulkSoftwareAction(BaseModel):
+    hashes: list[str] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class LicenseVerifyRequest(BaseModel):
+    license_keys: list[str] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
 
-# Get current user from JWT
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Verified claims of the request's access token
+async def get_token_claims(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        email: str = payload.get("email")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.PyJWTError:
+        return decode_token(token, "access")
+    except InvalidToken as e:
+        logger.warning(f"Rejected access token: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+
+# Caller as described by the access token alone, for read-only endpoints that
+# only need id, email, role and approval: no session, no DB round trip.
+# Changes reach the token at the next refresh; rejected users are revoked.
+async def get_token_user(claims: dict = Depends(get_token_claims)):
+    return Principal.from_claims(claims)
+
+# Current user from the users row (cached), for endpoints that need the
+# address or must see changes made since the token was issued
+async def get_current_user(claims: dict = Depends(get_token_claims), db: AsyncSession = Depends(get_db)):
+    with track("auth", "get_current_user"):
+        email = claims["sub"]
+        principal = user_cache.get(email)
+        if principal is not None:
+            return principal
+
+        user = await db.scalar(select(models.User).where(models.User.email == email))
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal = Principal.from_user(user)
+        user_cache.put(principal)
+        return principal
 
 # Endpoint for user registration
-@app.post("/users/register")
-async def register(user: UserRegister, db: Session = Depends(get_db)):
+@router.post("/users/register", dependencies=[Depends(rate_limit)])
+async def register(user: UserRegister, db: AsyncSession = Depends(get_db)):
     logger.info(f"Register attempt for email: {user.email}")
     if not user.email or not user.email.strip():
         logger.warning("Registration failed: Email is required")
@@ -144,13 +193,15 @@ async def register(user: UserRegister, db: Session = Depends(get_db)):
         logger.warning("Registration failed: Invalid password format")
         raise HTTPException(status_code=400, detail="Password must be 8+ characters with 1 uppercase, 1 number, 1 special character")
 
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         logger.warning(f"Registration failed: Email {user.email} already registered")
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        hashed_password = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode()
+        hashed_password = await hash_password(user.password)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Password hashing failed: {e}")
         raise HTTPException(status_code=500, detail="Password hashing failed")
@@ -163,52 +214,64 @@ async def register(user: UserRegister, db: Session = Depends(get_db)):
             is_approved=False
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        logger.info(f"User registered successfully: {user.email}")
-    except Exception as e:
-        logger.error(f"Database error during registration: {e}")
-        raise HTTPException(status_code=500, detail="Database error")
-
-    try:
-        await send_email(
+        publish(db, "users.added", {"users": [{"email": user.email}]})
+        queue_email(
+            db,
             user.email,
             "Registration Pending Approval",
             "Your registration is pending admin approval. You will be notified once approved."
         )
+        await db.commit()
+        await db.refresh(db_user)
+        event_hub.wake()
+        dispatcher.wake()
+        logger.info(f"User registered successfully: {user.email}")
     except Exception as e:
-        logger.error(f"Failed to send pending approval email to {user.email}: {e}")
-        logger.warning("Proceeding with registration despite email failure")
+        logger.error(f"Database error during registration: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
 
     return {"message": "Registration successful, awaiting admin approval"}
 
 # Endpoint for user login
-@app.post("/users/login")
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+@router.post("/users/login", dependencies=[Depends(rate_limit)])
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
     logger.info(f"Login attempt for email: {user.email}")
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     
     if not db_user:
         logger.warning(f"Login failed for {user.email}: User not found")
         raise HTTPException(status_code=404, detail="User not found")
     
-    if user.password and not bcrypt.checkpw(user.password.encode(), db_user.hashed_password.encode()):
+    if user.password and not await verify_password(user.password, db_user.hashed_password):
         logger.warning(f"Login failed for {user.email}: Invalid password")
         raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # Upgrade hashes created with an older cost factor while we have the plaintext
+    if user.password and needs_rehash(db_user.hashed_password):
+        try:
+            db_user.hashed_password = await hash_password(user.password)
+            await db.commit()
+            logger.info(f"Rehashed password for {user.email} at cost {BCRYPT_ROUNDS}")
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Password rehash failed for {user.email}: {e}")
     
     if not db_user.is_approved:
         logger.warning(f"Login failed for {user.email}: Account not approved")
         raise HTTPException(status_code=403, detail="Account not approved by admin")
 
     otp = ''.join(random.choices(string.digits, k=6))
-    otp_store[user.email] = otp
+    await otp_store.put(user.email, otp)
 
     try:
-        await send_email(
+        queue_email(
+            db,
             user.email,
             "Your OTP Code",
-            f"Your OTP code is {otp}. It is valid for 5 minutes."
+            f"Your OTP code is {otp}. It is valid for {OTP_TTL_SECONDS // 60} minutes."
         )
+        await db.commit()
+        dispatcher.wake()
     except Exception as e:
         logger.error(f"Failed to send OTP for {user.email}: {e}")
         raise HTTPException(status_code=500, detail="Failed to send OTP")
@@ -216,10 +279,10 @@ async def login(user: UserLogin, db: Session = Depends(get_db)):
     return {"message": "OTP sent to your email"}
 
 # Endpoint for resending OTP
-@app.post("/users/resend-otp")
-async def resend_otp(email: str, db: Session = Depends(get_db)):
+@router.post("/users/resend-otp", dependencies=[Depends(rate_limit)])
+async def resend_otp(email: str, db: AsyncSession = Depends(get_db)):
     logger.info(f"Resend OTP attempt for email: {email}")
-    db_user = db.query(models.User).filter(models.User.email == email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == email))
     if not db_user:
         logger.warning(f"Resend OTP failed: {email} not found")
         raise HTTPException(status_code=404, detail="User not found")
@@ -229,14 +292,17 @@ async def resend_otp(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="Account not approved by admin")
 
     otp = ''.join(random.choices(string.digits, k=6))
-    otp_store[email] = otp
+    await otp_store.put(email, otp)
 
     try:
-        await send_email(
+        queue_email(
+            db,
             email,
             "Your OTP Code",
-            f"Your OTP code is {otp}. It is valid for 5 minutes."
+            f"Your OTP code is {otp}. It is valid for {OTP_TTL_SECONDS // 60} minutes."
         )
+        await db.commit()
+        dispatcher.wake()
         logger.info(f"OTP resent to {email}")
         return {"message": "OTP resent to your email"}
     except Exception as e:
@@ -244,37 +310,70 @@ async def resend_otp(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to resend OTP")
 
 # Endpoint for OTP verification
-@app.post("/users/verify-otp")
-async def verify_otp(data: OtpVerify, db: Session = Depends(get_db)):
+@router.post("/users/verify-otp")
+async def verify_otp(data: OtpVerify, db: AsyncSession = Depends(get_db)):
     logger.info(f"OTP verification attempt for email: {data.email}")
-    stored_otp = otp_store.get(data.email)
-    if not stored_otp or stored_otp != data.otp:
+    if not await otp_store.consume(data.email, data.otp):
         logger.warning(f"OTP verification failed for {data.email}: Invalid OTP")
         raise HTTPException(status_code=401, detail="Invalid OTP")
 
-    db_user = db.query(models.User).filter(models.User.email == data.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == data.email))
     if not db_user or not db_user.is_approved:
         logger.warning(f"OTP verification failed for {data.email}: User not approved")
         raise HTTPException(status_code=403, detail="Account not approved by admin")
 
     try:
-        token = jwt.encode({"email": data.email, "role": db_user.role}, JWT_SECRET, algorithm=ALGORITHM)
+        issued = issue_tokens(db_user)
     except Exception as e:
         logger.error(f"JWT encoding failed: {e}")
         raise HTTPException(status_code=500, detail=f"JWT encoding failed: {str(e)}")
 
-    otp_store.pop(data.email, None)
     logger.info(f"OTP verified and token issued for {data.email}")
 
-    return {
-        "access_token": token,
-        "token_type": "bearer",
-        "role": db_user.role
-    }
+    return {**issued, "role": db_user.role}
+
+# Endpoint for exchanging a refresh token for a new token pair. Claims are
+# re-read from the users row, and the old refresh token is revoked so each
+# one can be used once.
+@router.post("/users/refresh-token")
+async def refresh_token(data: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    try:
+        claims = decode_token(data.refresh_token, "refresh")
+    except InvalidToken as e:
+        logger.warning(f"Token refresh failed: {e}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    db_user = await db.scalar(select(models.User).where(models.User.email == claims["sub"]))
+    if not db_user or not db_user.is_approved:
+        logger.warning(f"Token refresh failed for {claims['sub']}: User not approved")
+        raise HTTPException(status_code=403, detail="Account not approved by admin")
+
+    # Used once: of two concurrent refreshes with the same token, only the
+    # one whose revocation is recorded gets new tokens
+    if not await denylist.revoke_token(claims, db):
+        logger.warning(f"Token refresh failed for {claims['sub']}: Refresh token already used")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    await db.commit()
+    logger.info(f"Tokens refreshed for {db_user.email}")
+    return {**issue_tokens(db_user), "role": db_user.role}
+
+# Endpoint for logging out: revokes the access token and, if given, the refresh token
+@router.post("/users/logout")
+async def logout(data: LogoutRequest | None = None, claims: dict = Depends(get_token_claims)):
+    await denylist.revoke_token(claims)
+    if data and data.refresh_token:
+        try:
+            refresh_claims = decode_token(data.refresh_token, "refresh")
+            if refresh_claims["sub"] == claims["sub"]:
+                await denylist.revoke_token(refresh_claims)
+        except InvalidToken:
+            pass
+    logger.info(f"Logged out {claims['sub']}")
+    return {"message": "Logged out"}
 
 # Endpoint to get current user
-@app.get("/users/me")
-async def get_current_user_endpoint(current_user: models.User = Depends(get_current_user)):
+@router.get("/users/me")
+async def get_current_user_endpoint(current_user: Principal = Depends(get_current_user)):
     return {
         "email": current_user.email,
         "role": current_user.role,
@@ -283,17 +382,18 @@ async def get_current_user_endpoint(current_user: models.User = Depends(get_curr
     }
 
 # Endpoint to update user address
-@app.patch("/users/update-address")
+@router.patch("/users/update-address")
 async def update_user_address(
     data: UserUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     logger.info(f"Updating address for user {current_user.email}")
     try:
-        current_user.address = data.address
-        db.commit()
-        db.refresh(current_user)
+        user = await db.scalar(select(models.User).where(models.User.email == current_user.email))
+        user.address = data.address
+        await db.commit()
+        user_cache.invalidate(current_user.email)
         logger.info(f"Address updated for {current_user.email}: {data.address}")
         return {"message": "Address updated successfully"}
     except Exception as e:
@@ -301,22 +401,74 @@ async def update_user_address(
         raise HTTPException(status_code=500, detail="Database error")
 
 # Admin endpoints
-@app.get("/admin/pending-users")
-async def get_pending_users(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/admin/pending-users")
+async def get_pending_users(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized access to pending-users by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    users = db.query(models.User).filter(models.User.is_approved == False).all()
-    return {"pending_users": [{"email": user.email} for user in users]}
+    users, next_cursor = await keyset_page(
+        db, models.User, [models.User.is_approved == False],
+        parse_fields(fields, USER_FIELDS, ["email"]), limit, cursor
+    )
+    return {"pending_users": users, "next_cursor": next_cursor}
+
+@router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to cache-stats by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
 
-@app.post("/admin/approve-user/{email}")
-async def approve_user(email: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return {"user_cache": user_cache.stats(), "token_cache": token_cache.stats(),
+            "license_cache": license_cache.stats(), "catalogue_cache": catalogue_cache.stats()}
+
+@router.get("/admin/chain-submitter")
+async def get_chain_submitter(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to chain-submitter by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return await submitter_stats(db)
+
+# Server-Sent Events with changes to the pending users and software queues,
+# so dashboards apply small deltas instead of re-fetching both listings.
+# A 'resync' event means the client missed events and should reload them.
+@router.get("/admin/events")
+async def get_admin_events(
+    request: Request,
+    last_event_id: int | None = Query(None),
+    claims: dict = Depends(get_token_claims),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to admin events by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    header = request.headers.get("last-event-id")
+    if header is not None:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    return StreamingResponse(
+        event_hub.stream(request, last_event_id, claims),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/admin/approve-user/{email}")
+async def approve_user(email: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized user approval attempt by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         logger.warning(f"User approval failed: {email} not found")
         raise HTTPException(status_code=404, detail="User not found")
@@ -325,50 +477,139 @@ async def approve_user(email: str, current_user: models.User = Depends(get_curre
         raise HTTPException(status_code=400, detail="User already approved")
     
     user.is_approved = True
-    db.commit()
+    publish(db, "users.removed", {"emails": [email], "status": "approved"})
+    queue_email(
+        db,
+        email,
+        "Account Approved",
+        "Your account has been approved. You can now log in to the system."
+    )
+    await db.commit()
+    user_cache.invalidate(email)
+    event_hub.wake()
+    dispatcher.wake()
     logger.info(f"User {email} approved by {current_user.email}")
     
-    try:
-        await send_email(
-            email,
-            "Account Approved",
-            "Your account has been approved. You can now log in to the system."
-        )
-    except Exception as e:
-        logger.error(f"Failed to send approval email to {email}: {e}")
-        logger.warning("Proceeding with user approval despite email failure")
-    
     return {"message": f"User {email} approved"}
 
-@app.post("/admin/reject-user/{email}")
-async def reject_user(email: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/admin/reject-user/{email}")
+async def reject_user(email: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized user rejection attempt by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         logger.warning(f"User rejection failed: {email} not found")
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    publish(db, "users.removed", {"emails": [email], "status": "rejected"})
+    queue_email(
+        db,
+        email,
+        "Account Rejected",
+        "Your registration was rejected by the admin. Please contact support for more information."
+    )
+    await db.commit()
+    user_cache.invalidate(email)
+    event_hub.wake()
+    dispatcher.wake()
+    await denylist.revoke_users([email])
     logger.info(f"User {email} rejected by {current_user.email}")
     
-    try:
-        await send_email(
-            email,
-            "Account Rejected",
-            "Your registration was rejected by the admin. Please contact support for more information."
-        )
-    except Exception as e:
-        logger.error(f"Failed to send rejection email to {email}: {e}")
-        logger.warning("Proceeding with user rejection despite email failure")
-    
     return {"message": f"User {email} rejected"}
 
-@app.post("/admin/create-admin")
-async def create_admin(admin_data: CreateAdminRequest, db: Session = Depends(get_db)):
+@router.post("/admin/bulk-approve-users")
+async def bulk_approve_users(data: BulkUserAction, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized bulk user approval attempt by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    emails = list(dict.fromkeys(data.emails))
+    users = {user.email: user for user in (await db.scalars(select(models.User).where(models.User.email.in_(emails)))).all()}
+    results, approved = [], []
+    for email in emails:
+        user = users.get(email)
+        if not user:
+            results.append({"email": email, "ok": False, "detail": "User not found"})
+        elif user.is_approved:
+            results.append({"email": email, "ok": False, "detail": "User already approved"})
+        else:
+            results.append({"email": email, "ok": True, "detail": "User approved"})
+            approved.append(user)
+
+    if approved:
+        try:
+            await db.execute(
+                update(models.User)
+                .where(models.User.id.in_([user.id for user in approved]))
+                .values(is_approved=True)
+            )
+            publish(db, "users.removed", {"emails": [user.email for user in approved], "status": "approved"})
+            for user in approved:
+                queue_email(
+                    db,
+                    user.email,
+                    "Account Approved",
+                    "Your account has been approved. You can now log in to the system."
+                )
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Database error during bulk user approval: {e}")
+            raise HTTPException(status_code=500, detail="Database error")
+        event_hub.wake()
+        dispatcher.wake()
+    for user in approved:
+        user_cache.invalidate(user.email)
+    logger.info(f"{len(approved)} of {len(emails)} users approved by {current_user.email}")
+
+    return {"results": results, "succeeded": len(approved), "failed": len(emails) - len(approved)}
+
+@router.post("/admin/bulk-reject-users")
+async def bulk_reject_users(data: BulkUserAction, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized bulk user rejection attempt by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    emails = list(dict.fromkeys(data.emails))
+    users = {user.email: user for user in (await db.scalars(select(models.User).where(models.User.email.in_(emails)))).all()}
+    results, rejected = [], []
+    for email in emails:
+        user = users.get(email)
+        if not user:
+            results.append({"email": email, "ok": False, "detail": "User not found"})
+        else:
+            results.append({"email": email, "ok": True, "detail": "User rejected"})
+            rejected.append(user)
+
+    if rejected:
+        try:
+            await db.execute(delete(models.User).where(models.User.id.in_([user.id for user in rejected])))
+            publish(db, "users.removed", {"emails": [user.email for user in rejected], "status": "rejected"})
+            for user in rejected:
+                queue_email(
+                    db,
+                    user.email,
+                    "Account Rejected",
+                    "Your registration was rejected by the admin. Please contact support for more information."
+                )
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Database error during bulk user rejection: {e}")
+            raise HTTPException(status_code=500, detail="Database error")
+        event_hub.wake()
+        dispatcher.wake()
+    for user in rejected:
+        user_cache.invalidate(user.email)
+    if rejected:
+        await denylist.revoke_users([user.email for user in rejected])
+    logger.info(f"{len(rejected)} of {len(emails)} users rejected by {current_user.email}")
+
+    return {"results": results, "succeeded": len(rejected), "failed": len(emails) - len(rejected)}
+
+@router.post("/admin/create-admin")
+async def create_admin(admin_data: CreateAdminRequest, db: AsyncSession = Depends(get_db)):
     logger.info(f"Create admin attempt for email: {admin_data.email}")
     if not admin_data.email or not admin_data.email.strip():
         logger.warning("Admin creation failed: Email is required")
@@ -381,13 +622,15 @@ async def create_admin(admin_data: CreateAdminRequest, db: Session = Depends(get
         logger.warning("Admin creation failed: Invalid password format")
         raise HTTPException(status_code=400, detail="Password must be 8+ characters with 1 uppercase, 1 number, 1 special character")
 
-    db_user = db.query(models.User).filter(models.User.email == admin_data.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == admin_data.email))
     if db_user:
         logger.warning(f"Admin creation failed: Email {admin_data.email} already registered")
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        hashed_password = bcrypt.hashpw(admin_data.password.encode(), bcrypt.gensalt()).decode()
+        hashed_password = await hash_password(admin_data.password)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Password hashing failed: {e}")
         raise HTTPException(status_code=500, detail="Password hashing failed")
@@ -400,204 +643,642 @@ async def create_admin(admin_data: CreateAdminRequest, db: Session = Depends(get
             is_approved=True
         )
         db.add(db_admin)
-        db.commit()
-        db.refresh(db_admin)
-        logger.info(f"Admin created successfully: {admin_data.email}")
-    except Exception as e:
-        logger.error(f"Database error during admin creation: {e}")
-        raise HTTPException(status_code=500, detail="Database error")
-
-    try:
-        await send_email(
+        queue_email(
+            db,
             admin_data.email,
             "Admin Account Created",
             f"Your admin account for the Software Cracking Detection System has been created. You can log in at http://localhost:5173/login using your email and password."
         )
+        await db.commit()
+        await db.refresh(db_admin)
+        dispatcher.wake()
+        logger.info(f"Admin created successfully: {admin_data.email}")
     except Exception as e:
-        logger.error(f"Failed to send admin confirmation email to {admin_data.email}: {e}")
-        logger.warning("Proceeding with admin creation despite email failure")
+        logger.error(f"Database error during admin creation: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
 
     return {"message": f"Admin user {admin_data.email} created successfully"}
 
 # Software endpoints
-@app.post("/software/upload")
+@router.post("/software/upload")
 async def upload_software(
     name: str = Form(...),
     version: str = Form(...),
     file: UploadFile = File(...),
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     logger.info(f"Received upload request: name={name}, version={version}, file={file.filename}")
     if not current_user.is_approved:
         logger.warning(f"Unauthorized software upload by unapproved user {current_user.email}")
         raise HTTPException(status_code=403, detail="Account not approved")
     
-    contents = await file.read()
-    file_hash = hashlib.sha256(contents).hexdigest()
+    sketch = BlockSketch()
+    file_hash, file_size = await store_upload(file, sketch=sketch)
     
-    existing_software = db.query(models.Software).filter(models.Software.hash == file_hash).first()
+    existing_software = await db.scalar(select(models.Software).where(models.Software.hash == file_hash))
     if existing_software:
         logger.warning(f"Software upload failed: Hash {file_hash} already exists")
         raise HTTPException(status_code=400, detail="Software already exists")
 
+    # Near-duplicates of another developer's approved build (e.g. a patched crack)
+    # are accepted but flagged for the admin
+    signature = sketch.signature()
+    similar_to = await find_similar(db, signature, current_user.email) if signature is not None else None
+    if similar_to:
+        logger.warning(f"Upload {file_hash} by {current_user.email} is {similar_to['similarity']:.0%} similar to approved software {similar_to['hash']}")
+
+    # Known crack loaders, keygen stubs and patched license checks
+    scan_generation, scan_hits = await scan_blob(db, file_hash)
+    crack_signatures = sorted(signature_set.names[signature_id] for signature_id in scan_hits)
+    if crack_signatures:
+        logger.warning(f"Upload {file_hash} by {current_user.email} matches crack signatures: {', '.join(crack_signatures)}")
+
     try:
         software = models.Software(
             name=name,
             version=version,
             hash=file_hash,
+            hash_topic=topic_of(file_hash),
             developer_email=current_user.email,
-            is_approved=False,
-            is_rejected=False
+            status=models.SoftwareStatus.pending
         )
         db.add(software)
-        db.commit()
-        db.refresh(software)
-        logger.info(f"Software {name} uploaded by {current_user.email}")
+        await record_changes(db, "database", [(software.hash_topic, None, software.status)])
+        await db.flush()
+        if signature is not None:
+            db.add(models.SoftwareSignature(
+                software_id=software.id,
+                signature=signature,
+                blocks=sketch.blocks,
+                similar_to_id=similar_to["id"] if similar_to else None,
+                similarity=similar_to["similarity"] if similar_to else None,
+            ))
+        await record_hits(db, software.id, scan_generation, scan_hits)
+        publish(db, "software.added", {"software": [
+            {"name": name, "version": version, "hash": file_hash, "developer_email": current_user.email}
+        ]})
+        content = f"Software {name} (version {version}) uploaded by {current_user.email} awaits approval."
+        if similar_to:
+            content += (f" Warning: it is {similar_to['similarity']:.0%} similar to approved software "
+                        f"{similar_to['name']} (version {similar_to['version']}, hash {similar_to['hash']}).")
+        if crack_signatures:
+            content += f" Warning: it matches crack signatures {', '.join(crack_signatures)}."
+        queue_email(db, "admin@example.com", "New Software Upload", content)
+        await db.commit()
+        event_hub.wake()
+        dispatcher.wake()
+        logger.info(f"Software {name} ({file_size} bytes) uploaded by {current_user.email}")
     except Exception as e:
         logger.error(f"Database error during software upload: {e}")
         raise HTTPException(status_code=500, detail="Database error")
 
-    try:
-        await send_email(
-            "admin@example.com",
-            "New Software Upload",
-            f"Software {name} (version {version}) uploaded by {current_user.email} awaits approval."
-        )
-    except Exception as e:
-        logger.error(f"Failed to send admin notification: {e}")
-        logger.warning("Proceeding with software upload despite email failure")
-
-    return {"message": "Software uploaded, awaiting admin approval", "hash": file_hash}
+    if similar_to:
+        similar_to.pop("id")
+    return {"message": "Software uploaded, awaiting admin approval", "hash": file_hash, "similar_to": similar_to,
+            "crack_signatures": crack_signatures}
 
-@app.get("/software/pending")
-async def get_pending_software_user(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/software/pending")
+async def get_pending_software_user(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_token_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not current_user.is_approved:
         logger.warning(f"Unauthorized access to pending software by {current_user.email}")
         raise HTTPException(status_code=403, detail="Account not approved")
     
-    software = db.query(models.Software).filter(
-        models.Software.developer_email == current_user.email,
-        models.Software.is_approved == False,
-        models.Software.is_rejected == False
-    ).all()
-    return {"pending_software": [{"name": s.name, "version": s.version, "hash": s.hash} for s in software]}
-
-@app.get("/software/approved")
-async def get_approved_software(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    software, next_cursor = await keyset_page(
+        db, models.Software, [models.Software.developer_email == current_user.email, models.Software.status == models.SoftwareStatus.pending],
+        parse_fields(fields, SOFTWARE_FIELDS, ["name", "version", "hash"]), limit, cursor
+    )
+    return {"pending_software": software, "next_cursor": next_cursor}
+
+@router.get("/software/approved")
+async def get_approved_software(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_token_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not current_user.is_approved:
         logger.warning(f"Unauthorized access to approved software by {current_user.email}")
         raise HTTPException(status_code=403, detail="Account not approved")
     
-    software = db.query(models.Software).filter(
-        models.Software.developer_email == current_user.email,
-        models.Software.is_approved == True,
-        models.Software.is_rejected == False
-    ).all()
-    return {"approved_software": [{"name": s.name, "version": s.version, "hash": s.hash} for s in software]}
-
-@app.get("/software/rejected")
-async def get_rejected_software(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    software, next_cursor = await keyset_page(
+        db, models.Software, [models.Software.developer_email == current_user.email, models.Software.status == models.SoftwareStatus.approved],
+        parse_fields(fields, SOFTWARE_FIELDS, ["name", "version", "hash"]), limit, cursor
+    )
+    return {"approved_software": software, "next_cursor": next_cursor}
+
+@router.get("/software/rejected")
+async def get_rejected_software(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_token_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not current_user.is_approved:
         logger.warning(f"Unauthorized access to rejected software by {current_user.email}")
         raise HTTPException(status_code=403, detail="Account not approved")
     
-    software = db.query(models.Software).filter(
-        models.Software.developer_email == current_user.email,
-        models.Software.is_rejected == True
-    ).all()
-    return {"rejected_software": [{"name": s.name, "version": s.version, "hash": s.hash} for s in software]}
-
-@app.get("/software/all-approved")
-async def get_all_approved_software(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    software, next_cursor = await keyset_page(
+        db, models.Software, [models.Software.developer_email == current_user.email, models.Software.status == models.SoftwareStatus.rejected],
+        parse_fields(fields, SOFTWARE_FIELDS, ["name", "version", "hash"]), limit, cursor
+    )
+    return {"rejected_software": software, "next_cursor": next_cursor}
+
+@router.get("/software/summary")
+async def get_software_summary(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_token_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_approved:
+        logger.warning(f"Unauthorized access to software summary by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Account not approved")
+
+    # Per-status count and newest id, answered from the (developer_email, status)
+    # index alone. Rows are only ever added or moved out of pending, so these
+    # numbers change whenever the dashboard content does.
+    stats = (await db.execute(
+        select(models.Software.status, func.count(), func.max(models.Software.id))
+        .where(models.Software.developer_email == current_user.email)
+        .group_by(models.Software.status)
+    )).all()
+    counts = {status.value: 0 for status in models.SoftwareStatus}
+    fingerprint = [current_user.email]
+    for status, count, max_id in sorted(stats):
+        counts[status.value] = count
+        fingerprint.append(f"{status.value}:{count}:{max_id}")
+    etag = f'W/"{hashlib.sha256("|".join(fingerprint).encode()).hexdigest()[:32]}"'
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    rows = (await db.execute(
+        select(models.Software.status, models.Software.name, models.Software.version, models.Software.hash)
+        .where(models.Software.developer_email == current_user.email)
+        .order_by(models.Software.status, models.Software.id)
+    )).all()
+    grouped = {status.value: [] for status in models.SoftwareStatus}
+    for status, name, version, file_hash in rows:
+        grouped[status.value].append({"name": name, "version": version, "hash": file_hash})
+
+    response.headers.update(headers)
+    return {
+        "counts": counts,
+        "pending_software": grouped["pending"],
+        "approved_software": grouped["approved"],
+        "rejected_software": grouped["rejected"],
+    }
+
+# The catalogue is the same for every user and only changes when an admin
+# approves software, so pages are served from catalogue_cache as ready-made
+# JSON/gzip bytes with an ETag
+@router.get("/software/all-approved")
+async def get_all_approved_software(
+    request: Request,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_token_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not current_user.is_approved:
         logger.warning(f"Unauthorized access to all approved software by {current_user.email}")
         raise HTTPException(status_code=403, detail="Account not approved")
     
-    software = db.query(models.Software).filter(
-        models.Software.is_approved == True,
-        models.Software.is_rejected == False
-    ).all()
-    return {"all_approved_software": [{"name": s.name, "version": s.version, "hash": s.hash, "developer_email": s.developer_email} for s in software]}
-
-@app.get("/admin/pending-software")
-async def get_pending_software(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    columns = parse_fields(fields, CATALOGUE_FIELDS, ["name", "version", "hash", "developer_email"])
+    key = (limit, cursor, tuple(columns))
+    generation = await catalogue_cache.current_generation(db)
+    cached = catalogue_cache.get(key)
+    if cached is None:
+        software, next_cursor = await keyset_page(
+            db, models.Software, [models.Software.status == models.SoftwareStatus.approved], columns, limit, cursor
+        )
+        cached = catalogue_cache.put(key, generation, {"all_approved_software": software, "next_cursor": next_cursor})
+    return cached.response(request)
+
+@router.get("/admin/pending-software")
+async def get_pending_software(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: int | None = None,
+    fields: str | None = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized access to pending-software by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    software = db.query(models.Software).filter(
-        models.Software.is_approved == False,
-        models.Software.is_rejected == False
-    ).all()
-    return {"pending_software": [{"name": s.name, "version": s.version, "hash": s.hash, "developer_email": s.developer_email} for s in software]}
-
-@app.post("/admin/approve-software/{hash}")
-async def approve_software(hash: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    software, next_cursor = await keyset_page(
+        db, models.Software, [models.Software.status == models.SoftwareStatus.pending],
+        parse_fields(fields, SOFTWARE_FIELDS, ["name", "version", "hash", "developer_email"]), limit, cursor
+    )
+    return {"pending_software": software, "next_cursor": next_cursor}
+
+@router.post("/admin/approve-software/{hash}")
+async def approve_software(hash: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized software approval attempt by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    software = db.query(models.Software).filter(models.Software.hash == hash).first()
+    software = await db.scalar(select(models.Software).where(models.Software.hash == hash))
     if not software:
         logger.warning(f"Software approval failed: Hash {hash} not found")
         raise HTTPException(status_code=404, detail="Software not found")
     
-    if software.is_approved:
+    if software.status == models.SoftwareStatus.approved:
         logger.warning(f"Software approval failed: Hash {hash} already approved")
         raise HTTPException(status_code=400, detail="Software already approved")
     
-    if software.is_rejected:
+    if software.status == models.SoftwareStatus.rejected:
         logger.warning(f"Software approval failed: Hash {hash} is rejected")
         raise HTTPException(status_code=400, detail="Software is rejected")
     
-    software.is_approved = True
-    db.commit()
+    await record_changes(db, "database", [(software.hash_topic, software.status, models.SoftwareStatus.approved)])
+    software.status = models.SoftwareStatus.approved
+    chain_status = queue_status_change(db, [software], "approve")
+    await bump_generation(db, catalogue_cache.name)
+    publish(db, "software.removed", {"hashes": [hash], "status": "approved"})
+    queue_email(
+        db,
+        software.developer_email,
+        "Software Approved",
+        f"Your software {software.name} (version {software.version}) has been approved and can now be licensed."
+    )
+    await db.commit()
+    catalogue_cache.invalidate()
+    submitter.wake()
+    event_hub.wake()
+    dispatcher.wake()
     logger.info(f"Software {software.name} approved by {current_user.email}")
     
-    try:
-        await send_email(
-            software.developer_email,
-            "Software Approved",
-            f"Your software {software.name} (version {software.version}) has been approved and can now be licensed."
-        )
-    except Exception as e:
-        logger.error(f"Failed to send approval email to {software.developer_email}: {e}")
-        logger.warning("Proceeding with software approval despite email failure")
-    
-    return {"message": "Software approved"}
+    return {"message": "Software approved", "chain_status": chain_status}
 
-@app.post("/admin/reject-software/{hash}")
-async def reject_software(hash: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/admin/reject-software/{hash}")
+async def reject_software(hash: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if current_user.role != "admin":
         logger.warning(f"Unauthorized software rejection attempt by {current_user.email}")
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    software = db.query(models.Software).filter(models.Software.hash == hash).first()
+    software = await db.scalar(select(models.Software).where(models.Software.hash == hash))
     if not software:
         logger.warning(f"Software rejection failed: Hash {hash} not found")
         raise HTTPException(status_code=404, detail="Software not found")
     
-    if software.is_approved:
+    if software.status == models.SoftwareStatus.approved:
         logger.warning(f"Software rejection failed: Hash {hash} already approved")
         raise HTTPException(status_code=400, detail="Software already approved")
     
-    if software.is_rejected:
+    if software.status == models.SoftwareStatus.rejected:
         logger.warning(f"Software rejection failed: Hash {hash} already rejected")
         raise HTTPException(status_code=400, detail="Software already rejected")
     
-    software.is_rejected = True
-    db.commit()
+    await record_changes(db, "database", [(software.hash_topic, software.status, models.SoftwareStatus.rejected)])
+    software.status = models.SoftwareStatus.rejected
+    chain_status = queue_status_change(db, [software], "reject")
+    publish(db, "software.removed", {"hashes": [hash], "status": "rejected"})
+    queue_email(
+        db,
+        software.developer_email,
+        "Software Rejected",
+        f"Your software {software.name} (version {software.version}) was rejected. Please contact support for more information."
+    )
+    await db.commit()
+    submitter.wake()
+    event_hub.wake()
+    dispatcher.wake()
     logger.info(f"Software {software.name} rejected by {current_user.email}")
     
+    return {"message": "Software rejected", "chain_status": chain_status}
+
+# One email per developer covering all of their builds moved to `target`
+def queue_decision_emails(db, changed, target):
+    by_developer = {}
+    for software in changed:
+        by_developer.setdefault(software.developer_email, []).append(software)
+    for developer_email, items in by_developer.items():
+        listing = "\n".join(f"- {s.name} (version {s.version})" for s in items)
+        if target == models.SoftwareStatus.approved:
+            subject = "Software Approved"
+            content = f"The following software has been approved and can now be licensed:\n{listing}"
+        else:
+            subject = "Software Rejected"
+            content = f"The following software was rejected. Please contact support for more information.\n{listing}"
+        queue_email(db, developer_email, subject, content)
+
+# Shared by the bulk software endpoints: validate every hash with one IN query,
+# move the pending ones to `target` in a single UPDATE, and queue each developer
+# one email covering all of their affected builds
+async def bulk_transition_software(hashes, target, db, current_user):
+    hashes = list(dict.fromkeys(hashes))
+    found = {s.hash: s for s in (await db.scalars(select(models.Software).where(models.Software.hash.in_(hashes)))).all()}
+    results, changed = [], []
+    chain_status = None
+    for file_hash in hashes:
+        software = found.get(file_hash)
+        if not software:
+            results.append({"hash": file_hash, "ok": False, "detail": "Software not found"})
+        elif software.status == models.SoftwareStatus.approved:
+            results.append({"hash": file_hash, "ok": False, "detail": "Software already approved"})
+        elif software.status == models.SoftwareStatus.rejected:
+            detail = "Software already rejected" if target == models.SoftwareStatus.rejected else "Software is rejected"
+            results.append({"hash": file_hash, "ok": False, "detail": detail})
+        else:
+            results.append({"hash": file_hash, "ok": True, "detail": f"Software {target.value}"})
+            changed.append(software)
+
+    if changed:
+        try:
+            updated_ids = set((await db.scalars(
+                update(models.Software)
+                .where(
+                    models.Software.id.in_([s.id for s in changed]),
+                    models.Software.status == models.SoftwareStatus.pending
+                )
+                .values(status=target)
+                .returning(models.Software.id)
+            )).all())
+            if target == models.SoftwareStatus.approved and updated_ids:
+                await bump_generation(db, catalogue_cache.name)
+            updated = [s for s in changed if s.id in updated_ids]
+            await record_changes(db, "database", [(s.hash_topic, models.SoftwareStatus.pending, target) for s in updated])
+            chain_status = queue_status_change(
+                db, updated, "approve" if target == models.SoftwareStatus.approved else "reject"
+            )
+            if updated:
+                publish(db, "software.removed", {"hashes": [s.hash for s in updated], "status": target.value})
+            queue_decision_emails(db, updated, target)
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Database error during bulk software {target.value}: {e}")
+            raise HTTPException(status_code=500, detail="Database error")
+        if target == models.SoftwareStatus.approved and updated_ids:
+            catalogue_cache.invalidate()
+        submitter.wake()
+        event_hub.wake()
+        dispatcher.wake()
+        # Another admin may have moved some of them out of pending meanwhile
+        lost = {s.hash for s in changed if s.id not in updated_ids}
+        if lost:
+            changed = [s for s in changed if s.id in updated_ids]
+            for result in results:
+                if result["hash"] in lost:
+                    result.update(ok=False, detail="Software is no longer pending")
+    logger.info(f"{len(changed)} of {len(hashes)} software {target.value} by {current_user.email}")
+
+    return {"results": results, "succeeded": len(changed), "failed": len(hashes) - len(changed), "chain_status": chain_status}
+
+@router.post("/admin/bulk-approve-software")
+async def bulk_approve_software(data: BulkSoftwareAction, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized bulk software approval attempt by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return await bulk_transition_software(data.hashes, models.SoftwareStatus.approved, db, current_user)
+
+@router.post("/admin/bulk-reject-software")
+async def bulk_reject_software(data: BulkSoftwareAction, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized bulk software rejection attempt by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return await bulk_transition_software(data.hashes, models.SoftwareStatus.rejected, db, current_user)
+
+# License queries, served from the indexed copy of the LicenseManager contract
+def license_row(chain_license: models.ChainLicense):
+    return {
+        "license_key": chain_license.license_key,
+        "holder_address": chain_license.holder_address,
+        "software_name": chain_license.software_name,
+        "software_hash": chain_license.software_hash,
+        "is_tampered": chain_license.is_tampered,
+        "is_cracked": chain_license.is_cracked,
+        "issued_block": chain_license.issued_block,
+    }
+
+@router.get("/licenses/mine")
+async def get_my_licenses(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_approved:
+        logger.warning(f"Unauthorized access to licenses by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Account not approved")
+    if not current_user.address:
+        raise HTTPException(status_code=400, detail="No wallet address set for this account")
+
+    licenses = (await db.scalars(
+        select(models.ChainLicense)
+        .where(models.ChainLicense.holder_address == current_user.address.lower())
+        .order_by(models.ChainLicense.issued_block)
+    )).all()
+    return {"licenses": [license_row(l) for l in licenses]}
+
+@router.get("/licenses/holders/{hash}")
+async def get_license_holders(hash: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        software = await db.scalar(select(models.Software).where(models.Software.hash == hash))
+        if not software or software.developer_email != current_user.email:
+            logger.warning(f"Unauthorized access to license holders of {hash} by {current_user.email}")
+            raise HTTPException(status_code=403, detail="Only the developer or an admin can view license holders")
+
+    licenses = (await db.scalars(
+        select(models.ChainLicense)
+        .where(models.ChainLicense.software_hash == hash)
+        .order_by(models.ChainLicense.issued_block)
+    )).all()
+    return {"hash": hash, "licenses": [license_row(l) for l in licenses]}
+
+@router.get("/admin/flagged-licenses")
+async def get_flagged_licenses(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to flagged-licenses by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    licenses = (await db.scalars(
+        select(models.ChainLicense)
+        .where((models.ChainLicense.is_tampered == True) | (models.ChainLicense.is_cracked == True))
+        .order_by(models.ChainLicense.updated_block.desc())
+        .limit(limit)
+    )).all()
+    return {"flagged_licenses": [license_row(l) for l in licenses]}
+
+# License authenticity, same answer as LicenseManager.isAuthentic without a
+# JSON-RPC round trip. Public, like the contract call.
+@router.get("/licenses/verify")
+async def verify_license(license_key: str = Query(..., min_length=1)):
+    return (await verify_licenses([license_key]))[0]
+
+@router.post("/licenses/verify")
+async def verify_license_batch(request: LicenseVerifyRequest):
+    return {"results": await verify_licenses(request.license_keys)}
+
+# Pending uploads that look like modified copies of another developer's approved build
+@router.get("/admin/similar-software")
+async def get_similar_software(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to similar-software by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    original = aliased(models.Software)
+    rows = (await db.execute(
+        select(models.Software, original, models.SoftwareSignature.similarity)
+        .join(models.SoftwareSignature, models.SoftwareSignature.software_id == models.Software.id)
+        .join(original, original.id == models.SoftwareSignature.similar_to_id)
+        .where(models.Software.status == models.SoftwareStatus.pending)
+        .order_by(models.SoftwareSignature.similarity.desc())
+        .limit(limit)
+    )).all()
+    return {"similar_software": [
+        {
+            "name": upload.name, "version": upload.version, "hash": upload.hash, "developer_email": upload.developer_email,
+            "similar_to": {"name": match.name, "version": match.version, "hash": match.hash,
+                           "developer_email": match.developer_email},
+            "similarity": score,
+        }
+        for upload, match, score in rows
+    ]}
+
+# Builds whose latest scan found crack signatures, newest first. Re-scans after
+# a signature change can flag builds that were already approved.
+@router.get("/admin/flagged-software")
+async def get_flagged_software(
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to flagged-software by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    flagged_ids = (
+        select(models.ScanHit.software_id).distinct()
+        .order_by(models.ScanHit.software_id.desc())
+        .limit(limit)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(
+        select(models.Software, models.CrackSignature.name, models.ScanHit.first_offset, models.ScanHit.matches)
+        .join(models.ScanHit, models.ScanHit.software_id == models.Software.id)
+        .join(models.CrackSignature, models.CrackSignature.id == models.ScanHit.signature_id)
+        .where(models.Software.id.in_(flagged_ids))
+        .order_by(models.Software.id.desc(), models.CrackSignature.name)
+    )).all()
+    flagged = {}
+    for software, name, first_offset, matches in rows:
+        entry = flagged.setdefault(software.id, {
+            "name": software.name, "version": software.version, "hash": software.hash,
+            "developer_email": software.developer_email, "status": software.status.value, "signatures": [],
+        })
+        entry["signatures"].append({"name": name, "first_offset": first_offset, "matches": matches})
+    return {"flagged_software": list(flagged.values())}
+
+@router.get("/admin/crack-signatures")
+async def get_crack_signatures(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized access to crack-signatures by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    await signature_set.refresh(db)
+    unscanned = await db.scalar(
+        select(func.count()).select_from(models.Software)
+        .where((models.Software.scan_generation == None) | (models.Software.scan_generation != signature_set.generation))
+    )
+    signatures = (await db.scalars(select(models.CrackSignature).order_by(models.CrackSignature.name))).all()
+    return {
+        "generation": signature_set.generation,
+        "unscanned_software": unscanned,
+        "signatures": [
+            {"name": s.name, "length": len(s.pattern), "description": s.description, "enabled": s.enabled}
+            for s in signatures
+        ],
+    }
+
+# Builds already in the catalogue are checked against new signatures by
+# `python scanner.py --rescan`
+@router.post("/admin/crack-signatures")
+async def add_crack_signature(data: CrackSignatureCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized crack signature change by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
     try:
-        await send_email(
-            software.developer_email,
-            "Software Rejected",
-            f"Your software {software.name} (version {software.version}) was rejected. Please contact support for more information."
-        )
-    except Exception as e:
-        logger.error(f"Failed to send rejection email to {software.developer_email}: {e}")
-        logger.warning("Proceeding with software rejection despite email failure")
-    
-    return {"message": "Software rejected"}
\ No newline at end of file
+        pattern = bytes.fromhex(data.pattern)
+        await save_signature(db, data.name, pattern, data.description)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    logger.info(f"Crack signature {data.name} ({len(pattern)} bytes) saved by {current_user.email}")
+    return {"message": f"Crack signature {data.name} saved"}
+
+@router.delete("/admin/crack-signatures/{name}")
+async def delete_crack_signature(name: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        logger.warning(f"Unauthorized crack signature change by {current_user.email}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    if not await disable_signature(db, name):
+        raise HTTPException(status_code=404, detail="Crack signature not found")
+    await db.commit()
+    logger.info(f"Crack signature {name} disabled by {current_user.email}")
+    return {"message": f"Crack signature {name} disabled"}
+
+# Prometheus scrape endpoint. Counts are per worker process; scrape each
+# worker (or run one) to see the whole picture.
+def collect_runtime_metrics():
+    user_stats = user_cache.stats()
+    token_stats = token_cache.stats()
+    license_stats = license_cache.stats()
+    catalogue_stats = catalogue_cache.stats()
+    return {
+        "user_cache_hits": ("Principal cache hits", user_stats["hits"]),
+        "user_cache_misses": ("Principal cache misses", user_stats["misses"]),
+        "user_cache_size": ("Principals cached", user_stats["size"]),
+        "token_cache_hits": ("Verified access token cache hits", token_stats["hits"]),
+        "token_cache_misses": ("Verified access token cache misses", token_stats["misses"]),
+        "token_denylist_size": ("Revoked tokens and users held in the denylist", len(denylist)),
+        "license_cache_hits": ("License verdict cache hits", license_stats["hits"]),
+        "license_cache_misses": ("License verdict cache misses", license_stats["misses"]),
+        "license_cache_size": ("License verdicts cached", license_stats["size"]),
+        "catalogue_cache_hits": ("Approved-software catalogue page cache hits", catalogue_stats["hits"]),
+        "catalogue_cache_misses": ("Approved-software catalogue page cache misses", catalogue_stats["misses"]),
+        "catalogue_cache_bytes": ("Bytes of cached catalogue pages", catalogue_stats["bytes"]),
+        "bcrypt_pending": ("Password hash/verify jobs queued or running", passwords.pending()),
+        "admin_event_subscribers": ("Open admin event streams", len(event_hub)),
+        "admin_events_dropped": ("Admin event streams dropped for falling behind", event_hub.dropped),
+    }
+
+registry.register_collector(collect_runtime_metrics)
+
+# Scrapers send `Authorization: Bearer <METRICS_TOKEN>`; an admin's access
+# token works too, and is the only way in while METRICS_TOKEN is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+async def require_metrics_access(token: str = Depends(oauth2_scheme)):
+    if METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return
+    claims = await get_token_claims(token)
+    if claims["role"] != "admin":
+        logger.warning(f"Unauthorized metrics scrape by {claims['sub']}")
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Module-level app for `uvicorn main:app`; routes are registered above
+app = create_app()
@@ -0,0 +1,206 @@
+from bisect import bisect_left
+import time
+
+# Latency buckets in seconds, from cache hits up to slow SMTP servers
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# Minimal Prometheus-style metrics. Values are plain dicts keyed by label
+# tuples and are only touched from the event loop thread, so updates are a
+# dict lookup and an add; all formatting happens when /metrics is scraped.
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels=(), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels=(), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels=(), value: float = 0):
+        self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, labels, value: float):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, labels, f'le="{bound}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # `collect` returns {metric name: (help, value)} gauges read at scrape time,
+    # for state other modules already count (cache stats, queue depth, ...)
+    def register_collector(self, collect):
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {value}" for name, labels, value in metric.samples())
+        for collect in self._collectors:
+            for name, (help, value) in collect().items():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"))
+dependency_duration = registry.register(Histogram(
+    "dependency_duration_seconds", "Latency of calls to bcrypt, SMTP, the database and auth", ("dependency", "operation")))
+dependency_errors = registry.register(Counter(
+    "dependency_errors_total", "Failed calls to bcrypt, SMTP, the database and auth", ("dependency", "operation")))
+dependency_in_flight = registry.register(Gauge(
+    "dependency_in_flight", "Calls currently in progress per dependency", ("dependency",)))
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests answered 429 by the rate limiter", ("route",)))
+
+
+# Times a block as one call to `dependency`:
+#   with track("bcrypt", "verify"):
+#       ...
+class track:
+    __slots__ = ("labels", "start")
+
+    def __init__(self, dependency: str, operation: str):
+        self.labels = (dependency, operation)
+
+    def __enter__(self):
+        dependency_in_flight.inc(self.labels[:1])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dependency_duration.observe(self.labels, time.perf_counter() - self.start)
+        dependency_in_flight.dec(self.labels[:1])
+        if exc_type is not None:
+            dependency_errors.inc(self.labels)
+        return False
+
+
+# Statement latency for every query on every engine (engines are created
+# lazily, so listen on the Engine class), labelled by statement type
+_engines_instrumented = False
+
+
+def instrument_engines():
+    global _engines_instrumented
+    if _engines_instrumented:
+        return
+    _engines_instrumented = True
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        dependency_duration.observe(("database", statement.split(None, 1)[0].upper()), time.perf_counter() - start)
+
+    @event.listens_for(Engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+        operation = context.statement.split(None, 1)[0].upper() if context.statement else "CONNECT"
+        dependency_errors.inc(("database", operation))
+
+
+# Pure ASGI middleware (BaseHTTPMiddleware adds a task and a queue per
+# request). Requests are labelled with the route template, e.g.
+# /admin/approve-user/{email}, so label values stay bounded.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            http_duration.observe((scope["method"], path), elapsed)
+            http_requests.inc((scope["method"], path, str(status)))
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Enum, Float, Index, LargeBinary, func
 from database import Base
+import enum
 
 class User(Base):
     __tablename__ = "users"
@@ -13,12 +14,215 @@ class User(Base):
     address = Column(String, nullable=True)  # Add address field for blockchain wallet
 
 
+class SoftwareStatus(str, enum.Enum):
+    pending = "pending"
+    approved = "approved"
+    rejected = "rejected"
+
+
 class Software(Base):
     __tablename__ = "software"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     version = Column(String)
     hash = Column(String, unique=True, index=True)
-    developer_email = Column(String, index=True)
-    is_approved = Column(Boolean, default=False)
-    is_rejected = Column(Boolean, default=False)
\ No newline at end of file
+    hash_topic = Column(String, nullable=True, index=True)  # keccak256 of hash, as chain_software keys it
+    developer_email = Column(String)
+    # pending -> approved or pending -> rejected
+    status = Column(Enum(SoftwareStatus, native_enum=False), default=SoftwareStatus.pending, server_default="pending", nullable=False)
+    # Progress of the matching LicenseManager update sent by chain_submitter.py:
+    # None (not sent by the backend), 'queued', 'submitted', 'confirmed' or 'failed'
+    chain_status = Column(String, nullable=True)
+    chain_tx_hash = Column(String, nullable=True)
+    # crack_signatures generation the binary was last scanned against by scanner.py; None if never
+    scan_generation = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_software_developer_email_status", "developer_email", "status"),
+        Index("ix_software_status_id", "status", "id"),
+    )
+
+
+# MinHash signature of an uploaded binary, used by similarity.py to spot
+# near-duplicates of builds already in the catalogue
+class SoftwareSignature(Base):
+    __tablename__ = "software_signatures"
+    software_id = Column(Integer, primary_key=True)  # software.id
+    signature = Column(LargeBinary, nullable=False)
+    blocks = Column(Integer, nullable=False)
+    similar_to_id = Column(Integer, nullable=True, index=True)  # closest approved build by another developer
+    similarity = Column(Float, nullable=True)
+
+
+# Byte pattern of a known crack loader, keygen stub or patched license check,
+# searched for in every uploaded binary by scanner.py
+class CrackSignature(Base):
+    __tablename__ = "crack_signatures"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    pattern = Column(LargeBinary, nullable=False)
+    description = Column(String, nullable=True)
+    enabled = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+
+# Crack signatures found in a binary by its latest scan
+class ScanHit(Base):
+    __tablename__ = "scan_hits"
+    software_id = Column(Integer, primary_key=True)  # software.id
+    signature_id = Column(Integer, primary_key=True, index=True)  # crack_signatures.id
+    first_offset = Column(BigInteger, nullable=False)
+    matches = Column(Integer, nullable=False)
+
+
+class OutboxEmail(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    content = Column(String, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # 'pending', 'sending', 'sent' or 'failed'
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=func.now(), nullable=False)  # also the claim lease while sending
+    claimed_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),)
+
+
+class OtpCode(Base):
+    __tablename__ = "otp_codes"
+    email = Column(String, primary_key=True)
+    code = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Changes to the admin approval queues, streamed to dashboards by
+# admin_events.py and kept for a while so a reconnecting client can resume.
+# AUTOINCREMENT keeps ids increasing even after every row has been purged.
+class AdminEvent(Base):
+    __tablename__ = "admin_events"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(String, nullable=False)  # JSON
+    created_at = Column(Float, nullable=False, index=True)  # epoch seconds
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+# Generation counters for cached responses (response_cache.py), bumped in the
+# same transaction as the change that invalidates them
+class CacheGeneration(Base):
+    __tablename__ = "cache_generations"
+    name = Column(String, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+
+# Revoked JWTs, shared so every worker's in-memory denylist (tokens.py) sees
+# them. Times are epoch seconds to compare directly with the iat/exp claims.
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # 'token' (subject is a jti) or 'user' (subject is an email)
+    subject = Column(String, nullable=False)
+    revoked_at = Column(Float, nullable=False)  # 'user': tokens issued at or before this are revoked
+    expires_at = Column(Float, nullable=False, index=True)  # no token it covers is valid after this
+
+    __table_args__ = (Index("ix_token_revocations_kind_subject", "kind", "subject", unique=True),)
+
+
+# Approval-state changes waiting to be written to the LicenseManager contract
+# by chain_submitter.py. Operations sent in one batch transaction share its
+# nonce and tx_hash.
+class ChainOperation(Base):
+    __tablename__ = "chain_operations"
+    id = Column(Integer, primary_key=True, index=True)
+    software_id = Column(Integer, nullable=False, index=True)
+    software_hash = Column(String, nullable=False)
+    action = Column(String, nullable=False)  # 'approve' or 'reject'
+    status = Column(String, default="queued", nullable=False)  # 'queued', 'submitted', 'confirmed' or 'failed'
+    nonce = Column(Integer, nullable=True)  # of the first transaction sent for it
+    adds_software = Column(Boolean, default=False, nullable=False)  # an addSoftware went out first, at `nonce`
+    tx_hash = Column(String, nullable=True, index=True)
+    gas_price = Column(String, nullable=True)  # wei, as text: may not fit a 64-bit integer
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    submitted_at = Column(DateTime, nullable=True)
+    confirmed_block = Column(Integer, nullable=True)
+
+    __table_args__ = (Index("ix_chain_operations_status_id", "status", "id"),)
+
+
+# Next nonce of each signing account and which worker may currently use it
+class ChainSender(Base):
+    __tablename__ = "chain_senders"
+    address = Column(String, primary_key=True)
+    next_nonce = Column(Integer, nullable=False, default=0)
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+
+# Digest of one bucket of the software catalogue as one side sees it, kept
+# current by digests.record_changes and compared by reconcile.py
+class DigestBucket(Base):
+    __tablename__ = "digest_buckets"
+    side = Column(String, primary_key=True)  # 'database' (software) or 'chain' (chain_software)
+    bucket = Column(Integer, primary_key=True)
+    digest = Column(BigInteger, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+
+# Read model of the LicenseManager contract, built by chain_indexer.py from its event logs
+
+class ChainEvent(Base):
+    __tablename__ = "chain_events"
+    id = Column(Integer, primary_key=True, index=True)
+    block_number = Column(Integer, nullable=False)
+    block_hash = Column(String, nullable=False)
+    transaction_hash = Column(String, nullable=False)
+    log_index = Column(Integer, nullable=False)
+    event = Column(String, nullable=False)
+    args = Column(String, nullable=False)  # JSON-encoded event arguments
+    # JSON: the read-model row the event changed and its state before, for
+    # undoing it on a reorg. NULL for events indexed before this was kept.
+    undo = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_chain_events_block_log", "block_number", "log_index"),
+        Index("ix_chain_events_block_hash_log", "block_hash", "log_index", unique=True),
+    )
+
+
+class ChainSoftware(Base):
+    __tablename__ = "chain_software"
+    # Indexed string event arguments are only logged as their keccak256 topic
+    hash_topic = Column(String, primary_key=True)
+    hash = Column(String, nullable=True, index=True)  # plaintext, once resolved
+    developer_address = Column(String, index=True)
+    status = Column(Enum(SoftwareStatus, native_enum=False), default=SoftwareStatus.pending, nullable=False)
+    added_block = Column(Integer, nullable=False)
+    updated_block = Column(Integer, nullable=False)
+
+
+class ChainLicense(Base):
+    __tablename__ = "chain_licenses"
+    license_key = Column(String, primary_key=True)
+    key_topic = Column(String, unique=True, index=True, nullable=False)
+    holder_address = Column(String, index=True, nullable=False)
+    software_name = Column(String)
+    software_hash = Column(String, index=True)
+    is_tampered = Column(Boolean, default=False, nullable=False)
+    is_cracked = Column(Boolean, default=False, nullable=False)
+    issued_block = Column(Integer, nullable=False)
+    updated_block = Column(Integer, nullable=False)
+
+
+class IndexerCheckpoint(Base):
+    __tablename__ = "indexer_checkpoints"
+    contract_address = Column(String, primary_key=True)
+    block_number = Column(Integer, nullable=False)
+    block_hash = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -0,0 +1,119 @@
+from sqlalchemy import delete
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+import models
+import heapq
+import hmac
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# OTP settings
+OTP_BACKEND = os.getenv("OTP_BACKEND", "database")  # 'database' (shared by all workers) or 'memory'
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+OTP_MEMORY_MAX_ENTRIES = int(os.getenv("OTP_MEMORY_MAX_ENTRIES", "100000"))
+
+
+# Interface every OTP backend implements. consume() must be atomic: a code
+# can be redeemed at most once, and never after it expires.
+class OtpStore:
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL_SECONDS):
+        raise NotImplementedError
+
+    async def consume(self, email: str, otp: str) -> bool:
+        raise NotImplementedError
+
+
+# Single-process store. Expiry is tracked in a min-heap so purging only looks
+# at entries that are actually due; superseded heap entries are skipped lazily.
+class MemoryOtpStore(OtpStore):
+    def __init__(self, max_entries: int = OTP_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._codes = {}
+        self._expiry = []
+
+    def _purge(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, email = heapq.heappop(self._expiry)
+            entry = self._codes.get(email)
+            if entry is not None and entry[1] == expires_at:
+                del self._codes[email]
+
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL_SECONDS):
+        now = time.monotonic()
+        self._purge(now)
+        if email not in self._codes and len(self._codes) >= self.max_entries:
+            # Full of live codes: drop the one closest to expiring
+            expires_at, oldest = heapq.heappop(self._expiry)
+            if self._codes.get(oldest, (None, None))[1] == expires_at:
+                del self._codes[oldest]
+        expires_at = now + ttl
+        self._codes[email] = (otp, expires_at)
+        heapq.heappush(self._expiry, (expires_at, email))
+
+    async def consume(self, email: str, otp: str) -> bool:
+        self._purge(time.monotonic())
+        entry = self._codes.get(email)
+        if entry is None or not hmac.compare_digest(entry[0], otp):
+            return False
+        del self._codes[email]
+        return True
+
+
+# Shared store backed by the otp_codes table, so any worker can verify a code
+# issued by another
+class DatabaseOtpStore(OtpStore):
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL_SECONDS):
+        now = self._now()
+        table = models.OtpCode
+        values = {"email": email, "code": otp, "expires_at": now + timedelta(seconds=ttl)}
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(table).where(table.expires_at <= now))
+            # A single upsert, so two codes requested at once for the same
+            # address don't both try to insert the row; the later one wins
+            dialect = db.get_bind().dialect.name
+            if dialect == "mysql":
+                statement = mysql.insert(table).values(**values)
+                statement = statement.on_duplicate_key_update(code=statement.inserted.code,
+                                                              expires_at=statement.inserted.expires_at)
+            else:
+                statement = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(**values)
+                statement = statement.on_conflict_do_update(index_elements=[table.email], set_={
+                    "code": statement.excluded.code, "expires_at": statement.excluded.expires_at,
+                })
+            await db.execute(statement)
+            await db.commit()
+
+    async def consume(self, email: str, otp: str) -> bool:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(models.OtpCode).where(
+                    models.OtpCode.email == email,
+                    models.OtpCode.code == otp,
+                    models.OtpCode.expires_at > self._now(),
+                )
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+
+def create_otp_store(backend: str = OTP_BACKEND) -> OtpStore:
+    if backend == "memory":
+        return MemoryOtpStore()
+    if backend == "database":
+        return DatabaseOtpStore()
+    logger.error(f"Unknown OTP_BACKEND {backend}")
+    raise ValueError(f"OTP_BACKEND must be 'database' or 'memory', got {backend!r}")
+
+
+otp_store = create_otp_store()
@@ -0,0 +1,48 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Listing page sizes
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+
+# Columns clients may ask for with ?fields=
+SOFTWARE_FIELDS = ("id", "name", "version", "hash", "developer_email", "chain_status")
+# The cached catalogue only changes on approval, so it can't offer chain_status
+CATALOGUE_FIELDS = ("id", "name", "version", "hash", "developer_email")
+USER_FIELDS = ("id", "email", "role", "address")
+
+
+def parse_fields(fields: str | None, allowed, default):
+    if not fields:
+        return list(default)
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return requested
+
+
+# Page query over plain columns (no ORM objects), ordered by id. Fetches one
+# extra row so the caller learns whether another page exists without a COUNT.
+def keyset_query(model, filters, fields, limit: int, cursor: int | None):
+    columns = [f for f in fields if f != "id"]
+    query = select(model.id, *(getattr(model, f) for f in columns)).where(*filters)
+    if cursor is not None:
+        query = query.where(model.id > cursor)
+    return query.order_by(model.id).limit(limit + 1)
+
+
+# One page of `model` rows after `cursor` (an id) plus the cursor for the next page
+async def keyset_page(db, model, filters, fields, limit: int, cursor: int | None):
+    rows = (await db.execute(keyset_query(model, filters, fields, limit, cursor))).all()
+
+    columns = [f for f in fields if f != "id"]
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    names = ["id"] + columns if "id" in fields else columns
+    offset = 0 if "id" in fields else 1
+    items = [dict(zip(names, row[offset:])) for row in rows[:limit]]
+    return items, next_cursor
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from metrics import track
+import asyncio
+import bcrypt
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Password hashing settings
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify jobs allowed to wait for a worker before requests are turned away
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+
+_executor = None
+_pending = 0
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        logger.info(f"Started password hashing pool with {HASH_WORKERS} workers")
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# Worker-side functions; module level so they can be pickled into the pool
+def _hash(password: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode()
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        logger.warning(f"Password hashing queue full ({_pending} pending), rejecting request")
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    with track("bcrypt", "hash"):
+        return await _submit(_hash, password.encode(), BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    with track("bcrypt", "verify"):
+        return await _submit(_check, password.encode(), hashed_password.encode())
+
+
+def pending() -> int:
+    return _pending
+
+
+# bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+def needs_rehash(hashed_password: str) -> bool:
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
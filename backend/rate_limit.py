@@ -0,0 +1,232 @@
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from metrics import rate_limit_rejections
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Rate limit settings. Each client IP and each email address gets a token
+# bucket: BURST requests at once, refilled at PER_MINUTE.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")  # 'sqlite' (shared by all workers on the host) or 'memory'
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "rate_limits.db")
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "20"))
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "2"))
+# Use the X-Forwarded-For entry added by our reverse proxy as the client IP
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+RATE_LIMIT_BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", "200"))
+RATE_LIMIT_PURGE_SECONDS = 60
+
+
+class Bucket:
+    def __init__(self, name: str, burst: int, per_minute: float):
+        self.name = name
+        self.capacity = float(burst)
+        self.rate = per_minute / 60  # tokens per second
+
+    # Seconds until a full refill, after which an idle bucket can be forgotten
+    @property
+    def idle_seconds(self):
+        return self.capacity / self.rate if self.rate > 0 else math.inf
+
+
+IP_BUCKET = Bucket("ip", RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE)
+EMAIL_BUCKET = Bucket("email", RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_EMAIL_PER_MINUTE)
+
+
+# Interface every limiter backend implements. take() spends one token from
+# each (bucket, key) pair, all or nothing, and returns 0 when allowed or the
+# seconds until the first empty bucket has a token again. Backends whose take()
+# can block (on I/O or another process's lock) set `blocking` and are called
+# from the threadpool so they never stall the event loop.
+class RateLimiter:
+    blocking = False
+
+    def __init__(self):
+        self._longest_idle = 0.0
+
+    def take(self, checks) -> float:
+        raise NotImplementedError
+
+    # Idle buckets are forgotten once they would have refilled completely,
+    # which takes longest for the slowest bucket seen so far
+    def _forget_after(self, checks):
+        self._longest_idle = max(self._longest_idle, *(bucket.idle_seconds for bucket, _ in checks))
+        return self._longest_idle
+
+    def close(self):
+        pass
+
+
+# Single-process limiter
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self._buckets = {}  # (bucket name, key) -> (tokens, updated_at)
+        self._purged_at = time.time()
+
+    def take(self, checks) -> float:
+        now = time.time()
+        forget_after = self._forget_after(checks)
+        if now - self._purged_at > RATE_LIMIT_PURGE_SECONDS:
+            self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < forget_after}
+            self._purged_at = now
+        levels = []
+        for bucket, key in checks:
+            tokens, updated_at = self._buckets.get((bucket.name, key), (bucket.capacity, now))
+            levels.append(min(bucket.capacity, tokens + (now - updated_at) * bucket.rate))
+        for (bucket, key), tokens in zip(checks, levels):
+            if tokens < 1:
+                return (1 - tokens) / bucket.rate if bucket.rate > 0 else math.inf
+        for (bucket, key), tokens in zip(checks, levels):
+            self._buckets[(bucket.name, key)] = (tokens - 1, now)
+        return 0.0
+
+
+# Buckets in a small SQLite file every worker on the host opens. Each take()
+# is one write transaction: a conditional upsert per bucket refills and spends
+# in a single statement, so concurrent workers can never overspend a bucket.
+# The file is WAL with synchronous=OFF; losing it only resets the limits.
+# take() waits up to RATE_LIMIT_BUSY_TIMEOUT_MS for other workers' writes, so
+# it runs in the threadpool; the lock keeps this worker's threads from
+# interleaving transactions on the one connection.
+class SqliteRateLimiter(RateLimiter):
+    blocking = True
+
+    SPEND = """
+        INSERT INTO buckets (name, key, tokens, updated_at) VALUES (:name, :key, :capacity - 1, :now)
+        ON CONFLICT (name, key) DO UPDATE SET
+            tokens = min(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+            updated_at = :now
+        WHERE min(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+        RETURNING tokens
+    """
+    LEVEL = "SELECT min(:capacity, tokens + (:now - updated_at) * :rate) FROM buckets WHERE name = :name AND key = :key"
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        super().__init__()
+        self.path = path
+        self._connection = None
+        self._purged_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                         timeout=RATE_LIMIT_BUSY_TIMEOUT_MS / 1000)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL,
+                    PRIMARY KEY (name, key)
+                ) WITHOUT ROWID
+            """)
+            self._connection = connection
+        return self._connection
+
+    def take(self, checks) -> float:
+        with self._lock:
+            return self._take(checks)
+
+    def _take(self, checks) -> float:
+        connection = self._connect()
+        now = time.time()
+        forget_after = self._forget_after(checks)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for bucket, key in checks:
+                params = {"name": bucket.name, "key": key, "capacity": bucket.capacity, "rate": bucket.rate, "now": now}
+                if connection.execute(self.SPEND, params).fetchone() is None:
+                    connection.execute("ROLLBACK")
+                    tokens = connection.execute(self.LEVEL, params).fetchone()[0]
+                    return (1 - tokens) / bucket.rate if bucket.rate > 0 else math.inf
+            if now - self._purged_at > RATE_LIMIT_PURGE_SECONDS:
+                connection.execute("DELETE FROM buckets WHERE updated_at < ?", (now - forget_after,))
+                self._purged_at = now
+            connection.execute("COMMIT")
+            return 0.0
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def create_rate_limiter(backend: str = RATE_LIMIT_BACKEND) -> RateLimiter:
+    if backend == "memory":
+        return MemoryRateLimiter()
+    if backend == "sqlite":
+        return SqliteRateLimiter()
+    logger.error(f"Unknown RATE_LIMIT_BACKEND {backend}")
+    raise ValueError(f"RATE_LIMIT_BACKEND must be 'sqlite' or 'memory', got {backend!r}")
+
+
+rate_limiter = create_rate_limiter()
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+# The email a request acts on: ?email= (resend-otp) or the JSON body's "email"
+# (login, register). FastAPI has already read the body, so this is cached.
+async def request_email(request: Request):
+    email = request.query_params.get("email")
+    if email is None and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("email"), str):
+            email = body["email"]
+    return email.strip().lower() if email else None
+
+
+# Dependency for endpoints that hash passwords or send mail: spends a token
+# from the caller's IP bucket and the target email's bucket, and answers 429
+# before the endpoint runs when either is empty. Limiter failures let the
+# request through rather than lock everyone out.
+async def rate_limit(request: Request):
+    if not RATE_LIMIT_ENABLED:
+        return
+    checks = [(IP_BUCKET, client_ip(request))]
+    email = await request_email(request)
+    if email:
+        checks.append((EMAIL_BUCKET, email))
+    try:
+        if rate_limiter.blocking:
+            retry_after = await run_in_threadpool(rate_limiter.take, checks)
+        else:
+            retry_after = rate_limiter.take(checks)
+    except Exception as e:
+        logger.error(f"Rate limiter failed, allowing request: {e}")
+        return
+    if retry_after > 0:
+        route = request.scope.get("route")
+        rate_limit_rejections.inc((route.path if route is not None else request.url.path,))
+        logger.warning(f"Rate limited {request.url.path} for {checks[0][1]}" + (f" / {email}" if email else ""))
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after)) if math.isfinite(retry_after) else "3600"},
+        )
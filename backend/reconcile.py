@@ -0,0 +1,244 @@
+from sqlalchemy import select, update, func
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from chain_indexer import Web3LogSource, CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS, topic_of
+from chain_submitter import queue_status_change, submitter
+from response_cache import catalogue_cache, bump_generation
+from admin_events import publish
+import digests
+import models
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Reconciliation settings
+RECONCILE_REPAIR = os.getenv("RECONCILE_REPAIR", "false").lower() == "true"
+# Mismatched buckets examined per run; the rest wait for the next run
+RECONCILE_MAX_BUCKETS = int(os.getenv("RECONCILE_MAX_BUCKETS", "256"))
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "300"))
+TOPIC_BACKFILL_BATCH = 1000
+DIFF_BUCKETS_PER_QUERY = 200  # keeps the OR of topic ranges under SQLite's expression depth limit
+
+DECIDED = (models.SoftwareStatus.approved, models.SoftwareStatus.rejected)
+
+
+# Compares the software table with the contract's softwareRecords without
+# reading either in full: the per-bucket digests of both sides (digests.py)
+# are compared, only mismatched buckets are read, and only the entries that
+# differ are checked against the contract itself, which tells real drift
+# apart from the indexer not having caught up yet. A run costs one join over
+# the digest table plus work proportional to the differences.
+class Reconciler:
+    def __init__(self, source=None):
+        self.source = source  # has software_status(hash); None trusts chain_software as is
+
+    async def run(self, repair: bool = RECONCILE_REPAIR) -> dict:
+        start = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            rebuilt = [side for side in digests.SIDES if await self._ensure_built(db, side)]
+            mismatched = await digests.mismatched(db)
+            examined = mismatched[:RECONCILE_MAX_BUCKETS]
+            drift = []
+            for i in range(0, len(examined), DIFF_BUCKETS_PER_QUERY):
+                drift.extend(await self._diff_buckets(db, examined[i:i + DIFF_BUCKETS_PER_QUERY]))
+            drift, indexer_behind = await self._verify(drift)
+            await self._classify(db, drift)
+            approved = await self._repair(db, drift) if repair else 0
+            await db.commit()
+        if approved:
+            catalogue_cache.invalidate()
+        if repair:
+            submitter.wake()
+        report = {
+            "buckets": digests.BUCKETS,
+            "mismatched_buckets": len(mismatched),
+            "examined_buckets": len(examined),
+            "rebuilt": rebuilt,
+            "indexer_behind": indexer_behind,
+            "drift": drift,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        level = logging.WARNING if drift else logging.INFO
+        logger.log(level, f"Reconciliation: {len(drift)} differences in {len(mismatched)} of {digests.BUCKETS} buckets "
+                          f"({indexer_behind} not indexed yet) in {report['seconds']}s")
+        return report
+
+    # Build a side's digests from its table the first time, or after --rebuild
+    async def _ensure_built(self, db, side: str, force: bool = False) -> bool:
+        count = await db.scalar(
+            select(func.count()).select_from(models.DigestBucket).where(models.DigestBucket.side == side)
+        )
+        if count == digests.BUCKETS and not force:
+            return False
+        if side == "database":
+            await self._backfill_topics(db)
+            entries = (await db.execute(select(models.Software.hash_topic, models.Software.status))).all()
+        else:
+            entries = (await db.execute(select(models.ChainSoftware.hash_topic, models.ChainSoftware.status))).all()
+        await digests.rebuild(db, side, entries)
+        await db.commit()
+        logger.info(f"Built {side} digests over {len(entries)} entries")
+        return True
+
+    # Rows written before software.hash_topic existed
+    async def _backfill_topics(self, db):
+        while True:
+            rows = (await db.execute(
+                select(models.Software.id, models.Software.hash)
+                .where(models.Software.hash_topic.is_(None))
+                .limit(TOPIC_BACKFILL_BATCH)
+            )).all()
+            if not rows:
+                return
+            for software_id, software_hash in rows:
+                await db.execute(
+                    update(models.Software).where(models.Software.id == software_id).values(hash_topic=topic_of(software_hash))
+                )
+            await db.flush()
+
+    # Entries whose status differs between the two sides of the given buckets,
+    # counting only decided statuses like the digests do: a pending upload the
+    # chain hasn't seen yet is waiting on its developer, not drift.
+    # The buckets' digests are rewritten from the rows just read, which also
+    # repairs a digest that missed a change made while it was being built.
+    async def _diff_buckets(self, db, buckets):
+        ours = {
+            topic: (software_id, software_hash, status)
+            for software_id, topic, software_hash, status in (await db.execute(
+                select(models.Software.id, models.Software.hash_topic, models.Software.hash, models.Software.status)
+                .where(digests.in_buckets(models.Software.hash_topic, buckets))
+            )).all()
+        }
+        theirs = {
+            topic: (software_hash, status)
+            for topic, software_hash, status in (await db.execute(
+                select(models.ChainSoftware.hash_topic, models.ChainSoftware.hash, models.ChainSoftware.status)
+                .where(digests.in_buckets(models.ChainSoftware.hash_topic, buckets))
+            )).all()
+        }
+        for side, entries in (("database", [(topic, status) for topic, (_, _, status) in ours.items()]),
+                              ("chain", [(topic, status) for topic, (_, status) in theirs.items()])):
+            by_bucket = {bucket: [] for bucket in buckets}
+            for topic, status in entries:
+                by_bucket[digests.bucket_of(topic)].append((topic, status))
+            await digests.store(db, side, by_bucket)
+
+        drift = []
+        for topic in sorted(ours.keys() | theirs.keys()):
+            software_id, software_hash, database_status = ours.get(topic, (None, None, None))
+            chain_hash, chain_status = theirs.get(topic, (None, None))
+            if database_status != chain_status and (database_status in DECIDED or chain_status in DECIDED):
+                drift.append({
+                    "software_id": software_id,
+                    "hash": software_hash or chain_hash,
+                    "topic": topic,
+                    "database": database_status,
+                    "chain": chain_status,
+                })
+        return drift
+
+    # Read each difference from the contract; those where it agrees with the
+    # database are only waiting for the indexer
+    async def _verify(self, drift):
+        if self.source is None:
+            return drift, 0
+        confirmed = []
+        for item in drift:
+            if item["hash"] is None:
+                confirmed.append(item)
+                continue
+            item["chain"] = await run_in_threadpool(self.source.software_status, item["hash"])
+            if item["chain"] != item["database"]:
+                confirmed.append(item)
+        return confirmed, len(drift) - len(confirmed)
+
+    async def _classify(self, db, drift):
+        ids = [item["software_id"] for item in drift if item["software_id"] is not None]
+        in_flight = set((await db.scalars(
+            select(models.ChainOperation.software_id)
+            .where(models.ChainOperation.software_id.in_(ids), models.ChainOperation.status.in_(("queued", "submitted")))
+        )).all()) if ids else set()
+        for item in drift:
+            database_status, chain_status = item["database"], item["chain"]
+            if database_status is None:
+                item["kind"] = "unknown_to_database"
+            elif item["software_id"] in in_flight:
+                item["kind"] = "chain_update_in_flight"
+            elif database_status in DECIDED and chain_status not in DECIDED:
+                item["kind"] = "chain_behind"
+            elif database_status == models.SoftwareStatus.pending and chain_status in DECIDED:
+                item["kind"] = "database_behind"
+            else:
+                item["kind"] = "conflict"
+            item["database"] = database_status.value if database_status is not None else None
+            item["chain"] = chain_status.value if chain_status is not None else None
+            item["action"] = "reported"
+
+    # Send decisions the chain is missing through chain_submitter, and take
+    # decisions made on chain into the database. Conflicts and unknown builds
+    # need a person. Returns the number of approvals taken.
+    async def _repair(self, db, drift) -> int:
+        approved = 0
+        for item in drift:
+            if item["kind"] not in ("chain_behind", "database_behind"):
+                continue
+            software = await db.get(models.Software, item["software_id"])
+            if item["kind"] == "chain_behind":
+                action = "approve" if software.status == models.SoftwareStatus.approved else "reject"
+                if queue_status_change(db, [software], action) is not None:
+                    item["action"] = "chain_update_queued"
+                continue
+            status = models.SoftwareStatus(item["chain"])
+            await digests.record_changes(db, "database", [(software.hash_topic, software.status, status)])
+            software.status = status
+            publish(db, "software.removed", {"hashes": [software.hash], "status": status.value})
+            if status == models.SoftwareStatus.approved:
+                await bump_generation(db, catalogue_cache.name)
+                approved += 1
+            item["action"] = "database_updated"
+            logger.warning(f"Software {software.hash} was {status.value} on chain; updated the database to match")
+        return approved
+
+
+# Reconciler checking differences against the configured node, or trusting
+# the indexed chain_software table when no node is configured
+def create_reconciler():
+    if not (CHAIN_RPC_URL and LICENSE_CONTRACT_ADDRESS):
+        logger.info("CHAIN_RPC_URL or LICENSE_CONTRACT_ADDRESS not set; reconciling against chain_software only")
+        return Reconciler()
+    return Reconciler(Web3LogSource(CHAIN_RPC_URL, LICENSE_CONTRACT_ADDRESS))
+
+
+async def main(args):
+    ensure_schema()
+    reconciler = create_reconciler()
+    try:
+        if args.rebuild:
+            async with AsyncSessionLocal() as db:
+                for side in digests.SIDES:
+                    await reconciler._ensure_built(db, side, force=True)
+        while True:
+            report = await reconciler.run(repair=args.repair or RECONCILE_REPAIR)
+            if not args.loop:
+                print(json.dumps(report, indent=2))
+                break
+            await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compare the software table with the LicenseManager contract")
+    parser.add_argument("--repair", action="store_true", help="queue missing chain updates and take on-chain decisions")
+    parser.add_argument("--rebuild", action="store_true", help="recompute both sides' digests from their tables first")
+    parser.add_argument("--loop", action="store_true", help=f"run every RECONCILE_INTERVAL_SECONDS ({RECONCILE_INTERVAL_SECONDS:.0f}s)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from dotenv import load_dotenv
+import models
+import gzip
+import hashlib
+import json
+import os
+import time
+
+load_dotenv()
+
+# Response cache settings
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # per cache, per worker
+# How stale a worker's view of another worker's changes may get; each cache
+# reads its generation from the database at most this often
+RESPONSE_CACHE_CHECK_SECONDS = float(os.getenv("RESPONSE_CACHE_CHECK_SECONDS", "1"))
+GZIP_MIN_SIZE = 1024  # smaller bodies aren't worth a Content-Encoding
+GZIP_LEVEL = 6
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+# One serialized response: the JSON bytes FastAPI would have sent, their gzip
+# encoding, and a validator for conditional GETs
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    gzip_body: bytes | None
+    etag: str
+
+    @property
+    def size(self):
+        return len(self.body) + len(self.gzip_body or b"")
+
+    def response(self, request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+        if self.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if self.gzip_body is not None and accepts_gzip(request.headers.get("accept-encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzip_body, media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+# Serialized responses of one endpoint, valid for one generation of the data
+# behind it. Writers call bump_generation() in the transaction that changes
+# that data and invalidate() after committing; other workers notice the new
+# generation within RESPONSE_CACHE_CHECK_SECONDS and drop their entries.
+class VersionedResponseCache:
+    def __init__(self, name: str, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 check_seconds: float = RESPONSE_CACHE_CHECK_SECONDS):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self.generation = None
+        self._checked_at = 0.0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    async def current_generation(self, db) -> int:
+        now = time.monotonic()
+        if self.generation is None or now - self._checked_at >= self.check_seconds:
+            generation = await db.scalar(
+                select(models.CacheGeneration.generation).where(models.CacheGeneration.name == self.name)
+            ) or 0
+            if generation != self.generation:
+                self._clear()
+                self.generation = generation
+            self._checked_at = now
+        return self.generation
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    # Serialize `payload` once; it is only kept if `generation` (read before
+    # the data was queried) is still current, so a page read while a change
+    # was committing is never cached under the new generation
+    def put(self, key, generation: int, payload) -> CachedResponse:
+        body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+        gzip_body = gzip.compress(body, GZIP_LEVEL, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        etag = f'W/"{generation}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        entry = CachedResponse(body, gzip_body, etag)
+        if generation == self.generation and entry.size <= self.max_bytes:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return entry
+
+    # Forget the generation so the next request re-reads it
+    def invalidate(self):
+        self.generation = None
+        self._clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "generation": self.generation,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# Add one to the generation of cache `name` as part of the caller's
+# transaction. An upsert, so two writers creating the row on a fresh database
+# do not both insert it and fail one of their transactions.
+async def bump_generation(db, name: str):
+    dialect = db.get_bind().dialect.name
+    table = models.CacheGeneration
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(name=name, generation=1)
+        statement = statement.on_duplicate_key_update(generation=table.generation + 1)
+    else:
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(name=name, generation=1)
+        statement = statement.on_conflict_do_update(index_elements=[table.name], set_={"generation": table.generation + 1})
+    await db.execute(statement)
+
+
+# Every approved build, as served by /software/all-approved. Only approvals
+# change it: rejection moves pending builds, which were never listed.
+catalogue_cache = VersionedResponseCache("software_catalogue")
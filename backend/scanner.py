@@ -0,0 +1,273 @@
+# Crack-signature scanning. Every uploaded binary is searched for the byte
+# patterns in crack_signatures (known crack loaders, keygen stubs, patched
+# license checks) with one Aho-Corasick automaton, so a scan is a single pass
+# over the file however many signatures there are. Scans run in a process
+# pool over the stored blob; hits go to scan_hits, and
+# software.scan_generation records which signature set a build was last
+# scanned against so the catalogue can be re-scanned when signatures change.
+#
+#   cd backend && python scanner.py --load signatures.json   # add or replace signatures
+#   cd backend && python scanner.py --rescan                  # scan builds not checked against the current set
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update, delete, insert, or_
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from storage import blob_path
+from response_cache import bump_generation
+from metrics import track
+import models
+import ahocorasick
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Scanning settings
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", str(os.cpu_count() or 1)))
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", str(4 * 1024 * 1024)))  # bytes decoded and matched at a time
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", "100"))  # builds per rescan commit
+SIGNATURE_MIN_LENGTH = 8
+SIGNATURE_MAX_LENGTH = 4096
+SIGNATURE_MIN_DISTINCT_BYTES = 4  # padding runs like 00 00 00 ... would match nearly every binary
+SIGNATURES = "crack_signatures"  # cache_generations row bumped whenever the enabled set changes
+
+_executor = None
+_automaton = None  # (generation, automaton, longest pattern) in each pool process
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=SCAN_WORKERS)
+        logger.info(f"Started crack-signature scanning pool with {SCAN_WORKERS} workers")
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def check_pattern(pattern: bytes):
+    if not SIGNATURE_MIN_LENGTH <= len(pattern) <= SIGNATURE_MAX_LENGTH:
+        raise ValueError(f"Signature must be {SIGNATURE_MIN_LENGTH} to {SIGNATURE_MAX_LENGTH} bytes")
+    if len(set(pattern)) < SIGNATURE_MIN_DISTINCT_BYTES:
+        raise ValueError(f"Signature needs at least {SIGNATURE_MIN_DISTINCT_BYTES} distinct byte values")
+
+
+# Worker-side functions; module level so they can be pickled into the pool.
+# pyahocorasick matches str, so patterns and data are decoded as latin-1: one
+# character per byte, so offsets are byte offsets.
+def _get_automaton(generation: int, signatures):
+    global _automaton
+    if _automaton is None or _automaton[0] != generation:
+        by_pattern = {}
+        for signature_id, pattern in signatures:
+            by_pattern.setdefault(pattern, []).append(signature_id)
+        automaton = ahocorasick.Automaton()
+        for pattern, signature_ids in by_pattern.items():
+            automaton.add_word(pattern.decode("latin-1"), (tuple(signature_ids), len(pattern)))
+        automaton.make_automaton()
+        _automaton = (generation, automaton, max(map(len, by_pattern)))
+    return _automaton[1], _automaton[2]
+
+
+# {signature_id: (first offset, matches)} for the file at `path`, read a chunk
+# at a time. The last longest-1 characters of each chunk are carried into the
+# next, so a match spanning two chunks is found, and found once.
+def scan_file(path: str, generation: int, signatures, chunk_size: int = SCAN_CHUNK_SIZE):
+    automaton, longest = _get_automaton(generation, signatures)
+    hits = {}
+    carry = ""
+    position = 0  # file offset of the first character of `text`
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            text = carry + chunk.decode("latin-1")
+            for end, (signature_ids, length) in automaton.iter(text):
+                if end < len(carry):
+                    continue  # reported with the previous chunk
+                offset = position + end - length + 1
+                for signature_id in signature_ids:
+                    first, matches = hits.get(signature_id, (offset, 0))
+                    hits[signature_id] = (first, matches + 1)
+            keep = min(len(text), longest - 1)
+            position += len(text) - keep
+            carry = text[len(text) - keep:] if keep else ""
+    return hits
+
+
+# The enabled signatures of one generation, reloaded when another worker or
+# the CLI changes them
+class SignatureSet:
+    def __init__(self):
+        self.generation = None
+        self.signatures = []  # [(id, pattern)]
+        self.names = {}
+
+    async def refresh(self, db):
+        generation = await db.scalar(
+            select(models.CacheGeneration.generation).where(models.CacheGeneration.name == SIGNATURES)
+        ) or 0
+        if generation != self.generation:
+            rows = (await db.execute(
+                select(models.CrackSignature.id, models.CrackSignature.name, models.CrackSignature.pattern)
+                .where(models.CrackSignature.enabled == True)
+                .order_by(models.CrackSignature.id)
+            )).all()
+            self.signatures = [(signature_id, pattern) for signature_id, _, pattern in rows]
+            self.names = {signature_id: name for signature_id, name, _ in rows}
+            self.generation = generation
+            logger.info(f"Loaded {len(rows)} crack signatures (generation {generation})")
+        return self
+
+
+signature_set = SignatureSet()
+
+
+# Scan a stored blob against the current signatures in the app's pool.
+# Returns (generation, hits) for record_hits.
+async def scan_blob(db, file_hash: str):
+    await signature_set.refresh(db)
+    generation, signatures = signature_set.generation, signature_set.signatures
+    if not signatures:
+        return generation, {}
+    with track("scanner", "scan"):
+        hits = await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), scan_file, blob_path(file_hash), generation, signatures
+        )
+    return generation, hits
+
+
+# Replace a build's hits with those of a scan, in the caller's transaction
+async def record_hits(db, software_id: int, generation: int, hits):
+    await db.execute(delete(models.ScanHit).where(models.ScanHit.software_id == software_id))
+    if hits:
+        await db.execute(insert(models.ScanHit), [
+            {"software_id": software_id, "signature_id": signature_id, "first_offset": first, "matches": matches}
+            for signature_id, (first, matches) in hits.items()
+        ])
+    await db.execute(update(models.Software).where(models.Software.id == software_id).values(scan_generation=generation))
+
+
+# Add a signature, or replace the pattern of the one with that name, in the
+# caller's transaction. Builds scanned before are then out of date.
+async def save_signature(db, name: str, pattern: bytes, description: str | None = None):
+    check_pattern(pattern)
+    signature = await db.scalar(select(models.CrackSignature).where(models.CrackSignature.name == name))
+    if signature is None:
+        signature = models.CrackSignature(name=name)
+        db.add(signature)
+    signature.pattern = pattern
+    signature.description = description
+    signature.enabled = True
+    await bump_generation(db, SIGNATURES)
+    return signature
+
+
+async def disable_signature(db, name: str) -> bool:
+    result = await db.execute(
+        update(models.CrackSignature)
+        .where(models.CrackSignature.name == name, models.CrackSignature.enabled == True)
+        .values(enabled=False)
+    )
+    if result.rowcount:
+        await bump_generation(db, SIGNATURES)
+    return bool(result.rowcount)
+
+
+# Scan every build not yet checked against the current signatures (or every
+# build, with everything=True) across `workers` processes
+async def rescan(workers: int, batch_size: int, everything: bool = False):
+    async with AsyncSessionLocal() as db:
+        await signature_set.refresh(db)
+        query = select(models.Software.id, models.Software.hash).order_by(models.Software.id)
+        if not everything:
+            query = query.where(or_(models.Software.scan_generation.is_(None),
+                                    models.Software.scan_generation != signature_set.generation))
+        builds = (await db.execute(query)).all()
+    generation, signatures = signature_set.generation, signature_set.signatures
+    stats = {"scanned": 0, "flagged": 0, "missing": 0, "bytes": 0}
+    print(f"{len(builds)} builds to scan against {len(signatures)} signatures (generation {generation})")
+    if not builds:
+        return stats
+    if not signatures:
+        # Nothing to find: every build is clean against an empty set
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.ScanHit))
+            await db.execute(update(models.Software).values(scan_generation=generation))
+            await db.commit()
+        return stats
+
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(builds), batch_size):
+            batch = builds[offset:offset + batch_size]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, scan_file, blob_path(software_hash), generation, signatures)
+                for _, software_hash in batch
+            ), return_exceptions=True)
+            async with AsyncSessionLocal() as db:
+                for (software_id, software_hash), hits in zip(batch, results):
+                    if isinstance(hits, OSError):
+                        stats["missing"] += 1
+                        logger.error(f"Cannot scan {software_hash}: {hits}")
+                        continue
+                    if isinstance(hits, BaseException):
+                        raise hits
+                    await record_hits(db, software_id, generation, hits)
+                    stats["scanned"] += 1
+                    stats["bytes"] += os.path.getsize(blob_path(software_hash))
+                    if hits:
+                        stats["flagged"] += 1
+                        names = ", ".join(signature_set.names[signature_id] for signature_id in hits)
+                        logger.warning(f"Software {software_hash} matches crack signatures: {names}")
+                await db.commit()
+
+            elapsed = time.perf_counter() - start
+            megabytes = stats["bytes"] / 1e6
+            print(f"{offset + len(batch)}/{len(builds)} builds, {megabytes:.0f} MB, {megabytes / elapsed:.0f} MB/s "
+                  f"({megabytes / elapsed / workers:.0f} MB/s per worker), {stats['flagged']} flagged, "
+                  f"{stats['missing']} missing")
+    return stats
+
+
+# Signatures file: [{"name": ..., "pattern": "<hex>", "description": ...}]
+async def load(path: str):
+    with open(path) as f:
+        entries = json.load(f)
+    async with AsyncSessionLocal() as db:
+        for entry in entries:
+            await save_signature(db, entry["name"], bytes.fromhex(entry["pattern"]), entry.get("description"))
+        await db.commit()
+    print(f"Loaded {len(entries)} signatures from {path}")
+
+
+async def main(args):
+    ensure_schema()
+    try:
+        if args.load:
+            await load(args.load)
+        if args.rescan or args.all:
+            await rescan(args.workers, args.batch_size, everything=args.all)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Manage crack signatures and scan the catalogue for them")
+    parser.add_argument("--load", metavar="FILE", help="add or replace the signatures in a JSON file")
+    parser.add_argument("--rescan", action="store_true", help="scan builds not yet checked against the current signatures")
+    parser.add_argument("--all", action="store_true", help="scan every build")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=SCAN_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
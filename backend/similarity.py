@@ -0,0 +1,281 @@
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update
+from dotenv import load_dotenv
+from database import AsyncSessionLocal, ensure_schema, dispose_engines
+from storage import blob_path
+import numpy as np
+import models
+import argparse
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Near-duplicate detection settings
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", "1024"))  # average bytes per block, a power of two
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", str(os.cpu_count() or 1)))
+MINHASH_BINS = 128
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_BINS // LSH_BANDS
+GEAR_WINDOW = 16  # bytes each block boundary depends on
+SKETCH_SLICE = 1024 * 1024  # bytes hashed per numpy pass, bounding its memory use
+RESKETCH_BATCH_SIZE = 100  # builds per --resketch commit
+
+EMPTY_BIN = 0xFFFFFFFF
+
+# Random byte per byte value for the gear hash, as a bytes.translate table.
+# Derived from blake2b so every process and release cuts in the same places.
+GEAR = b"".join(hashlib.blake2b(bytes([i]), digest_size=1).digest() for i in range(256))
+
+
+# 16-bit gear rolling hash (h = (h << 1) + GEAR[byte]) of the GEAR_WINDOW
+# bytes ending at each position of `data`. The window is doubled four times
+# over the whole array rather than rolled one byte at a time in Python.
+def gear_hashes(data: bytes):
+    hashes = np.frombuffer(data.translate(GEAR), dtype=np.uint8).astype(np.uint16)
+    width = 1
+    while width < GEAR_WINDOW:
+        hashes[width:] += hashes[:-width] << width
+        width *= 2
+    return hashes
+
+
+# One-permutation MinHash over the file's blocks: each block hash picks a bin
+# and only the smallest value per bin is kept. One hash per block (computed in
+# C by hashlib) keeps sketching at disk speed, unlike a k-permutation MinHash.
+# Blocks are content-defined: one ends after a byte where the gear hash has
+# its top bits clear, so bytes inserted or removed by a patch only change the
+# blocks around them and the boundaries after it fall where they did before.
+# A patched build shares every block the patch does not touch.
+class BlockSketch:
+    def __init__(self, block_size: int = SIMILARITY_BLOCK_SIZE):
+        bits = min(max(block_size.bit_length() - 1, 1), 15)
+        self.cutoff = 1 << (16 - bits)  # hashes below it end a block
+        # At least GEAR_WINDOW, so a boundary only depends on its own block's bytes
+        self.min_size = max(block_size // 4, GEAR_WINDOW)
+        self.max_size = block_size * 8  # cut anyway in long runs without a boundary
+        self.blocks = 0
+        self._mins = [EMPTY_BIN] * MINHASH_BINS
+        self._pending = b""  # bytes since the last boundary
+
+    def _add_block(self, block):
+        value = int.from_bytes(hashlib.blake2b(block, digest_size=8).digest(), "little")
+        index = value % MINHASH_BINS
+        value >>= 32
+        if value < self._mins[index]:
+            self._mins[index] = value
+        self.blocks += 1
+
+    def _cut(self, data: bytes):
+        boundaries = np.flatnonzero(gear_hashes(data) < self.cutoff).tolist()
+        start = i = 0
+        while True:
+            limit = start + self.max_size
+            i = bisect_left(boundaries, start + self.min_size - 1, i)
+            if i < len(boundaries) and boundaries[i] < limit:
+                end = boundaries[i] + 1
+            elif limit <= len(data):
+                end = limit
+            else:
+                break
+            self._add_block(data[start:end])
+            start = end
+        self._pending = data[start:]
+
+    def update(self, data: bytes):
+        with memoryview(data) as view:
+            for offset in range(0, len(view), SKETCH_SLICE):
+                self._cut(self._pending + view[offset:offset + SKETCH_SLICE])
+
+    # Packed uint32 signature, or None for an empty file. Bins no block landed
+    # in borrow from the next filled bin so small files still compare well.
+    def signature(self):
+        if self._pending:
+            self._add_block(self._pending)
+            self._pending = b""
+        if not self.blocks:
+            return None
+        mins = self._mins
+        filled = [i for i, value in enumerate(mins) if value != EMPTY_BIN]
+        signature = array("I", mins)
+        for i, value in enumerate(mins):
+            if value == EMPTY_BIN:
+                distance = min((j - i) % MINHASH_BINS for j in filled)
+                signature[i] = (mins[(i + distance) % MINHASH_BINS] + distance * 0x9E3779B1) & EMPTY_BIN
+        return signature.tobytes()
+
+
+def sketch_bytes(data: bytes, block_size: int = SIMILARITY_BLOCK_SIZE):
+    sketch = BlockSketch(block_size)
+    sketch.update(data)
+    return sketch.signature()
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    a, b = array("I", a), array("I", b)
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_BINS
+
+
+# LSH index over every stored signature. Signatures live back to back in one
+# uint32 array; each band maps a bucket key to the slots that hash there, so a
+# lookup only compares against uploads sharing at least one band.
+class SimilarityIndex:
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = array("I")
+        self._ids = array("q")
+        self._bands = [{} for _ in range(LSH_BANDS)]
+        self._last_software_id = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def _band_keys(signature):
+        for band in range(LSH_BANDS):
+            yield band, hash(signature[band * LSH_ROWS * 4:(band + 1) * LSH_ROWS * 4])
+
+    def add(self, software_id: int, signature: bytes):
+        slot = len(self._ids)
+        self._ids.append(software_id)
+        self._signatures.frombytes(signature)
+        for band, key in self._band_keys(signature):
+            bucket = self._bands[band].get(key)
+            if bucket is None:
+                self._bands[band][key] = array("I", [slot])
+            else:
+                bucket.append(slot)
+        self._last_software_id = max(self._last_software_id, software_id)
+
+    # [(software_id, estimated similarity)] at or above the threshold, best first
+    def query(self, signature: bytes):
+        slots = set()
+        for band, key in self._band_keys(signature):
+            slots.update(self._bands[band].get(key, ()))
+
+        wanted = array("I", signature)
+        matches = []
+        for slot in slots:
+            start = slot * MINHASH_BINS
+            stored = self._signatures[start:start + MINHASH_BINS]
+            score = sum(x == y for x, y in zip(wanted, stored)) / MINHASH_BINS
+            if score >= self.threshold:
+                matches.append((self._ids[slot], score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    # Pick up signatures stored since the last refresh, including ones written
+    # by other worker processes
+    async def refresh(self, db):
+        rows = (await db.execute(
+            select(models.SoftwareSignature.software_id, models.SoftwareSignature.signature)
+            .where(models.SoftwareSignature.software_id > self._last_software_id)
+            .order_by(models.SoftwareSignature.software_id)
+        )).all()
+        for software_id, signature in rows:
+            self.add(software_id, signature)
+        if rows:
+            logger.info(f"Similarity index loaded {len(rows)} signatures ({len(self)} total)")
+
+
+similarity_index = SimilarityIndex()
+
+
+# Closest approved build by another developer that `signature` nearly
+# duplicates, as {"id", "name", "version", "hash", "similarity"}, or None
+async def find_similar(db, signature: bytes, developer_email: str):
+    await similarity_index.refresh(db)
+    matches = dict(similarity_index.query(signature))
+    if not matches:
+        return None
+    candidates = (await db.execute(
+        select(models.Software.id, models.Software.name, models.Software.version, models.Software.hash)
+        .where(
+            models.Software.id.in_(matches),
+            models.Software.status == models.SoftwareStatus.approved,
+            models.Software.developer_email != developer_email,
+        )
+    )).all()
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda row: matches[row.id])
+    return {"id": best.id, "name": best.name, "version": best.version, "hash": best.hash, "similarity": matches[best.id]}
+
+
+# Runs in a pool process: (signature, blocks) of a stored blob
+def sketch_file(path: str):
+    sketch = BlockSketch()
+    if os.path.getsize(path):
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            sketch.update(mapped)
+    return sketch.signature(), sketch.blocks
+
+
+# Recompute every stored signature from its blob, after SIMILARITY_BLOCK_SIZE
+# or the blocking itself changed: signatures from different blockings don't
+# compare. Restart the API afterwards so its index reloads them.
+async def resketch(workers: int, batch_size: int):
+    async with AsyncSessionLocal() as db:
+        builds = (await db.execute(
+            select(models.SoftwareSignature.software_id, models.Software.hash)
+            .join(models.Software, models.Software.id == models.SoftwareSignature.software_id)
+            .order_by(models.SoftwareSignature.software_id)
+        )).all()
+    print(f"{len(builds)} signatures to recompute")
+    stats = {"sketched": 0, "missing": 0}
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(builds), batch_size):
+            batch = builds[offset:offset + batch_size]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, sketch_file, blob_path(software_hash)) for _, software_hash in batch
+            ), return_exceptions=True)
+            async with AsyncSessionLocal() as db:
+                for (software_id, software_hash), result in zip(batch, results):
+                    if isinstance(result, OSError):
+                        stats["missing"] += 1
+                        logger.error(f"Cannot sketch {software_hash}: {result}")
+                        continue
+                    if isinstance(result, BaseException):
+                        raise result
+                    signature, blocks = result
+                    if signature is None:
+                        continue
+                    await db.execute(
+                        update(models.SoftwareSignature)
+                        .where(models.SoftwareSignature.software_id == software_id)
+                        .values(signature=signature, blocks=blocks)
+                    )
+                    stats["sketched"] += 1
+                await db.commit()
+            print(f"{offset + len(batch)}/{len(builds)} builds in {time.perf_counter() - start:.0f}s, "
+                  f"{stats['missing']} missing")
+    return stats
+
+
+async def main(args):
+    ensure_schema()
+    try:
+        if args.resketch:
+            await resketch(args.workers, args.batch_size)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Maintain the near-duplicate signatures of stored builds")
+    parser.add_argument("--resketch", action="store_true", help="recompute every signature from its stored blob")
+    parser.add_argument("--workers", type=int, default=SIMILARITY_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=RESKETCH_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Upload storage settings
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(512 * 1024 * 1024)))  # bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # bytes
+# Largest request body accepted: an upload plus its multipart framing and form fields
+MAX_REQUEST_SIZE = MAX_UPLOAD_SIZE + 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+# Caps request bodies before anything reads them. Starlette's form parser
+# spools a whole upload to disk before store_upload sees it, so without this
+# a body of any size is received and written out before it is refused. A
+# declared Content-Length over the cap is answered with 413 without reading
+# the body; bodies without one are counted as they arrive.
+class BodySizeLimitMiddleware:
+    def __init__(self, app, max_size: int = MAX_REQUEST_SIZE):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds maximum size of {self.max_size} bytes"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_size:
+            logger.warning(f"{scope['method']} {scope['path']} rejected: Content-Length {int(length)} exceeds {self.max_size} bytes")
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    logger.warning(f"{scope['method']} {scope['path']} rejected: body exceeds {self.max_size} bytes")
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+
+# Content-addressed layout: uploads/ab/abcdef... keeps directories small
+def blob_path(file_hash: str) -> str:
+    return os.path.join(UPLOAD_DIR, file_hash[:2], file_hash)
+
+
+# Copy `source` into a temp file while hashing it; runs in a worker thread so
+# neither the reads nor the digest updates hold the event loop, and only one
+# chunk is ever held in memory. `sketch`, if given, sees every chunk too.
+def _spool(source, chunk_size: int, max_size: int, sketch=None):
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                if sketch is not None:
+                    sketch.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    file_hash = digest.hexdigest()
+    final_path = blob_path(file_hash)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # Same hash means same bytes, so replacing an existing blob is harmless
+    os.replace(tmp_path, final_path)
+    return file_hash, size
+
+
+# Stream an UploadFile into the content-addressed store, returning (sha256 hex, size)
+async def store_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE, sketch=None):
+    await file.seek(0)
+    try:
+        file_hash, size = await run_in_threadpool(_spool, file.file, UPLOAD_CHUNK_SIZE, max_size, sketch)
+    except UploadTooLarge:
+        logger.warning(f"Upload {file.filename} rejected: exceeds {max_size} bytes")
+        raise HTTPException(status_code=413, detail=f"File exceeds maximum upload size of {max_size} bytes")
+    logger.info(f"Stored upload {file.filename} as {file_hash} ({size} bytes)")
+    return file_hash, size
+
+
+# Hash a file already on local disk and copy it into the content-addressed
+# store, returning (sha256 hex, size). The file is mapped rather than read so
+# the digest and `sketch` work on the page cache without copying it into Python.
+def store_local_file(path: str, max_size: int = MAX_UPLOAD_SIZE, sketch=None):
+    size = os.path.getsize(path)
+    if size > max_size:
+        raise UploadTooLarge()
+    digest = hashlib.sha256()
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+            if sketch is not None:
+                sketch.update(mapped)
+
+    file_hash = digest.hexdigest()
+    final_path = blob_path(file_hash)
+    if not os.path.exists(final_path):
+        tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+    return file_hash, size
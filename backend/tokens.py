@@ -0,0 +1,273 @@
+from collections import OrderedDict
+from sqlalchemy import select, delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+import models
+import asyncio
+import base64
+import hashlib
+import jwt
+import logging
+import os
+import secrets
+import time
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# JWT settings
+JWT_SECRET = os.getenv("JWT_SECRET")
+# Comma-separated secrets still accepted (never used to sign) while rotating JWT_SECRET
+JWT_PREVIOUS_SECRETS = [secret for secret in os.getenv("JWT_PREVIOUS_SECRETS", "").split(",") if secret]
+ALGORITHM = "HS256"
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(7 * 24 * 3600)))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # verified tokens kept per worker
+# How often each worker picks up revocations made by other workers
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+
+REQUIRED_CLAIMS = ["sub", "uid", "role", "approved", "typ", "jti", "iat", "exp"]
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def check_settings():
+    if not JWT_SECRET:
+        logger.error("JWT_SECRET not set in .env file")
+        raise ValueError("JWT_SECRET must be set in .env file")
+
+
+# Signing keys parsed once into PyJWK objects and looked up by the token's
+# `kid` header, so rotating JWT_SECRET doesn't log everyone out
+class Keyring:
+    def __init__(self, current: str, previous=()):
+        self.signing_key = self._jwk(current)
+        self.keys = {self.signing_key.key_id: self.signing_key}
+        for secret in previous:
+            key = self._jwk(secret)
+            self.keys.setdefault(key.key_id, key)
+
+    @staticmethod
+    def _jwk(secret: str):
+        return jwt.PyJWK({
+            "kty": "oct",
+            "k": base64.urlsafe_b64encode(secret.encode()).rstrip(b"=").decode(),
+            "alg": ALGORITHM,
+            "kid": hashlib.sha256(secret.encode()).hexdigest()[:8],
+        })
+
+
+_keyring = None
+
+
+def keyring():
+    global _keyring
+    if _keyring is None:
+        check_settings()
+        _keyring = Keyring(JWT_SECRET, JWT_PREVIOUS_SECRETS)
+    return _keyring
+
+
+# Token string -> verified claims. A hit skips the base64/JSON/HMAC work of
+# jwt.decode; expiry and the denylist are still checked on every use.
+class VerifiedTokenCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        claims = self._entries.get(token)
+        if claims is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims):
+        if self.maxsize <= 0:
+            return
+        self._entries[token] = claims
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+
+# Revoked token ids and per-user "revoked before" times. Entries are dropped
+# once every token they cover has expired, so the denylist only ever holds
+# what was revoked within the last token lifetime. Revocations are written to
+# token_revocations and each worker polls that table for the ones it missed.
+# The table holds one row per (kind, subject), so revoking a token is a
+# conditional insert that only one of two concurrent requests can win.
+class TokenDenylist:
+    def __init__(self):
+        self._tokens = {}  # jti -> expires_at
+        self._users = {}  # email -> (revoked_at, expires_at)
+        self._last_id = 0
+        self._task = None
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+    def is_revoked(self, claims) -> bool:
+        if claims["jti"] in self._tokens:
+            return True
+        user = self._users.get(claims["sub"])
+        return user is not None and claims["iat"] <= user[0]
+
+    def _apply(self, kind: str, subject: str, revoked_at: float, expires_at: float):
+        if kind == "token":
+            self._tokens[subject] = expires_at
+        elif revoked_at >= self._users.get(subject, (0.0, 0.0))[0]:
+            self._users[subject] = (revoked_at, expires_at)
+
+    def _purge(self, now: float):
+        self._tokens = {jti: expires_at for jti, expires_at in self._tokens.items() if expires_at > now}
+        self._users = {email: entry for email, entry in self._users.items() if entry[1] > now}
+
+    # Write revocations in `db`'s transaction, or in one of their own if it is
+    # None. Returns how many were not recorded already.
+    async def _record(self, entries, db=None) -> int:
+        for entry in entries:
+            self._apply(*entry)
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                recorded = await self._record(entries, db)
+                await db.commit()
+            return recorded
+        await db.execute(delete(models.TokenRevocation).where(models.TokenRevocation.expires_at <= time.time()))
+        # A user revoked again replaces the old row with a new one, whose higher
+        # id the other workers' sync picks up
+        users = [subject for kind, subject, _, _ in entries if kind == "user"]
+        if users:
+            await db.execute(delete(models.TokenRevocation).where(
+                models.TokenRevocation.kind == "user", models.TokenRevocation.subject.in_(users)
+            ))
+        dialect = db.get_bind().dialect.name
+        recorded = 0
+        for kind, subject, revoked_at, expires_at in entries:
+            values = {"kind": kind, "subject": subject, "revoked_at": revoked_at, "expires_at": expires_at}
+            if dialect == "mysql":
+                statement = insert(models.TokenRevocation).prefix_with("IGNORE").values(**values)
+            else:
+                statement = ((postgresql if dialect == "postgresql" else sqlite).insert(models.TokenRevocation)
+                             .values(**values).on_conflict_do_nothing(index_elements=["kind", "subject"]))
+            recorded += (await db.execute(statement)).rowcount
+        return recorded
+
+    # Revoke one token (logout, refresh token rotation), in the caller's
+    # transaction if `db` is given. False if it had already been revoked.
+    async def revoke_token(self, claims, db=None) -> bool:
+        return await self._record([("token", claims["jti"], time.time(), claims["exp"])], db) == 1
+
+    # Revoke every token issued so far to each of `emails` (users rejected or removed)
+    async def revoke_users(self, emails):
+        now = time.time()
+        expires_at = now + max(ACCESS_TOKEN_TTL_SECONDS, REFRESH_TOKEN_TTL_SECONDS)
+        await self._record([("user", email, now, expires_at) for email in emails])
+
+    async def sync(self):
+        now = time.time()
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(models.TokenRevocation)
+                .where(models.TokenRevocation.id > self._last_id, models.TokenRevocation.expires_at > now)
+                .order_by(models.TokenRevocation.id)
+            )).scalars().all()
+        for row in rows:
+            self._apply(row.kind, row.subject, row.revoked_at, row.expires_at)
+            self._last_id = row.id
+        self._purge(now)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {e}")
+            await asyncio.sleep(TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+denylist = TokenDenylist()
+
+
+def _encode(user, typ: str, ttl: int, now: float):
+    claims = {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role,
+        "approved": user.is_approved,
+        "typ": typ,
+        "jti": secrets.token_urlsafe(12),
+        # Sub-second iat so a token issued right after a revoke_user() stays valid
+        "iat": round(now, 3),
+        "exp": int(now) + ttl,
+    }
+    key = keyring().signing_key
+    return jwt.encode(claims, key, algorithm=ALGORITHM, headers={"kid": key.key_id})
+
+
+# Access token (short-lived, carries everything read-only endpoints need to
+# authorize) plus refresh token (long-lived, only accepted by /users/refresh-token)
+def issue_tokens(user):
+    now = time.time()
+    return {
+        "access_token": _encode(user, "access", ACCESS_TOKEN_TTL_SECONDS, now),
+        "refresh_token": _encode(user, "refresh", REFRESH_TOKEN_TTL_SECONDS, now),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+# Verified, unexpired, unrevoked claims of a `typ` token, or InvalidToken
+def decode_token(token: str, typ: str = "access"):
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            key = keyring().keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise InvalidToken("Unknown signing key")
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM], options={"require": REQUIRED_CLAIMS})
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        token_cache.put(token, claims)
+    elif claims["exp"] <= time.time():
+        raise InvalidToken("Signature has expired")
+    if claims["typ"] != typ:
+        raise InvalidToken(f"Not a valid {typ} token")
+    if denylist.is_revoked(claims):
+        raise InvalidToken("Token has been revoked")
+    return claims
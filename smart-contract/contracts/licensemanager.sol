@@ -74,6 +74,36 @@ contract LicenseManager {
         emit SoftwareRejected(hash);
     }
 
+    // Add (when missing) and approve or reject many builds in one transaction.
+    // Builds already approved or rejected are skipped instead of reverting the
+    // whole batch, so sending the same batch twice is harmless.
+    function batchSetStatus(string[] calldata hashes, address[] calldata developers, bool[] calldata approve)
+        external
+        onlyAdmin
+    {
+        require(hashes.length == developers.length && hashes.length == approve.length, "Length mismatch");
+        for (uint256 i = 0; i < hashes.length; i++) {
+            string calldata hash = hashes[i];
+            require(bytes(hash).length > 0, "Hash cannot be empty");
+            Software storage software = softwareRecords[hash];
+            if (bytes(software.hash).length == 0) {
+                softwareRecords[hash] = Software(hash, false, false, developers[i]);
+                allSoftwareHashes.push(hash);
+                emit SoftwareAdded(hash, developers[i]);
+            }
+            if (software.isApproved || software.isRejected) {
+                continue;
+            }
+            if (approve[i]) {
+                software.isApproved = true;
+                emit SoftwareApproved(hash);
+            } else {
+                software.isRejected = true;
+                emit SoftwareRejected(hash);
+            }
+        }
+    }
+
     // Issue a license for approved software
     function issueLicense(string calldata licenseKey, string calldata softwareName) external {
         require(bytes(licenseKey).length > 0, "License key cannot be empty");
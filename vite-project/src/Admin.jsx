@@ -1,6 +1,8 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { subscribeAdminEvents, applyAdminEvent } from './adminEvents.js';
+import { fetchAllPages } from './pagination.js';
 
 const Admin = () => {
   const [pendingUsers, setPendingUsers] = useState([]);
@@ -14,16 +16,13 @@ const Admin = () => {
       setLoading(true);
       try {
         const token = localStorage.getItem('token');
-        const [usersResponse, softwareResponse] = await Promise.all([
-          axios.get('http://localhost:8000/admin/pending-users', {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-          axios.get('http://localhost:8000/admin/pending-software', {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
+        const headers = { Authorization: `Bearer ${token}` };
+        const [users, software] = await Promise.all([
+          fetchAllPages('http://localhost:8000/admin/pending-users', 'pending_users', headers),
+          fetchAllPages('http://localhost:8000/admin/pending-software', 'pending_software', headers),
         ]);
-        setPendingUsers(usersResponse.data.pending_users);
-        setPendingSoftware(softwareResponse.data.pending_software);
+        setPendingUsers(users);
+        setPendingSoftware(software);
       } catch (err) {
         setError(err.response?.data?.detail || 'Failed to fetch data. Ensure you have admin access.');
         if (err.response?.status === 403) {
@@ -33,7 +32,12 @@ const Admin = () => {
         setLoading(false);
       }
     };
-    fetchData();
+    // Load the queues once, then keep them current from the admin event stream
+    return subscribeAdminEvents({
+      onReset: fetchData,
+      onEvent: (kind, data) => applyAdminEvent(kind, data, setPendingUsers, setPendingSoftware),
+      onError: () => navigate('/login'),
+    });
   }, [navigate]);
 
   const handleApproveUser = async (email) => {
@@ -43,7 +47,7 @@ const Admin = () => {
       await axios.post(`http://localhost:8000/admin/approve-user/${email}`, {}, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setPendingUsers(pendingUsers.filter((user) => user.email !== email));
+      setPendingUsers((users) => users.filter((user) => user.email !== email));
       alert(`User ${email} approved`);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to approve user');
@@ -59,7 +63,7 @@ const Admin = () => {
       await axios.post(`http://localhost:8000/admin/reject-user/${email}`, {}, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setPendingUsers(pendingUsers.filter((user) => user.email !== email));
+      setPendingUsers((users) => users.filter((user) => user.email !== email));
       alert(`User ${email} rejected`);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to reject user');
@@ -75,7 +79,7 @@ const Admin = () => {
       await axios.post(`http://localhost:8000/admin/approve-software/${hash}`, {}, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setPendingSoftware(pendingSoftware.filter((s) => s.hash !== hash));
+      setPendingSoftware((software) => software.filter((s) => s.hash !== hash));
       alert(`Software approved`);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to approve software');
@@ -91,7 +95,7 @@ const Admin = () => {
       await axios.post(`http://localhost:8000/admin/reject-software/${hash}`, {}, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setPendingSoftware(pendingSoftware.filter((s) => s.hash !== hash));
+      setPendingSoftware((software) => software.filter((s) => s.hash !== hash));
       alert(`Software rejected`);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to reject software');
@@ -2,6 +2,9 @@ import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { ethers } from 'ethers';
 import axios from 'axios';
+import { logout } from './auth.js';
+import { subscribeAdminEvents, applyAdminEvent } from './adminEvents.js';
+import { fetchAllPages } from './pagination.js';
 import LicenseManagerArtifact from './LicenseManager.json';
 
 const AdminDashboard = () => {
@@ -197,10 +200,10 @@ const AdminDashboard = () => {
       if (!token) {
         throw new Error('No token found');
       }
-      const response = await axios.get(`${API_URL}/admin/pending-users`, {
-        headers: { Authorization: `Bearer ${token}` },
+      const users = await fetchAllPages(`${API_URL}/admin/pending-users`, 'pending_users', {
+        Authorization: `Bearer ${token}`,
       });
-      setPendingUsers(response.data.pending_users || []);
+      setPendingUsers(users);
     } catch (err) {
       if (err.response?.status === 401) {
         localStorage.removeItem('token');
@@ -224,10 +227,10 @@ const AdminDashboard = () => {
       if (!token) {
         throw new Error('No token found');
       }
-      const response = await axios.get(`${API_URL}/admin/pending-software`, {
-        headers: { Authorization: `Bearer ${token}` },
+      const software = await fetchAllPages(`${API_URL}/admin/pending-software`, 'pending_software', {
+        Authorization: `Bearer ${token}`,
       });
-      setPendingSoftware(response.data.pending_software || []);
+      setPendingSoftware(software);
     } catch (err) {
       if (err.response?.status === 401) {
         localStorage.removeItem('token');
@@ -250,12 +253,10 @@ const AdminDashboard = () => {
       console.log('Setting up event listeners');
       contract.on('SoftwareApproved', (hash) => {
         setSuccess(`Software ${hash} approved on blockchain`);
-        fetchPendingSoftware();
         console.log('SoftwareApproved event:', { hash });
       });
       contract.on('SoftwareRejected', (hash) => {
         setSuccess(`Software ${hash} rejected on blockchain`);
-        fetchPendingSoftware();
         console.log('SoftwareRejected event:', { hash });
       });
     }
@@ -278,7 +279,7 @@ const AdminDashboard = () => {
         {},
         { headers: { Authorization: `Bearer ${token}` } }
       );
-      setPendingUsers(pendingUsers.filter((user) => user.email !== email));
+      setPendingUsers((users) => users.filter((user) => user.email !== email));
       setSuccess(`User ${email} approved successfully`);
     } catch (err) {
       setError(err.response?.data?.detail || `Failed to approve ${email}`);
@@ -300,7 +301,7 @@ const AdminDashboard = () => {
         {},
         { headers: { Authorization: `Bearer ${token}` } }
       );
-      setPendingUsers(pendingUsers.filter((user) => user.email !== email));
+      setPendingUsers((users) => users.filter((user) => user.email !== email));
       setSuccess(`User ${email} rejected successfully`);
     } catch (err) {
       setError(err.response?.data?.detail || `Failed to reject ${email}`);
@@ -323,15 +324,21 @@ const AdminDashboard = () => {
       const token = localStorage.getItem('token');
       const { contract } = contractData;
       // Call backend API
-      await axios.post(
+      const response = await axios.post(
         `${API_URL}/admin/approve-software/${hash}`,
         {},
         { headers: { Authorization: `Bearer ${token}` } }
       );
+      if (response.data.chain_status === 'queued') {
+        // The backend sends the contract update itself
+        setPendingSoftware((software) => software.filter((item) => item.hash !== hash));
+        setSuccess(`Software ${hash} approved; blockchain update queued`);
+        return;
+      }
       // Call smart contract
       const tx = await contract.approveSoftware(hash, { gasLimit: 300000 });
       await tx.wait();
-      setPendingSoftware(pendingSoftware.filter((item) => item.hash !== hash));
+      setPendingSoftware((software) => software.filter((item) => item.hash !== hash));
       setSuccess(`Software ${hash} approved successfully`);
     } catch (err) {
       setError(err.response?.data?.detail || `Failed to approve software: ${err.message}`);
@@ -355,15 +362,21 @@ const AdminDashboard = () => {
       const token = localStorage.getItem('token');
       const { contract } = contractData;
       // Call backend API
-      await axios.post(
+      const response = await axios.post(
         `${API_URL}/admin/reject-software/${hash}`,
         {},
         { headers: { Authorization: `Bearer ${token}` } }
       );
+      if (response.data.chain_status === 'queued') {
+        // The backend sends the contract update itself
+        setPendingSoftware((software) => software.filter((item) => item.hash !== hash));
+        setSuccess(`Software ${hash} rejected; blockchain update queued`);
+        return;
+      }
       // Call smart contract
       const tx = await contract.rejectSoftware(hash, { gasLimit: 300000 });
       await tx.wait();
-      setPendingSoftware(pendingSoftware.filter((item) => item.hash !== hash));
+      setPendingSoftware((software) => software.filter((item) => item.hash !== hash));
       setSuccess(`Software ${hash} rejected successfully`);
     } catch (err) {
       setError(err.response?.data?.detail || `Failed to reject software: ${err.message}`);
@@ -396,15 +409,25 @@ const AdminDashboard = () => {
     }
   };
 
-  // Fetch data when tab changes
+  // Load the queues once, then keep them current from the admin event stream
   useEffect(() => {
     if (!isConnected) return;
-    if (activeTab === 'users') {
-      fetchPendingUsers();
-    } else if (activeTab === 'software') {
-      fetchPendingSoftware();
-    }
-  }, [activeTab, isConnected]);
+    return subscribeAdminEvents({
+      onReset: () => {
+        fetchPendingUsers();
+        fetchPendingSoftware();
+      },
+      onEvent: (kind, data) => applyAdminEvent(kind, data, setPendingUsers, setPendingSoftware),
+      onError: (err) => {
+        if (err.status === 403) {
+          navigate('/dashboard');
+        } else {
+          localStorage.removeItem('token');
+          navigate('/login');
+        }
+      },
+    });
+  }, [isConnected]);
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-pink-50 to-pink-100 flex items-center justify-center p-6 relative">
@@ -429,8 +452,8 @@ const AdminDashboard = () => {
         <div className="flex justify-between items-center mb-8">
           <h2 className="text-5xl font-extrabold text-center text-pink-800">Admin Dashboard</h2>
           <button
-            onClick={() => {
-              localStorage.removeItem('token');
+            onClick={async () => {
+              await logout();
               navigate('/login');
             }}
             className="bg-red-500 text-white px-6 py-3 rounded-xl hover:bg-red-600 transition-all"
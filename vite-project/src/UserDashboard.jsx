@@ -3,6 +3,8 @@ import { useNavigate } from 'react-router-dom';
 import { ethers } from 'ethers';
 import { sha256 } from 'js-sha256';
 import axios from 'axios';
+import { logout } from './auth.js';
+import { fetchPage } from './pagination.js';
 import LicenseManagerArtifact from './LicenseManager.json';
 
 const UserDashboard = () => {
@@ -15,6 +17,7 @@ const UserDashboard = () => {
   const [approvedSoftware, setApprovedSoftware] = useState([]);
   const [rejectedSoftware, setRejectedSoftware] = useState([]);
   const [allApprovedSoftware, setAllApprovedSoftware] = useState([]);
+  const [allApprovedCursor, setAllApprovedCursor] = useState(null);
   const [status, setStatus] = useState('');
   const [licenseKey, setLicenseKey] = useState('');
   const [loading, setLoading] = useState(false);
@@ -243,25 +246,20 @@ const UserDashboard = () => {
           setStatus('No licenses found. Generate a license first.');
         }
 
-        const [pendingRes, approvedRes, rejectedRes, allApprovedRes] = await Promise.all([
-          axios.get(`${API_URL}/software/pending`, {
+        const [summaryRes, allApproved] = await Promise.all([
+          axios.get(`${API_URL}/software/summary`, {
             headers: { Authorization: `Bearer ${token}` },
           }),
-          axios.get(`${API_URL}/software/approved`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-          axios.get(`${API_URL}/software/rejected`, {
-            headers: { Authorization: `Bearer ${token}` },
-          }),
-          axios.get(`${API_URL}/software/all-approved`, {
-            headers: { Authorization: `Bearer ${token}` },
+          fetchPage(`${API_URL}/software/all-approved`, 'all_approved_software', {
+            Authorization: `Bearer ${token}`,
           }),
         ]);
 
-        setPendingSoftware(pendingRes.data.pending_software || []);
-        setApprovedSoftware(approvedRes.data.approved_software || []);
-        setRejectedSoftware(rejectedRes.data.rejected_software || []);
-        setAllApprovedSoftware(allApprovedRes.data.all_approved_software || []);
+        setPendingSoftware(summaryRes.data.pending_software || []);
+        setApprovedSoftware(summaryRes.data.approved_software || []);
+        setRejectedSoftware(summaryRes.data.rejected_software || []);
+        setAllApprovedSoftware(allApproved.items);
+        setAllApprovedCursor(allApproved.nextCursor);
       } catch (err) {
         if (err.code === 'UNSUPPORTED_OPERATION' && err.operation === 'getEnsAddress') {
           setError('ENS is not supported on this network. Please ensure all addresses are valid.');
@@ -392,16 +390,15 @@ const UserDashboard = () => {
       setFile(null);
 
       // Refresh software lists
-      const [pendingRes, approvedRes, rejectedRes, allApprovedRes] = await Promise.all([
-        axios.get(`${API_URL}/software/pending`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/software/approved`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/software/rejected`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/software/all-approved`, { headers: { Authorization: `Bearer ${token}` } }),
+      const [summaryRes, allApproved] = await Promise.all([
+        axios.get(`${API_URL}/software/summary`, { headers: { Authorization: `Bearer ${token}` } }),
+        fetchPage(`${API_URL}/software/all-approved`, 'all_approved_software', { Authorization: `Bearer ${token}` }),
       ]);
-      setPendingSoftware(pendingRes.data.pending_software || []);
-      setApprovedSoftware(approvedRes.data.approved_software || []);
-      setRejectedSoftware(rejectedRes.data.rejected_software || []);
-      setAllApprovedSoftware(allApprovedRes.data.all_approved_software || []);
+      setPendingSoftware(summaryRes.data.pending_software || []);
+      setApprovedSoftware(summaryRes.data.approved_software || []);
+      setRejectedSoftware(summaryRes.data.rejected_software || []);
+      setAllApprovedSoftware(allApproved.items);
+      setAllApprovedCursor(allApproved.nextCursor);
     } catch (err) {
       let errorMessage = 'Error uploading software';
       if (err.code === 'UNSUPPORTED_OPERATION' && err.operation === 'getEnsAddress') {
@@ -423,6 +420,28 @@ const UserDashboard = () => {
     }
   }
 
+  // Append the next page of the approved catalogue
+  async function loadMoreApprovedSoftware() {
+    setLoading(true);
+    setError('');
+    try {
+      const token = localStorage.getItem('token');
+      const page = await fetchPage(
+        `${API_URL}/software/all-approved`,
+        'all_approved_software',
+        { Authorization: `Bearer ${token}` },
+        allApprovedCursor
+      );
+      setAllApprovedSoftware((software) => [...software, ...page.items]);
+      setAllApprovedCursor(page.nextCursor);
+    } catch (err) {
+      setError(err.response?.data?.detail || `Failed to load more software: ${err.message}`);
+      console.error('loadMoreApprovedSoftware error:', err);
+    } finally {
+      setLoading(false);
+    }
+  }
+
   // Generate and store license
   async function handleGenerateLicense() {
     if (!file) {
@@ -652,8 +671,8 @@ const UserDashboard = () => {
         <div className="flex justify-between items-center mb-8">
           <h2 className="text-5xl font-extrabold text-center text-pink-800">User Dashboard</h2>
           <button
-            onClick={() => {
-              localStorage.removeItem('token');
+            onClick={async () => {
+              await logout();
               navigate('/login');
             }}
             className="bg-red-500 text-white px-6 py-3 rounded-xl hover:bg-red-600 transition-all"
@@ -942,6 +961,15 @@ const UserDashboard = () => {
                       ))}
                     </tbody>
                   </table>
+                  {allApprovedCursor !== null && (
+                    <button
+                      onClick={loadMoreApprovedSoftware}
+                      className="mt-4 bg-pink-500 text-white px-6 py-3 rounded-xl hover:bg-pink-600 disabled:opacity-50"
+                      disabled={loading}
+                    >
+                      Load more
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -36,6 +36,7 @@ function VerifyOtp() {
 
       // Store the JWT token in localStorage (or use a state management solution)
       localStorage.setItem('token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
 
       setLoading(false);
       navigate('/dashboard'); // Redirect to dashboard or another protected route
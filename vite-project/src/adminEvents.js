@@ -0,0 +1,118 @@
+import { refreshAccessToken } from './auth.js';
+
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+const RECONNECT_DELAY = 3000;
+
+// Live changes to the admin queues from /admin/events (Server-Sent Events).
+// EventSource cannot send an Authorization header, so the stream is read with
+// fetch. onReset runs whenever the dashboard has to load the listings in full:
+// on the first connection and after the server asks for a resync. A dropped
+// connection resumes from the last event id, so nothing is missed or reloaded.
+// Returns a function that closes the stream.
+export function subscribeAdminEvents({ onEvent, onReset, onError }) {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let refreshed = false;
+
+  const handle = (fields, fresh) => {
+    if (fields.id !== undefined) {
+      lastEventId = fields.id;
+    }
+    if (fields.event === 'resync') {
+      lastEventId = null;
+      return false;
+    }
+    if (fields.event === 'ready') {
+      if (fresh) onReset();
+    } else if (fields.event) {
+      onEvent(fields.event, JSON.parse(fields.data || '{}'));
+    }
+    return true;
+  };
+
+  const connect = async () => {
+    const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
+    const fresh = lastEventId === null;
+    if (!fresh) {
+      headers['Last-Event-ID'] = lastEventId;
+    }
+    const response = await fetch(`${API_URL}/admin/events`, { headers, signal: controller.signal });
+    if (response.status === 401 && !refreshed) {
+      refreshed = true;
+      await refreshAccessToken();
+      return connect();
+    }
+    if (!response.ok) {
+      const err = new Error(`Admin event stream failed with status ${response.status}`);
+      err.status = response.status;
+      throw err;
+    }
+    refreshed = false;
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const fields = {};
+        for (const line of block.split('\n')) {
+          if (!line || line.startsWith(':')) continue;  // keep-alive
+          const colon = line.indexOf(':');
+          fields[line.slice(0, colon)] = line.slice(colon + 1).trimStart();
+        }
+        if (!handle(fields, fresh)) {
+          reader.cancel();
+          return 'resync';
+        }
+      }
+    }
+  };
+
+  const run = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        // Reload straight away after a resync; otherwise wait before reconnecting
+        if ((await connect()) === 'resync') continue;
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        const status = err.status || err.response?.status;  // axios errors from the token refresh
+        if (status === 401 || status === 403 || err.message === 'No refresh token') {
+          onError(err);
+          return;
+        }
+        console.error('Admin event stream error:', err);
+      }
+      await new Promise((resolve) => setTimeout(resolve, RECONNECT_DELAY));
+    }
+  };
+
+  run();
+  return () => controller.abort();
+}
+
+// Apply one admin event to the pending listings
+export function applyAdminEvent(kind, data, setPendingUsers, setPendingSoftware) {
+  if (kind === 'users.added') {
+    setPendingUsers((users) => {
+      const known = new Set(users.map((user) => user.email));
+      return [...users, ...data.users.filter((user) => !known.has(user.email))];
+    });
+  } else if (kind === 'users.removed') {
+    const emails = new Set(data.emails);
+    setPendingUsers((users) => users.filter((user) => !emails.has(user.email)));
+  } else if (kind === 'software.added') {
+    setPendingSoftware((software) => {
+      const known = new Set(software.map((item) => item.hash));
+      return [...software, ...data.software.filter((item) => !known.has(item.hash))];
+    });
+  } else if (kind === 'software.removed') {
+    const hashes = new Set(data.hashes);
+    setPendingSoftware((software) => software.filter((item) => !hashes.has(item.hash)));
+  }
+}
@@ -0,0 +1,64 @@
+import axios from 'axios';
+
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
+// Access tokens are short-lived; when one is rejected, trade the refresh
+// token for a new pair once and replay the request. Concurrent 401s share
+// one refresh, since each refresh token can only be used once.
+let refreshing = null;
+
+async function refreshTokens() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+  const response = await axios.post(`${API_URL}/users/refresh-token`, { refresh_token: refreshToken });
+  localStorage.setItem('token', response.data.access_token);
+  localStorage.setItem('refresh_token', response.data.refresh_token);
+  return response.data.access_token;
+}
+
+// Refresh once for all callers waiting on a rejected access token
+export function refreshAccessToken() {
+  refreshing = refreshing || refreshTokens().finally(() => {
+    refreshing = null;
+  });
+  return refreshing;
+}
+
+export function installTokenRefresh() {
+  axios.interceptors.response.use(undefined, async (error) => {
+    const config = error.config;
+    const isAuthCall = config?.url?.includes('/users/refresh-token') || config?.url?.includes('/users/logout');
+    if (error.response?.status !== 401 || !config || config._retried || isAuthCall) {
+      throw error;
+    }
+    config._retried = true;
+    try {
+      const token = await refreshAccessToken();
+      config.headers.Authorization = `Bearer ${token}`;
+      return axios(config);
+    } catch {
+      localStorage.removeItem('refresh_token');
+      throw error;
+    }
+  });
+}
+
+export async function logout() {
+  const token = localStorage.getItem('token');
+  const refreshToken = localStorage.getItem('refresh_token');
+  localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+  if (token) {
+    try {
+      await axios.post(
+        `${API_URL}/users/logout`,
+        { refresh_token: refreshToken },
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+    } catch (err) {
+      console.error('Logout request failed:', err);
+    }
+  }
+}
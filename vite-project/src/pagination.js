@@ -0,0 +1,22 @@
+import axios from 'axios';
+
+// Listing endpoints return one page at a time: { <key>: [...], next_cursor }.
+// next_cursor is null on the last page.
+export async function fetchPage(url, key, headers, cursor = null) {
+  const params = cursor === null ? {} : { cursor };
+  const response = await axios.get(url, { headers, params });
+  return { items: response.data[key] || [], nextCursor: response.data.next_cursor ?? null };
+}
+
+// Every page of a listing, for views that have to show all of it (the admin
+// approval queues).
+export async function fetchAllPages(url, key, headers) {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await fetchPage(url, key, headers, cursor);
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor !== null);
+  return items;
+}